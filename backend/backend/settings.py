@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 CORS_ALLOW_ALL_ORIGINS = True  # for hackathon demo
 
 MIDDLEWARE = [
+    "predictor.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
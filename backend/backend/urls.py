@@ -1,12 +1,23 @@
 from django.contrib import admin
 from django.urls import path
+from predictor import async_views
 from predictor.views import (
     health_check,
     explain_prediction,
     get_canvas_courses,
     get_canvas_category_grades,
+    canvas_what_if,
     get_canvas_all_data,   # NEW
+    start_canvas_sync,
+    canvas_sync_status,
     predict_grade,
+    predict_grade_stream,
+    predict_grade_batch,
+    llm_cache_stats,
+    prometheus_metrics,
+    search_professors,
+    ingest_syllabus,
+    get_syllabus,
 )
 
 urlpatterns = [
@@ -14,12 +25,30 @@ urlpatterns = [
 
     # Health + Explain
     path("api/health/", health_check),
+    path("api/metrics/", prometheus_metrics),
     path("api/explain/", explain_prediction),
+    path("api/llm-cache/", llm_cache_stats),
+    path("api/rmp/professors/", search_professors),
 
     # Canvas
     path("api/canvas/courses/", get_canvas_courses),
     path("api/canvas/<int:course_id>/grades/", get_canvas_category_grades),
+    path("api/canvas/<int:course_id>/what-if/", canvas_what_if),
     path("api/canvas/all-data", get_canvas_all_data),
     path("api/canvas/all-data/", get_canvas_all_data),
+    path("api/canvas/sync/", start_canvas_sync),
+    path("api/canvas/sync/<int:job_id>/", canvas_sync_status),
+    path("api/syllabi/", ingest_syllabus),
+    path("api/syllabi/<str:syllabus_hash>/", get_syllabus),
     path("api/predict-grade/", predict_grade),
+    path("api/predict-grade/stream/", predict_grade_stream),
+    path("api/predict-grade/batch/", predict_grade_batch),
+
+    # Async (ASGI) versions: same requests and responses
+    path("api/async/explain/", async_views.explain_prediction),
+    path("api/async/canvas/courses/", async_views.get_canvas_courses),
+    path("api/async/canvas/<int:course_id>/grades/", async_views.get_canvas_category_grades),
+    path("api/async/canvas/all-data/", async_views.get_canvas_all_data),
+    path("api/async/predict-grade/", async_views.predict_grade),
+    path("api/async/predict-grade/stream/", async_views.predict_grade_stream),
 ]
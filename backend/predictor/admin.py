@@ -1,3 +1,19 @@
 from django.contrib import admin
 
 # Register your models here.
+
+from .models import Syllabus, SyncJob
+
+
+@admin.register(SyncJob)
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "owner", "status", "mode", "courses_done", "courses_total", "created_at", "finished_at")
+    list_filter = ("status", "mode")
+    exclude = ("result",)
+
+
+@admin.register(Syllabus)
+class SyllabusAdmin(admin.ModelAdmin):
+    list_display = ("content_hash", "source_type", "confidence", "extra_credit", "submissions", "created_at")
+    list_filter = ("source_type", "extra_credit")
+    readonly_fields = ("content_hash",)
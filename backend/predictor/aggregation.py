@@ -0,0 +1,218 @@
+import numpy as np
+
+# The standardized categories standardize_category maps groups onto; every
+# per-category array and column in the app is in this order
+CATEGORIES = ["projects", "assignments", "exams", "participation"]
+
+_NO_SUBMISSION = {}
+
+
+def standardize_category(name: str) -> str:
+    n = (name or "").lower()
+    if any(k in n for k in ["exam", "midterm", "final", "quiz", "test"]):
+        return "exams"
+    if any(k in n for k in ["project", "capstone", "lab"]):
+        return "projects"
+    if any(k in n for k in ["participation", "attendance", "discussion", "poll", "peer"]):
+        return "participation"
+    return "assignments"
+
+
+class AssignmentTable:
+    """
+    Columnar view of many courses' assignment groups, assignments and the
+    student's submissions.
+
+    Group columns (one entry per assignment group, across all courses):
+      group_course, group_name, group_weight
+    Assignment columns (one entry per assignment, joined to its submission):
+      assignment_group (index into the group columns), points, score (NaN if
+      ungraded), late, excused; plus the raw assignment / submission dicts
+      when built with `keep_rows` (for per-assignment listings).
+    `errors` maps a course position to a message for malformed course JSON
+    (e.g. a Canvas error body instead of a list); such courses get no rows.
+    """
+
+    def __init__(self, courses, keep_rows: bool = False):
+        self.n_courses = len(courses)
+        self.group_course, self.group_name, self.group_weight = [], [], []
+        assignment_group, points, scores, late, excused = [], [], [], [], []
+        self.rows = [] if keep_rows else None
+        self.errors = {}
+
+        for ci, (groups, submissions) in enumerate(courses):
+            try:
+                course = self._flatten_course(ci, groups, submissions)
+            except (AttributeError, KeyError, TypeError) as e:
+                self.errors[ci] = f"Malformed Canvas data: {e!r}"
+                continue
+            for group_rows, column in zip(course, (assignment_group, points, scores, late, excused)):
+                column += group_rows
+            if keep_rows:
+                self.rows += course[5]
+
+        self.assignment_group = np.array(assignment_group, dtype=np.intp)
+        self.points = np.array(points, dtype=float)
+        self.score = np.array(scores, dtype=float)  # None -> NaN
+        self.late = np.array(late, dtype=bool)
+        self.excused = np.array(excused, dtype=bool)
+
+    def _flatten_course(self, ci, groups, submissions):
+        submission_map = {s.get("assignment_id"): s for s in submissions if isinstance(s, dict)}
+        assignment_group, points, scores, late, excused, rows = [], [], [], [], [], []
+        names, weights = [], []
+        first_group = len(self.group_course)
+        for gi, g in enumerate(groups):
+            names.append(g["name"])
+            weights.append(g.get("group_weight"))
+            assignments = g.get("assignments") or []
+            subs = [submission_map.get(a["id"], _NO_SUBMISSION) for a in assignments]
+            assignment_group += [first_group + gi] * len(assignments)
+            points += [a.get("points_possible") or 0 for a in assignments]
+            scores += [s.get("score") for s in subs]
+            late += [s.get("late") is True for s in subs]
+            excused += [s.get("excused") is True for s in subs]
+            rows += zip(assignments, subs)
+        # Only commit the course's groups once all of it parsed
+        self.group_course += [ci] * len(names)
+        self.group_name += names
+        self.group_weight += weights
+        return assignment_group, points, scores, late, excused, rows
+
+
+def aggregate(table: AssignmentTable) -> dict:
+    """
+    Every group and category aggregate of `table` in one vectorized pass.
+
+    Per group: earned_points / total_points over graded assignments that are
+    worth points, percent (NaN if none), and assignment / graded / late /
+    excused counts. Per course and standardized category: the mean of that
+    category's non-NaN group percents (a true mean, independent of group
+    order), plus the spread of single-assignment percents and the points
+    graded vs. still to come, for the grade distribution. Returns a dict of
+    NumPy arrays; the "category_*" ones are (n_courses, len(CATEGORIES)).
+    """
+    n_groups = len(table.group_course)
+    g = table.assignment_group
+    graded = ~np.isnan(table.score) & (table.points > 0)
+
+    earned = np.bincount(g, np.where(graded, table.score, 0.0), n_groups)
+    total = np.bincount(g, np.where(graded, table.points, 0.0), n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percent = np.where(total > 0, earned / total * 100, np.nan)
+
+    names = set(table.group_name)
+    category_of = {name: CATEGORIES.index(standardize_category(name)) for name in names}
+    group_category = np.array([category_of[name] for name in table.group_name], dtype=np.intp)
+    cell = np.array(table.group_course, dtype=np.intp) * len(CATEGORIES) + group_category
+    has_percent = ~np.isnan(percent)
+    cells = table.n_courses * len(CATEGORIES)
+    cat_sum = np.bincount(cell, np.where(has_percent, percent, 0.0), cells)
+    cat_count = np.bincount(cell, has_percent.astype(float), cells)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        category_percents = np.where(cat_count > 0, cat_sum / cat_count, np.nan)
+
+    # Per-assignment stats by (course, category) cell
+    shape = (table.n_courses, len(CATEGORIES))
+    a_cell = cell[g]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        a_percent = np.where(graded, table.score / table.points * 100, 0.0)
+    n_scored = np.bincount(a_cell, graded, cells)
+    s1 = np.bincount(a_cell, a_percent, cells)
+    s2 = np.bincount(a_cell, a_percent ** 2, cells)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = np.where(n_scored > 1, (s2 - s1 ** 2 / n_scored) / (n_scored - 1), np.nan)
+    pending = np.isnan(table.score) & ~table.excused & (table.points > 0)
+
+    return {
+        "category_score_count": n_scored.astype(int).reshape(shape),
+        "category_score_sd": np.sqrt(np.maximum(variance, 0.0)).reshape(shape),
+        "category_graded_points": np.bincount(a_cell, np.where(graded, table.points, 0.0), cells).reshape(shape),
+        "category_remaining_points": np.bincount(a_cell, np.where(pending, table.points, 0.0), cells).reshape(shape),
+        "category_remaining_count": np.bincount(a_cell, pending, cells).astype(int).reshape(shape),
+        "earned_points": earned,
+        "total_points": total,
+        "percent": percent,
+        "category": group_category,
+        "assignment_count": np.bincount(g, minlength=n_groups),
+        "graded_count": np.bincount(g, ~np.isnan(table.score), n_groups).astype(int),
+        "late_count": np.bincount(g, table.late, n_groups).astype(int),
+        "excused_count": np.bincount(g, table.excused, n_groups).astype(int),
+        "category_percents": category_percents.reshape(table.n_courses, len(CATEGORIES)),
+    }
+
+
+def _none(values):
+    """Array -> list with NaN as None."""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def aggregate_courses(courses, with_assignments: bool = False):
+    """
+    Aggregate many courses' (assignment_groups, submissions) in one pass.
+
+    Returns one dict per course, in order:
+      "groups": [{category, standardized, weight, earned_points, total_points,
+                  percent, assignment_count, graded_count, late_count,
+                  excused_count[, assignments]}, ...]
+      "standardized_percents": {category: mean group percent | None}
+      "category_stats": {category: {graded, score_sd, graded_points,
+                                    remaining_points, remaining_count}}
+    plus "error" for a course whose data could not be read.
+    """
+    table = AssignmentTable(courses, keep_rows=with_assignments)
+    agg = aggregate(table)
+
+    results = [{"groups": [], "standardized_percents": {}, "category_stats": {}} for _ in courses]
+    for ci, percents in enumerate(agg["category_percents"]):
+        results[ci]["standardized_percents"] = dict(zip(CATEGORIES, _none(percents)))
+        stats = zip(
+            agg["category_score_count"][ci].tolist(), _none(agg["category_score_sd"][ci]),
+            agg["category_graded_points"][ci].tolist(), agg["category_remaining_points"][ci].tolist(),
+            agg["category_remaining_count"][ci].tolist(),
+        )
+        results[ci]["category_stats"] = {
+            cat: {"graded": n, "score_sd": sd, "graded_points": graded, "remaining_points": left,
+                  "remaining_count": left_count}
+            for cat, (n, sd, graded, left, left_count) in zip(CATEGORIES, stats)
+        }
+    for ci, message in table.errors.items():
+        results[ci]["error"] = message
+
+    per_group = None
+    if with_assignments:
+        per_group = [[] for _ in table.group_course]
+        for gi, (a, s) in zip(table.assignment_group.tolist(), table.rows):
+            per_group[gi].append({
+                "id": a["id"],
+                "name": a.get("name"),
+                "points_possible": a.get("points_possible") or 0,
+                "score": s.get("score"),
+                "late": s.get("late"),
+                "excused": s.get("excused"),
+                "html_url": a.get("html_url"),
+            })
+
+    columns = zip(
+        table.group_course, table.group_name, table.group_weight, agg["category"].tolist(),
+        agg["earned_points"].tolist(), agg["total_points"].tolist(), _none(agg["percent"]),
+        agg["assignment_count"].tolist(), agg["graded_count"].tolist(),
+        agg["late_count"].tolist(), agg["excused_count"].tolist(),
+    )
+    for gi, (ci, name, weight, cat, earned, total, percent, n, graded, late, excused) in enumerate(columns):
+        entry = {
+            "category": name,
+            "standardized": CATEGORIES[cat],
+            "weight": weight,
+            "earned_points": earned,
+            "total_points": total,
+            "percent": percent,
+            "assignment_count": n,
+            "graded_count": graded,
+            "late_count": late,
+            "excused_count": excused,
+        }
+        if per_group is not None:
+            entry["assignments"] = per_group[gi]
+        results[ci]["groups"].append(entry)
+    return results
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import threading
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .canvas_client import get_async_canvas_client
+from .canvas_sync import arun_canvas_sync
+from .llm_cache import acached_chat_completion, astream_chat_completion
+from .metrics import record_pipeline, timed
+from .pipeline import Pipeline
+from .storage import apartition_for_request
+from .strengths import compute_strengths
+from .syllabus import parse_grading_breakdown
+from .views import (
+    DEFAULT_WEIGHTS,
+    _ndjson,
+    _sse,
+    advice_request,
+    apply_distribution,
+    category_grades,
+    explanation_request,
+    get_professor_info,
+    load_grade_model,
+    load_prediction_snapshot,
+    load_request_syllabus,
+    needs_llm_weights,
+    normalize_weights,
+    prediction_payload,
+    resolve_course_name,
+    resolve_rmp_pack,
+    score_weights,
+    strengths_request,
+    sync_options,
+    wants_llm_strengths,
+    weights_request,
+)
+
+# Async versions of the Canvas, prediction and explain endpoints, for ASGI
+# servers (uvicorn / daphne backend.asgi:application). Upstream calls go
+# through httpx and AsyncOpenAI, so a worker keeps many requests in flight on
+# one event loop instead of blocking a thread per request. The RMP client
+# and local files have no async API; they run in worker threads.
+
+# ----------------- AsyncOpenAI client -----------------
+# One per event loop (its connection pool is bound to the loop), built on first use
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_async_openai_client():
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        for closed in [lp for lp in _clients if lp.is_closed()]:
+            del _clients[closed]
+        client = _clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            # Retries and timeouts come from llm_cache.OPENAI_POLICY, not the SDK
+            client = _clients[loop] = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return client
+
+
+# ----------------- Request / response helpers -----------------
+def request_data(request):
+    """JSON (or form) body as a dict, or None if it is not one."""
+    if request.content_type == "application/json" or not request.POST:
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST.dict()
+
+
+def bad_body():
+    return JsonResponse({"error": "Request body must be a JSON object."}, status=400)
+
+
+def as_json(response):
+    """A DRF Response returned by a shared helper, as a plain JsonResponse."""
+    return JsonResponse(response.data, status=response.status_code, safe=False)
+
+
+# ----------------- Explain prediction -----------------
+@csrf_exempt
+@require_http_methods(["POST"])
+async def explain_prediction(request):
+    data = request_data(request)
+    if data is None:
+        return bad_body()
+    professor_id = data.get("professor_id")
+
+    async def professor():
+        with timed("rmp"):
+            return await asyncio.to_thread(get_professor_info, professor_id) if professor_id else None
+
+    async def explanation():
+        with timed("explanation"):
+            kwargs = explanation_request(data.get("course"), data.get("predicted_grade"), data.get("factors", []))
+            return (await acached_chat_completion(get_async_openai_client(), **kwargs)).strip()
+
+    explanation_text, professor_info = await asyncio.gather(explanation(), professor())
+    return JsonResponse({"explanation": explanation_text, "professor": professor_info})
+
+
+# ----------------- Canvas -----------------
+@require_http_methods(["GET"])
+async def get_canvas_courses(request):
+    canvas = get_async_canvas_client((await apartition_for_request(request)).canvas_token)
+    courses = await canvas.get_all("/courses", params={"per_page": 100})
+    return JsonResponse(courses, safe=False)
+
+
+@require_http_methods(["GET"])
+async def get_canvas_category_grades(request, course_id: int):
+    canvas = get_async_canvas_client((await apartition_for_request(request)).canvas_token)
+    course_info, groups, submissions = await asyncio.gather(
+        canvas.get(f"/courses/{course_id}"),
+        canvas.get_all(f"/courses/{course_id}/assignment_groups",
+                       params={"include[]": "assignments", "per_page": 100}),
+        canvas.get_all(f"/courses/{course_id}/students/submissions",
+                       params={"student_ids[]": "self", "per_page": 100}),
+    )
+    body, status = category_grades(course_info, groups, submissions)
+    return JsonResponse(body, status=status)
+
+
+@require_http_methods(["GET"])
+async def get_canvas_all_data(request):
+    """Same query params and response as views.get_canvas_all_data."""
+    concurrency, incremental = sync_options(request.GET)
+    partition = await apartition_for_request(request)
+    return JsonResponse(await arun_canvas_sync(concurrency, incremental=incremental, partition=partition),
+                        safe=False)
+
+
+# ----------------- Predict grade -----------------
+async def aresolve_strengths(category_means: dict, use_llm: bool = False) -> dict:
+    """views.resolve_strengths with the LLM call awaited."""
+    strengths = compute_strengths(category_means)
+    if not use_llm:
+        return strengths
+    try:
+        stage = await acached_chat_completion(
+            get_async_openai_client(), **strengths_request(category_means, strengths["overall_strength"])
+        )
+        return json.loads(stage)
+    except Exception as e:
+        return {**strengths, "_note": f"AI strengths fallback due to error: {e}"}
+
+
+async def aresolve_weights(syllabus_text: str, breakdown: dict) -> tuple:
+    """views.resolve_weights with the LLM call awaited."""
+    if not needs_llm_weights(syllabus_text, breakdown):
+        return normalize_weights(breakdown["weights"] or DEFAULT_WEIGHTS), None
+    try:
+        stage2 = await acached_chat_completion(get_async_openai_client(), **weights_request(syllabus_text))
+        return normalize_weights(json.loads(stage2)), None
+    except Exception as e:
+        return normalize_weights(DEFAULT_WEIGHTS), f"AI weights fallback due to error: {e}"
+
+
+async def agenerate_advice(course_name, final: dict, strengths: dict, weights: dict, rmp_pack) -> str:
+    try:
+        kwargs = advice_request(course_name, final, strengths, weights, rmp_pack)
+        return (await acached_chat_completion(get_async_openai_client(), **kwargs)).strip()
+    except Exception as e:
+        return f"(Advice unavailable due to error: {e})"
+
+
+def build_prediction_pipeline(data, snapshot, with_advice: bool = True, syllabus=None, model=None) -> Pipeline:
+    """views.build_prediction_pipeline with coroutine stages, for Pipeline.arun()."""
+    professor_id = data.get("professor_id")
+    canvas_course_id = data.get("canvas_course_id")
+    if syllabus is not None:
+        syllabus_text = syllabus.text
+        parse_syllabus = syllabus.breakdown
+    else:
+        syllabus_text = (data.get("syllabus_text") or "").strip()
+
+        def parse_syllabus():
+            return parse_grading_breakdown(syllabus_text)
+    use_llm_strengths = wants_llm_strengths(data)
+
+    async def strengths():
+        return await aresolve_strengths(dict(snapshot.category_means), use_llm_strengths)
+
+    async def course_name():
+        return resolve_course_name(snapshot, canvas_course_id)
+
+    async def weights(syllabus):
+        return await aresolve_weights(syllabus_text, syllabus)
+
+    async def prediction(strengths, rmp, syllabus, weights):
+        return apply_distribution(score_weights(strengths, rmp, syllabus, model, *weights),
+                                  strengths, snapshot, canvas_course_id, model)
+
+    pipeline = (
+        Pipeline()
+        .stage("strengths", strengths)
+        .stage("rmp", lambda: resolve_rmp_pack(professor_id))
+        .stage("syllabus", parse_syllabus)
+        .stage("weights", weights, deps=("syllabus",))
+        .stage("course_name", course_name)
+        .stage("prediction", prediction, deps=("strengths", "rmp", "syllabus", "weights"))
+    )
+    if with_advice:
+        async def advice(prediction, strengths, rmp, course_name):
+            return await agenerate_advice(course_name, prediction[0], strengths, prediction[1], rmp)
+
+        pipeline.stage("advice", advice, deps=("prediction", "strengths", "rmp", "course_name"))
+    return pipeline
+
+
+async def load_prediction_inputs(request, data):
+    """(syllabus, snapshot, model, None), or (None, None, None, error JsonResponse)."""
+    syllabus, error = await sync_to_async(load_request_syllabus)(data)
+    if error is not None:
+        return None, None, None, as_json(error)
+    partition = await apartition_for_request(request)
+    snapshot, error = await asyncio.to_thread(load_prediction_snapshot, partition)
+    if error is not None:
+        return None, None, None, as_json(error)
+    model = await asyncio.to_thread(load_grade_model, partition, snapshot)
+    return syllabus, snapshot, model, None
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def predict_grade(request):
+    """Same body and response as views.predict_grade."""
+    data = request_data(request)
+    if data is None:
+        return bad_body()
+    syllabus, snapshot, model, error = await load_prediction_inputs(request, data)
+    if error is not None:
+        return error
+
+    pipeline = build_prediction_pipeline(data, snapshot, syllabus=syllabus, model=model)
+    results = await pipeline.arun()
+    record_pipeline(pipeline)
+    return JsonResponse({
+        **prediction_payload(results),
+        "advice": results["advice"],
+        "_pipeline": pipeline.report(),
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def predict_grade_stream(request):
+    """Same body and events as views.predict_grade_stream."""
+    data = request_data(request)
+    if data is None:
+        return bad_body()
+    syllabus, snapshot, model, error = await load_prediction_inputs(request, data)
+    if error is not None:
+        return error
+
+    ndjson = request.GET.get("stream") == "ndjson"
+    encode = _ndjson if ndjson else _sse
+
+    async def events():
+        pipeline = build_prediction_pipeline(data, snapshot, with_advice=False, syllabus=syllabus, model=model)
+        results = await pipeline.arun()
+        record_pipeline(pipeline)
+        yield encode("prediction", {**prediction_payload(results), "_pipeline": pipeline.report()})
+
+        final, weights = results["prediction"]
+        parts = []
+        try:
+            kwargs = advice_request(results["course_name"], final, results["strengths"], weights, results["rmp"])
+            with timed("advice"):
+                async for delta in astream_chat_completion(get_async_openai_client(), **kwargs):
+                    parts.append(delta)
+                    yield encode("advice", {"delta": delta})
+            advice_text = "".join(parts).strip()
+        except Exception as e:
+            advice_text = f"(Advice unavailable due to error: {e})"
+            yield encode("error", {"error": str(e)})
+        yield encode("done", {"advice": advice_text})
+
+    response = StreamingHttpResponse(
+        events(), content_type="application/x-ndjson" if ndjson else "text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,666 @@
+"""
+Offline benchmark harness: local stand-ins for Canvas, OpenAI and RMP plus a
+small load generator. Used by `manage.py bench`; nothing here is imported by
+the views.
+
+The stand-ins are real HTTP servers on 127.0.0.1, so the app talks to them
+through its normal clients (CANVAS_API_URL / OPENAI_BASE_URL) and pays the
+same serialization and connection costs as in production. Each takes a
+latency (seconds, plus optional jitter) and payload-size knobs. A server can
+also proxy to the real upstream and record every exchange to a cassette,
+then replay that cassette offline.
+
+measure_startup() cold-starts fresh worker processes to track boot time.
+"""
+import hashlib
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+import requests
+
+CATEGORY_GROUP_NAMES = ["Homework", "Exams", "Project", "Participation", "Labs", "Quizzes"]
+
+
+# ----------------- Cassettes -----------------
+class Cassette:
+    """
+    Recorded upstream exchanges, keyed by method + path + query + body digest.
+
+    The upstream origin inside recorded Link headers is stored as "{origin}"
+    and swapped for the replaying server's own origin, so pagination keeps
+    working offline. Authorization headers are never stored.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.interactions = {}
+        self.lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path) as f:
+                self.interactions = json.load(f).get("interactions", {})
+
+    @staticmethod
+    def key(method: str, path: str, query: str, body: bytes) -> str:
+        query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+        digest = hashlib.sha1(body or b"").hexdigest()
+        return f"{method} {path}?{query} {digest}"
+
+    def get(self, key):
+        return self.interactions.get(key)
+
+    def put(self, key, status, headers, body: bytes, elapsed: float):
+        with self.lock:
+            self.interactions[key] = {
+                "status": status,
+                "headers": headers,
+                "body": body.decode("utf-8", "replace"),
+                "elapsed": elapsed,
+            }
+
+    def save(self):
+        with self.lock:
+            tmp = self.path.with_name(f"{self.path.name}.tmp")
+            with open(tmp, "w") as f:
+                json.dump({"version": 1, "interactions": self.interactions}, f, indent=1)
+            tmp.replace(self.path)
+
+    def __len__(self):
+        return len(self.interactions)
+
+
+# ----------------- Fake HTTP server base -----------------
+class FakeServer:
+    """
+    Threaded HTTP server on an ephemeral 127.0.0.1 port.
+
+    Subclasses implement `respond(method, path, query, body) -> (status,
+    headers, body_bytes)`. `latency` seconds (+ up to `jitter`) are slept
+    before every response. With `upstream` and `cassette`, requests are
+    proxied to the real service and recorded ("record" mode); with only a
+    cassette they are served from it ("replay" mode, recorded latency unless
+    `latency` is given).
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, cassette=None, upstream=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.cassette = cassette
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def origin(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, payload = fake.dispatch(self.command, self.path, body, dict(self.headers))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if not isinstance(payload, (bytes, bytearray)):
+                    # Streamed body: an iterator of chunks, sent with chunked encoding
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in payload:
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def delay(self, recorded=None):
+        if recorded is not None and not self.latency:
+            time.sleep(recorded)
+            return
+        pause = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if pause > 0:
+            time.sleep(pause)
+
+    def dispatch(self, method, raw_path, body, headers):
+        with self._lock:
+            self.requests += 1
+        split = urlsplit(raw_path)
+        if self.cassette is None:
+            self.delay()
+            return self.respond(method, split.path, split.query, body)
+
+        key = Cassette.key(method, split.path, split.query, body)
+        if self.upstream:
+            return self.record(key, method, raw_path, body, headers)
+        hit = self.cassette.get(key)
+        if hit is None:
+            with self._lock:
+                self.misses += 1
+            return 404, {"Content-Type": "application/json"}, json.dumps({"error": f"Not in cassette: {key}"}).encode()
+        self.delay(hit["elapsed"])
+        out_headers = {k: v.replace("{origin}", self.origin) for k, v in hit["headers"].items()}
+        return hit["status"], out_headers, hit["body"].encode()
+
+    def record(self, key, method, raw_path, body, headers):
+        forward = {k: v for k, v in headers.items() if k.lower() in ("authorization", "content-type", "accept")}
+        start = time.perf_counter()
+        r = requests.request(method, self.upstream + raw_path, data=body or None, headers=forward, timeout=120)
+        elapsed = time.perf_counter() - start
+        kept = {}
+        for name in ("Content-Type", "Link"):
+            if name in r.headers:
+                origin = "{uri.scheme}://{uri.netloc}".format(uri=urlsplit(self.upstream))
+                kept[name] = r.headers[name].replace(origin, "{origin}")
+        self.cassette.put(key, r.status_code, kept, r.content, elapsed)
+        return r.status_code, {k: v.replace("{origin}", self.origin) for k, v in kept.items()}, r.content
+
+    def respond(self, method, path, query, body):
+        raise NotImplementedError
+
+
+def _json(data, status=200, headers=None):
+    return status, {"Content-Type": "application/json", **(headers or {})}, json.dumps(data).encode()
+
+
+# ----------------- Canvas stand-in -----------------
+class FakeCanvas(FakeServer):
+    """
+    The Canvas REST endpoints the app calls, served under /api/v1 with real
+    `Link: rel="next"` pagination, and the GraphQL queries of
+    predictor.canvas_graphql at /api/graphql (dispatched on the operation
+    name, with cursor pagination). Payload size is set by the number of
+    courses, assignment groups per course and assignments per group.
+    """
+
+    API_ROOT = "/api/v1"
+    GRAPHQL_PATH = "/api/graphql"
+    USER_ID = 1
+
+    def __init__(self, courses=12, groups=5, assignments=8, per_page_cap=100, **kwargs):
+        super().__init__(**kwargs)
+        self.per_page_cap = per_page_cap
+        self.courses, self.groups, self.submissions, self.scores = self.build(courses, groups, assignments)
+
+    @property
+    def api_url(self) -> str:
+        return self.origin + self.API_ROOT
+
+    def build(self, n_courses, n_groups, n_assignments):
+        rng = self.random
+        courses, groups, submissions, scores = [], {}, {}, {}
+        for i in range(n_courses):
+            course_id = 1000 + i
+            concluded = i % 3 == 0
+            courses.append({
+                "id": course_id,
+                "name": f"Course {course_id}",
+                "course_code": f"CS {course_id}",
+                "workflow_state": "completed" if concluded else "available",
+                "concluded": concluded,
+                "term": {"name": "Fall 2024" if concluded else "Spring 2025"},
+            })
+            course_groups, course_subs = [], []
+            earned, possible = 0.0, 0.0
+            for g in range(n_groups):
+                assignments = []
+                for a in range(n_assignments):
+                    assignment_id = course_id * 10000 + g * 100 + a
+                    points = rng.choice([10, 20, 50, 100])
+                    assignments.append({
+                        "id": assignment_id,
+                        "name": f"Assignment {g}.{a}",
+                        "points_possible": points,
+                        "html_url": f"https://canvas.example/courses/{course_id}/assignments/{assignment_id}",
+                    })
+                    if rng.random() < 0.85:
+                        score = round(points * rng.uniform(0.55, 1.0), 1)
+                        earned, possible = earned + score, possible + points
+                        course_subs.append({
+                            "assignment_id": assignment_id,
+                            "score": score,
+                            "late": rng.random() < 0.1,
+                            "excused": False,
+                            "workflow_state": "graded",
+                            "graded_at": "2025-01-15T12:00:00Z",
+                            "submitted_at": "2025-01-14T12:00:00Z",
+                        })
+                course_groups.append({
+                    "id": course_id * 100 + g,
+                    "name": CATEGORY_GROUP_NAMES[g % len(CATEGORY_GROUP_NAMES)],
+                    "group_weight": round(100.0 / max(1, n_groups), 2),
+                    "assignments": assignments,
+                })
+            groups[course_id] = course_groups
+            submissions[course_id] = course_subs
+            scores[course_id] = round(100.0 * earned / possible, 2) if possible else None
+        return courses, groups, submissions, scores
+
+    def paginate(self, path, query, items):
+        params = dict(parse_qsl(query, keep_blank_values=True))
+        per_page = min(int(params.get("per_page", 10)), self.per_page_cap)
+        page = int(params.get("page", 1))
+        chunk = items[(page - 1) * per_page: page * per_page]
+        headers = {}
+        if page * per_page < len(items):
+            params.update(page=page + 1, per_page=per_page)
+            headers["Link"] = f'<{self.origin}{path}?{urlencode(params)}>; rel="next"'
+        return _json(chunk, headers=headers)
+
+    def respond(self, method, path, query, body):
+        if path == self.GRAPHQL_PATH and method == "POST":
+            return self.graphql(body)
+        if not path.startswith(self.API_ROOT):
+            return _json({"errors": [{"message": "Not found"}]}, 404)
+        parts = path[len(self.API_ROOT):].strip("/").split("/")
+        if parts == ["courses"]:
+            return self.paginate(path, query, self.courses)
+        if parts == ["users", "self"]:
+            return _json({"id": self.USER_ID, "name": "Bench Student"})
+        try:
+            course_id = int(parts[1])
+        except (IndexError, ValueError):
+            return _json({"errors": [{"message": "Not found"}]}, 404)
+        course = next((c for c in self.courses if c["id"] == course_id), None)
+        if course is None:
+            return _json({"errors": [{"message": "The specified resource does not exist."}]}, 404)
+        if len(parts) == 2:
+            return _json(course)
+        if parts[2] == "enrollments":
+            score = self.scores[course_id]
+            grades = {"current_score": score, "final_score": score, "current_grade": None}
+            return self.paginate(path, query, [{"type": "StudentEnrollment", "grades": grades}])
+        if parts[2] == "assignment_groups":
+            return self.paginate(path, query, self.groups[course_id])
+        if parts[2:] == ["students", "submissions"]:
+            return self.paginate(path, query, self.submissions[course_id])
+        return _json({"errors": [{"message": "Not found"}]}, 404)
+
+    # ----------------- GraphQL -----------------
+    def connection(self, items, variables, convert):
+        first = min(int(variables.get("first") or 10), self.per_page_cap)
+        start = int(variables.get("after") or 0)
+        end = start + first
+        return {
+            "nodes": [convert(item, variables) for item in items[start:end]],
+            "pageInfo": {"hasNextPage": end < len(items), "endCursor": str(end)},
+        }
+
+    @staticmethod
+    def gql_assignment(a, variables):
+        return {"_id": str(a["id"]), "name": a["name"], "pointsPossible": float(a["points_possible"]),
+                "htmlUrl": a["html_url"]}
+
+    def gql_group(self, g, variables):
+        return {"_id": str(g["id"]), "name": g["name"], "groupWeight": g["group_weight"],
+                "assignmentsConnection": self.connection(g["assignments"], {"first": variables.get("first")},
+                                                         self.gql_assignment)}
+
+    @staticmethod
+    def gql_submission(s, variables):
+        return {"assignmentId": str(s["assignment_id"]), "score": s["score"], "late": s["late"],
+                "excused": s["excused"], "state": s["workflow_state"],
+                # Real Canvas answers GraphQL dates in the account's time zone
+                "gradedAt": s["graded_at"].replace("Z", "+00:00"),
+                "submittedAt": s["submitted_at"].replace("Z", "+00:00")}
+
+    def gql_course(self, course_id, variables):
+        course = next(c for c in self.courses if c["id"] == course_id)
+        score = self.scores[course_id]
+        return {
+            "_id": str(course_id),
+            "name": course["name"],
+            "courseCode": course["course_code"],
+            "enrollmentsConnection": {"nodes": [{"grades": {
+                "currentScore": score, "finalScore": score, "currentGrade": None, "finalGrade": None,
+            }}]},
+            "assignmentGroupsConnection": self.connection(self.groups[course_id], variables, self.gql_group),
+            "submissionsConnection": self.connection(self.submissions[course_id], variables, self.gql_submission),
+        }
+
+    def graphql(self, body):
+        try:
+            request = json.loads(body or b"{}")
+            query, variables = request["query"], request.get("variables") or {}
+        except (ValueError, KeyError, TypeError):
+            return _json({"errors": [{"message": "Invalid GraphQL request"}]}, 400)
+        operation = re.search(r"query\s+(\w+)", query)
+        operation = operation.group(1) if operation else None
+        data, errors = {}, []
+
+        def course_or_error(alias, course_id):
+            if course_id in self.groups:
+                return True
+            data[alias] = None
+            errors.append({"message": "not found", "path": [alias]})
+            return False
+
+        if operation == "CourseBatch":
+            for alias, course_id in re.findall(r'(\w+): course\(id: "(\d+)"\) \{ \.\.\.Course \}', query):
+                if course_or_error(alias, int(course_id)):
+                    data[alias] = self.gql_course(int(course_id), variables)
+        elif operation == "Pages":
+            # One aliased connection page per line, the cursor inlined as `after: "..."`
+            for line in query.splitlines():
+                page = re.match(r'\s*(\w+): (course\(id|legacyNode\(_id): "(\d+)".*?(\w+)Connection\('
+                                r'[^)]*after: "(\d+)"\)', line)
+                if not page:
+                    continue
+                alias, owner, owner_id, field, after = page.groups()
+                args = {**variables, "after": after}
+                if owner.startswith("legacyNode"):
+                    group = next((g for gs in self.groups.values() for g in gs if g["id"] == int(owner_id)), None)
+                    data[alias] = group and {
+                        "assignmentsConnection": self.connection(group["assignments"], args, self.gql_assignment)
+                    }
+                elif course_or_error(alias, int(owner_id)):
+                    if field == "assignmentGroups":
+                        items, convert = self.groups[int(owner_id)], self.gql_group
+                    else:
+                        items, convert = self.submissions[int(owner_id)], self.gql_submission
+                    data[alias] = {f"{field}Connection": self.connection(items, args, convert)}
+        else:
+            return _json({"errors": [{"message": f"Unknown operation {operation}"}]})
+        return _json({"data": data, **({"errors": errors} if errors else {})})
+
+
+# ----------------- OpenAI stand-in -----------------
+class FakeOpenAI(FakeServer):
+    """
+    OpenAI-compatible POST /v1/chat/completions, streaming or not.
+
+    JSON-mode requests get a JSON object carrying both the strengths and the
+    prediction fields, so every prompt in views.py parses; other requests get
+    `reply_words` words of filler. Streamed replies are split into
+    `stream_chunks` SSE deltas, `chunk_delay` seconds apart (`latency` is
+    then the time to first token).
+    """
+
+    def __init__(self, reply_words=120, stream_chunks=20, chunk_delay=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.reply_words = reply_words
+        self.stream_chunks = stream_chunks
+        self.chunk_delay = chunk_delay
+
+    @property
+    def api_url(self) -> str:
+        return self.origin + "/v1"
+
+    def content(self, request: dict) -> str:
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps({
+                "category_strengths": {"projects": 88.0, "assignments": 91.0, "exams": 84.0, "participation": 97.0},
+                "overall_strength": 90.0,
+                "punctual_strength": 100.0,
+                "projects": 25.0, "assignments": 35.0, "exams": 35.0, "participation": 5.0,
+                "final_score": 88.1,
+                "margin_of_error": 5.0,
+                "range": [83.1, 93.1],
+            })
+        words = [f"word{i % 50}" for i in range(self.reply_words)]
+        return " ".join(words)
+
+    def respond(self, method, path, query, body):
+        if method != "POST" or not path.endswith("/chat/completions"):
+            return _json({"error": {"message": "Not found"}}, 404)
+        request = json.loads(body or b"{}")
+        content = self.content(request)
+        completion_id = f"chatcmpl-{self.requests}"
+        model = request.get("model", "gpt-4o-mini")
+        if not request.get("stream"):
+            return _json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(body) + len(content)) // 4},
+            })
+
+        step = max(1, -(-len(content) // max(1, self.stream_chunks)))
+        pieces = [content[i:i + step] for i in range(0, len(content), step)]
+
+        def events():
+            for i, piece in enumerate(pieces):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece},
+                                 "finish_reason": "stop" if i == len(pieces) - 1 else None}],
+                }
+                if i and self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return 200, {"Content-Type": "text/event-stream"}, events()
+
+
+# ----------------- RMP stand-in -----------------
+class FakeRMP:
+    """
+    Drop-in for RateMyProfessor_Database_APIs' fetchers. The library talks to
+    a hard-coded GraphQL endpoint, so it is swapped at the function level
+    (see `installed()`) rather than pointed at a local server.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, professors=500, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.professors = {
+            professor_id: SimpleNamespace(
+                legacy_id=professor_id,
+                first_name=f"First{professor_id}",
+                last_name=f"Last{professor_id}",
+                department="Computer Science",
+                avg_rating=round(self.random.uniform(1.5, 5.0), 1),
+                avg_difficulty=round(self.random.uniform(1.5, 5.0), 1),
+                num_ratings=self.random.randint(1, 300),
+                would_take_again_percent=round(self.random.uniform(10, 100), 1),
+            )
+            for professor_id in range(1, professors + 1)
+        }
+
+    def delay(self):
+        pause = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if pause > 0:
+            time.sleep(pause)
+
+    def fetch_a_professor(self, professor_id):
+        self.calls += 1
+        self.delay()
+        prof = self.professors.get(int(professor_id))
+        if prof is None:
+            raise ValueError(f"Professor {professor_id} not found")
+        return prof
+
+    def fetch_all_professors_from_a_school(self, school_id):
+        self.calls += 1
+        self.delay()
+        return list(self.professors.values())
+
+    @contextmanager
+    def installed(self):
+        import RateMyProfessor_Database_APIs as rmp
+
+        saved = rmp.fetch_a_professor, rmp.fetch_all_professors_from_a_school
+        rmp.fetch_a_professor = self.fetch_a_professor
+        rmp.fetch_all_professors_from_a_school = self.fetch_all_professors_from_a_school
+        try:
+            yield self
+        finally:
+            rmp.fetch_a_professor, rmp.fetch_all_professors_from_a_school = saved
+
+
+# ----------------- Load generator -----------------
+def latency_summary(samples_ms, wall_seconds: float, errors: int = 0) -> dict:
+    """p50/p95/p99/mean/max latency (ms) and throughput (requests/s)."""
+    samples = np.asarray(samples_ms, dtype=float)
+    if samples.size == 0:
+        return {"requests": 0, "errors": errors, "throughput_rps": 0.0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "requests": int(samples.size),
+        "errors": errors,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(samples.mean()), 2),
+        "max_ms": round(float(samples.max()), 2),
+        "throughput_rps": round(samples.size / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+def run_load(call, total: int, concurrency: int = 1, warmup: int = 0) -> dict:
+    """
+    Issue `total` calls of `call()` from `concurrency` threads and summarize.
+
+    `call()` returns an HTTP status code; >= 400 or an exception counts as an
+    error (its latency is still recorded). `warmup` calls run first and are
+    not measured.
+    """
+    for _ in range(warmup):
+        call()
+
+    samples, errors = [], [0]
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            failed = call() >= 400
+        except Exception:
+            failed = True
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with lock:
+            samples.append(elapsed)
+            errors[0] += failed
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(total):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(total)))
+    return latency_summary(samples, time.perf_counter() - start, errors[0])
+
+
+# ----------------- Worker startup -----------------
+# Heavy dependencies that should only load when an endpoint needs them
+LAZY_MODULES = ("openai", "pandas", "RateMyProfessor_Database_APIs")
+
+# Runs in a fresh interpreter: boot the WSGI app like a new worker would, serve
+# one request through it, and report phase timings plus which heavy modules loaded.
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from wsgiref.util import setup_testing_defaults
+imported = time.perf_counter()
+application = get_wsgi_application()
+booted = time.perf_counter()
+environ = {"PATH_INFO": sys.argv[1]}
+setup_testing_defaults(environ)
+status = []
+body = b"".join(application(environ, lambda s, h, e=None: status.append(s)))
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000.0,
+    "boot_ms": (booted - start) * 1000.0,
+    "first_request_ms": (served - booted) * 1000.0,
+    "ready_ms": (served - start) * 1000.0,
+    "status": int(status[0].split()[0]),
+    "loaded": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+
+def measure_startup(runs: int = 5, path: str = "/api/health/", cwd=None, env=None) -> dict:
+    """
+    Cold-start `runs` fresh worker processes and summarize their boot.
+
+    Per phase (ms, p50/p95/max): import_ms (Django WSGI imports), boot_ms
+    (through get_wsgi_application), first_request_ms (first request to
+    `path`, which imports the URLconf and views), ready_ms (import to first
+    response) and process_ms (spawn to exit, including interpreter start).
+    "loaded" counts the runs in which each LAZY_MODULES entry was imported.
+    """
+    phases = {}
+    loaded = dict.fromkeys(LAZY_MODULES, 0)
+    errors = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", _STARTUP_SCRIPT, path, *LAZY_MODULES],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+        elapsed = (time.perf_counter() - start) * 1000.0
+        if out.returncode != 0:
+            raise RuntimeError(f"Startup run failed:\n{out.stderr.strip()}")
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        errors += result.pop("status") >= 400
+        for name in result.pop("loaded"):
+            loaded[name] += 1
+        result["process_ms"] = elapsed
+        for phase, ms in result.items():
+            phases.setdefault(phase, []).append(ms)
+
+    summary = {"runs": runs, "errors": errors, "loaded": loaded}
+    for phase, samples in phases.items():
+        p50, p95 = np.percentile(samples, [50, 95])
+        summary[phase] = {
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "max_ms": round(float(max(samples)), 1),
+        }
+    return summary
@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from .aggregation import CATEGORIES
+from .distribution import score_model_from_cache
+
+
+class CacheSnapshot:
+    """
+    Parsed canvas_data_cache.csv plus everything predict_grade derives from
+    it, computed once per file version.
+    """
+
+    def __init__(self, df, stamp):
+        self.df = df
+        self.stamp = stamp
+
+        self.category_means = {}
+        for cat in CATEGORIES:
+            valid = df[cat].dropna() if cat in df.columns else ()
+            self.category_means[cat] = float(valid.mean()) if len(valid) else None
+
+        # course_id -> first row position (duplicates keep the first, like iloc[0])
+        self.row_index = {}
+        if "course_id" in df.columns:
+            for pos, cid in enumerate(df["course_id"].tolist()):
+                if cid is not None and cid == cid:  # skip NaN
+                    self.row_index.setdefault(int(cid), pos)
+
+        names = df["name"].tolist() if "name" in df.columns else [None] * len(df)
+        self.course_names = {cid: names[pos] for cid, pos in self.row_index.items()}
+
+        # Per-category score spread, for the grade distribution
+        self.score_model = score_model_from_cache(df)
+        self.progress = {}
+        for kind, suffix in (("done", "_done"), ("current", ""), ("remaining", "_remaining")):
+            cols = [f"{cat}{suffix}" for cat in CATEGORIES]
+            if all(c in df.columns for c in cols):
+                self.progress[kind] = df[cols].to_numpy(dtype=float)
+
+    def course_progress(self, course_ids):
+        """
+        (done, current, remaining) (n, 4) arrays for
+        distribution.predict_distributions; NaN rows for courses that are not
+        cached (or a cache written before these columns existed).
+        """
+        arrays = np.full((3, len(course_ids), len(CATEGORIES)), np.nan)
+        if len(self.progress) < 3:
+            return arrays
+        for i, course_id in enumerate(course_ids):
+            try:
+                pos = self.row_index.get(int(course_id))
+            except (TypeError, ValueError):
+                continue
+            if pos is not None:
+                for k, kind in enumerate(("done", "current", "remaining")):
+                    arrays[k, i] = self.progress[kind][pos]
+        return arrays
+
+    def course_name(self, course_id):
+        name = self.course_names.get(int(course_id))
+        return None if name is None else str(name)
+
+
+# Snapshots kept in memory at once (one per user partition), least recently used dropped
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "1024"))
+
+_snapshots = OrderedDict()
+_versions = {}
+_lock = threading.Lock()
+
+
+def _key(path) -> str:
+    return str(Path(path).resolve())
+
+
+def bump_cache_version(path):
+    """Called by writers of the cache at `path` so readers reload even within one mtime tick."""
+    key = _key(path)
+    with _lock:
+        _versions[key] = _versions.get(key, 0) + 1
+
+
+def get_cache_snapshot(path) -> CacheSnapshot:
+    """
+    Return the in-memory snapshot of the cache at `path`, reloading it only
+    when the file's mtime/size or its sync version changed.
+    Raises FileNotFoundError if the cache does not exist.
+    """
+    path = Path(path)
+    st = path.stat()
+    key = _key(path)
+    stamp = (st.st_mtime_ns, st.st_size, _versions.get(key, 0))
+
+    with _lock:
+        snap = _snapshots.get(key)
+        if snap is not None and snap.stamp == stamp:
+            _snapshots.move_to_end(key)
+            return snap
+
+    # Parsed outside the lock, so one user's reload never waits on another's.
+    # pandas is imported on first read so worker boot does not pay for it.
+    import pandas as pd
+
+    snap = CacheSnapshot(pd.read_csv(path), stamp)
+
+    with _lock:
+        _snapshots[key] = snap
+        _snapshots.move_to_end(key)
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+            evicted, _ = _snapshots.popitem(last=False)
+            _versions.pop(evicted, None)
+    return snap
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import threading
+import time
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import record_upstream
+from .rate_limit import is_throttled, limiter_for
+from .resilience import RETRYABLE_STATUS, Policy, RetryableStatus, Throttled
+
+# ----------------- Canvas API config -----------------
+CANVAS_API_URL = os.getenv("CANVAS_API_URL", "https://canvas.pitt.edu/api/v1")
+CANVAS_TOKEN = os.getenv("CANVAS_TOKEN")
+# (connect, read) timeout in seconds for every Canvas request
+CANVAS_TIMEOUT = (
+    float(os.getenv("CANVAS_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("CANVAS_READ_TIMEOUT", "30")),
+)
+# Keep-alive connections held open to the Canvas host
+CANVAS_POOL_SIZE = int(os.getenv("CANVAS_POOL_SIZE", "32"))
+# Extra attempts for timeouts / connection errors / 429 / 5xx, and the total
+# seconds one request may take across all of its attempts
+CANVAS_RETRIES = int(os.getenv("CANVAS_RETRIES", "2"))
+CANVAS_DEADLINE = float(os.getenv("CANVAS_DEADLINE", "60"))
+# Send a second copy of a GET still unanswered after this many seconds (0 = off)
+CANVAS_HEDGE_AFTER = float(os.getenv("CANVAS_HEDGE_AFTER", "0"))
+
+CANVAS_POLICY = Policy(
+    "canvas", timeout=CANVAS_TIMEOUT[1], deadline=CANVAS_DEADLINE, retries=CANVAS_RETRIES,
+    hedge_after=CANVAS_HEDGE_AFTER or None,
+)
+
+
+def make_session(pool_size=CANVAS_POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class CanvasClient:
+    """
+    Thin wrapper over a keep-alive requests.Session for the Canvas REST API.
+
+    Paths are relative to the API root ("/courses/123"); absolute URLs (such
+    as `rel="next"` links) are used as-is. The token is sent per request, so
+    clients for different users can share one session and connection pool.
+    Every request goes through `policy` (retries, deadline, circuit breaker,
+    optional hedging; see predictor.resilience) and waits for a slot from
+    the token's rate limiter (predictor.rate_limit), which sizes concurrency
+    to Canvas' X-Rate-Limit-Remaining; throttled requests are retried.
+    """
+
+    def __init__(self, base_url=CANVAS_API_URL, token=CANVAS_TOKEN,
+                 timeout=CANVAS_TIMEOUT, session=None, policy=CANVAS_POLICY, limiter=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.session = session or make_session()
+        self.policy = policy
+        self.limiter = limiter or limiter_for(token)
+
+    def url(self, path: str) -> str:
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    @property
+    def graphql_url(self) -> str:
+        """Canvas serves GraphQL at /api/graphql, next to the REST root (/api/v1)."""
+        root = self.base_url[:-len("/v1")] if self.base_url.endswith("/v1") else self.base_url
+        return f"{root}/graphql"
+
+    def request(self, path, params=None, json=None) -> requests.Response:
+        """GET `path`, or POST `json` to it (GraphQL queries, which only read as well)."""
+        url = self.url(path)
+        connect_timeout, read_timeout = self.timeout
+        send = self.session.get if json is None else partial(self.session.post, json=json)
+
+        def attempt(timeout):
+            sent_at = self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = send(url, params=params, headers=self.headers,
+                                timeout=(connect_timeout, min(read_timeout, timeout)))
+            except requests.RequestException:
+                self.limiter.release(sent_at)
+                record_upstream("canvas", time.perf_counter() - start, ok=False)
+                raise
+            return self.check(response, sent_at, start, response.ok)
+
+        # Every Canvas call here is a read, so it is safe to retry and hedge
+        return self.policy.call(attempt, idempotent=True)
+
+    def check(self, response, sent_at, start, ok):
+        """Release the response's rate-limiter slot and record it; raise for throttled / retryable statuses."""
+        throttled = is_throttled(response.status_code, response.headers,
+                                 response.text if response.status_code == 403 else "")
+        self.limiter.release(sent_at, response.headers, throttled)
+        record_upstream("canvas", time.perf_counter() - start, ok=ok, response_bytes=len(response.content))
+        if throttled:
+            raise Throttled(response)
+        if response.status_code in RETRYABLE_STATUS:
+            raise RetryableStatus(response)
+        return response
+
+    def get(self, path, params=None):
+        """Single request, decoded JSON body."""
+        return self.request(path, params).json()
+
+    def graphql(self, query, variables=None) -> dict:
+        """POST a GraphQL query; the decoded {"data": ..., "errors": [...]} body."""
+        return self.request(self.graphql_url, json={"query": query, "variables": variables or {}}).json()
+
+    def iter_pages(self, path, params=None):
+        """
+        Yield each page's decoded JSON, following `Link: rel="next"` headers.
+        The next link already carries the query string, so params are only
+        sent with the first request.
+        """
+        response = self.request(path, params)
+        while True:
+            yield response.json()
+            next_link = response.links.get("next", {}).get("url")
+            if not next_link:
+                return
+            response = self.request(next_link)
+
+    def get_all(self, path, params=None):
+        """
+        Concatenate every page of a list endpoint. A non-list first page
+        (e.g. a Canvas `{"errors": [...]}` body) is returned unchanged.
+        """
+        items = []
+        for page in self.iter_pages(path, params):
+            if not isinstance(page, list):
+                return page if not items else items
+            items.extend(page)
+        return items
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_canvas_client(token=None) -> CanvasClient:
+    """
+    Client for `token` (default: CANVAS_TOKEN) on the process-wide session,
+    so every view and every user shares one connection pool.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return CanvasClient(token=token or CANVAS_TOKEN, session=_session)
+
+
+# ----------------- Async client (ASGI views) -----------------
+def make_async_session(pool_size=CANVAS_POOL_SIZE):
+    # httpx is only needed by the async views, so WSGI workers never import it
+    import httpx
+
+    return httpx.AsyncClient(limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size))
+
+
+class AsyncCanvasClient(CanvasClient):
+    """
+    CanvasClient over an httpx.AsyncClient: the same paths, paging and
+    policy, but every method is a coroutine, so one event loop can keep
+    hundreds of Canvas requests in flight without a thread each.
+    """
+
+    def __init__(self, base_url=CANVAS_API_URL, token=CANVAS_TOKEN,
+                 timeout=CANVAS_TIMEOUT, session=None, policy=CANVAS_POLICY, limiter=None):
+        super().__init__(base_url, token, timeout, session or make_async_session(), policy, limiter)
+
+    async def request(self, path, params=None, json=None):
+        import httpx
+
+        url = self.url(path)
+        connect_timeout, read_timeout = self.timeout
+        send = self.session.get if json is None else partial(self.session.post, json=json)
+
+        async def attempt(timeout):
+            sent_at = await self.limiter.aacquire()
+            start = time.perf_counter()
+            try:
+                response = await send(
+                    url, params=params, headers=self.headers,
+                    timeout=httpx.Timeout(min(read_timeout, timeout), connect=connect_timeout),
+                )
+            except (httpx.HTTPError, asyncio.CancelledError) as e:
+                # A cancelled request (the losing hedge) gives its slot back too
+                self.limiter.release(sent_at)
+                if isinstance(e, httpx.HTTPError):
+                    record_upstream("canvas", time.perf_counter() - start, ok=False)
+                raise
+            return self.check(response, sent_at, start, response.is_success)
+
+        return await self.policy.acall(attempt, idempotent=True)
+
+    async def get(self, path, params=None):
+        return (await self.request(path, params)).json()
+
+    async def graphql(self, query, variables=None) -> dict:
+        return (await self.request(self.graphql_url, json={"query": query, "variables": variables or {}})).json()
+
+    async def iter_pages(self, path, params=None):
+        response = await self.request(path, params)
+        while True:
+            yield response.json()
+            next_link = response.links.get("next", {}).get("url")
+            if not next_link:
+                return
+            response = await self.request(next_link)
+
+    async def get_all(self, path, params=None):
+        items = []
+        async for page in self.iter_pages(path, params):
+            if not isinstance(page, list):
+                return page if not items else items
+            items.extend(page)
+        return items
+
+
+# One httpx pool per event loop: an AsyncClient cannot be shared across loops
+_async_sessions = {}
+
+
+def get_async_canvas_client(token=None) -> AsyncCanvasClient:
+    """AsyncCanvasClient for `token` on the running event loop's shared connection pool."""
+    loop = asyncio.get_running_loop()
+    with _session_lock:
+        for closed in [lp for lp in _async_sessions if lp.is_closed()]:
+            del _async_sessions[closed]
+        session = _async_sessions.get(loop)
+        if session is None:
+            session = _async_sessions[loop] = make_async_session()
+    return AsyncCanvasClient(token=token or CANVAS_TOKEN, session=session)
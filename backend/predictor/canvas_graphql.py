@@ -0,0 +1,273 @@
+import json
+import os
+from datetime import datetime, timezone
+
+# Bulk fetch over Canvas GraphQL (/api/graphql): one query returns the
+# detail, enrollment grades, assignment groups (with assignments) and
+# submissions of CANVAS_GRAPHQL_BATCH courses, instead of four REST calls per
+# course. Nodes are mapped back to the REST shapes (fetch_course_raw dicts),
+# so canvas_sync builds the same course entries and CSV rows from either.
+
+# ----------------- GraphQL fetch config -----------------
+# Courses per query, and connection page size (Canvas caps it at 100)
+CANVAS_GRAPHQL_BATCH = int(os.getenv("CANVAS_GRAPHQL_BATCH", "10"))
+CANVAS_GRAPHQL_PAGE_SIZE = int(os.getenv("CANVAS_GRAPHQL_PAGE_SIZE", "100"))
+
+PAGE_INFO = "pageInfo { hasNextPage endCursor }"
+# Same states the REST submissions endpoint returns (GraphQL leaves out unsubmitted by default)
+SUBMISSIONS_ARGS = (
+    "studentIds: [$userId], first: $first, filter: {states: [unsubmitted, submitted, pending_review, graded]}"
+)
+
+FRAGMENTS = {
+    "Assignment": "fragment Assignment on Assignment { _id name pointsPossible htmlUrl }",
+    "Group": (
+        "fragment Group on AssignmentGroup { _id name groupWeight "
+        f"assignmentsConnection(first: $first) {{ nodes {{ ...Assignment }} {PAGE_INFO} }} }}"
+    ),
+    "Submission": "fragment Submission on Submission { assignmentId score late excused state gradedAt submittedAt }",
+    "Course": f"""fragment Course on Course {{
+  _id name courseCode
+  enrollmentsConnection(filter: {{types: [StudentEnrollment], userIds: [$userId]}}) {{
+    nodes {{ grades {{ currentGrade currentScore finalGrade finalScore }} }}
+  }}
+  assignmentGroupsConnection(first: $first) {{ nodes {{ ...Group }} {PAGE_INFO} }}
+  submissionsConnection({SUBMISSIONS_ARGS}) {{ nodes {{ ...Submission }} {PAGE_INFO} }}
+}}""",
+}
+
+# Follow-up pages: kind -> (connection field, its arguments, node fragment)
+PAGES = {
+    "groups": ("assignmentGroupsConnection", "first: $first", "Group"),
+    "assignments": ("assignmentsConnection", "first: $first", "Assignment"),
+    "submissions": ("submissionsConnection", SUBMISSIONS_ARGS, "Submission"),
+}
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def batch_query(course_ids) -> str:
+    """One query for several courses, each under its own alias (c0, c1, ...)."""
+    lines = ["query CourseBatch($userId: ID!, $first: Int!) {"]
+    lines += [f"  c{i}: course(id: {json.dumps(str(course_id))}) {{ ...Course }}"
+              for i, course_id in enumerate(course_ids)]
+    lines += ["}"] + [FRAGMENTS[name] for name in ("Course", "Group", "Assignment", "Submission")]
+    return "\n".join(lines)
+
+
+def page_selection(alias, kind, owner_id, cursor) -> str:
+    field, args, fragment = PAGES[kind]
+    connection = f"{field}({args}, after: {json.dumps(cursor)}) {{ nodes {{ ...{fragment} }} {PAGE_INFO} }}"
+    owner_id = json.dumps(str(owner_id))
+    if kind == "assignments":
+        return (f"  {alias}: legacyNode(_id: {owner_id}, type: AssignmentGroup) "
+                f"{{ ... on AssignmentGroup {{ {connection} }} }}")
+    return f"  {alias}: course(id: {owner_id}) {{ {connection} }}"
+
+
+def pages_request(pending, user_id) -> tuple:
+    """
+    (query, variables) for the next page of every pending connection, each
+    under its own alias (p0, p1, ...). Only the fragments and variables in
+    use are declared, as GraphQL requires.
+    """
+    kinds = {kind for _, kind, _, _, _ in pending}
+    variables = {"first": CANVAS_GRAPHQL_PAGE_SIZE}
+    if "submissions" in kinds:
+        variables["userId"] = user_id
+    params = ", ".join(f"${name}: {'Int' if name == 'first' else 'ID'}!" for name in variables)
+    lines = [f"query Pages({params}) {{"]
+    lines += [page_selection(f"p{j}", kind, owner_id, cursor)
+              for j, (_, kind, owner_id, _, cursor) in enumerate(pending)]
+    used = {PAGES[kind][2] for kind in kinds} | ({"Assignment"} if "groups" in kinds else set())
+    lines += ["}"] + [FRAGMENTS[name] for name in ("Group", "Assignment", "Submission") if name in used]
+    return "\n".join(lines), variables
+
+
+def _error_message(body, alias=None) -> str:
+    errors = body.get("errors") if isinstance(body, dict) else None
+    if isinstance(errors, list):
+        for error in errors:
+            if not isinstance(error, dict):
+                continue
+            if alias is None or (error.get("path") or [])[:1] == [alias]:
+                return str(error.get("message") or error)
+    return "The specified resource does not exist." if alias else "Canvas GraphQL returned no data."
+
+
+def _data(body) -> dict:
+    data = body.get("data") if isinstance(body, dict) else None
+    if not isinstance(data, dict):
+        raise GraphQLError(_error_message(body))
+    return data
+
+
+# ----------------- GraphQL nodes -> REST shapes -----------------
+def _legacy_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _utc(value):
+    """GraphQL dates carry the account's UTC offset; REST sends them as UTC ("...Z")."""
+    if not value:
+        return value
+    try:
+        return datetime.fromisoformat(value).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    except (TypeError, ValueError):
+        return value
+
+
+def _assignment(node) -> dict:
+    return {
+        "id": _legacy_id(node.get("_id")),
+        "name": node.get("name"),
+        "points_possible": node.get("pointsPossible"),
+        "html_url": node.get("htmlUrl"),
+    }
+
+
+def _submission(node) -> dict:
+    return {
+        "assignment_id": _legacy_id(node.get("assignmentId")),
+        "score": node.get("score"),
+        "late": node.get("late"),
+        "excused": node.get("excused"),
+        "workflow_state": node.get("state"),
+        "graded_at": _utc(node.get("gradedAt")),
+        "submitted_at": _utc(node.get("submittedAt")),
+    }
+
+
+def _nodes(connection) -> list:
+    return [node for node in (connection or {}).get("nodes") or [] if isinstance(node, dict)]
+
+
+def _next_cursor(connection):
+    info = (connection or {}).get("pageInfo") or {}
+    return info.get("endCursor") if info.get("hasNextPage") else None
+
+
+def take_page(index, kind, connection, items, owner_id, pending):
+    """
+    Append one page of a connection to `items` (a list in course `index`'s
+    raw dict) and queue its next page, and the next page of any nested
+    connection, on `pending` as (index, kind, owner id, items, cursor).
+    """
+    for node in _nodes(connection):
+        if kind != "groups":
+            items.append(_assignment(node) if kind == "assignments" else _submission(node))
+            continue
+        group = {
+            "id": _legacy_id(node.get("_id")),
+            "name": node.get("name"),
+            "group_weight": node.get("groupWeight"),
+            "assignments": [],
+        }
+        items.append(group)
+        take_page(index, "assignments", node.get("assignmentsConnection"), group["assignments"],
+                  node.get("_id"), pending)
+    cursor = _next_cursor(connection)
+    if cursor:
+        pending.append((index, kind, owner_id, items, cursor))
+
+
+def course_raw(index, course, node, pending) -> dict:
+    """fetch_course_raw dict for `course` from its CourseBatch node; its follow-up pages go on `pending`."""
+    enrollments = [
+        {
+            "type": "StudentEnrollment",
+            "grades": {
+                "current_grade": grades.get("currentGrade"),
+                "current_score": grades.get("currentScore"),
+                "final_grade": grades.get("finalGrade"),
+                "final_score": grades.get("finalScore"),
+            },
+        }
+        for grades in (e.get("grades") or {} for e in _nodes(node.get("enrollmentsConnection")))
+    ]
+    raw = {
+        "detail": {"id": _legacy_id(node.get("_id")), "name": node.get("name"), "course_code": node.get("courseCode")},
+        "enrollments": enrollments,
+        "groups": [],
+        "submissions": [],
+        "course": course,
+    }
+    take_page(index, "groups", node.get("assignmentGroupsConnection"), raw["groups"], node.get("_id"), pending)
+    take_page(index, "submissions", node.get("submissionsConnection"), raw["submissions"], node.get("_id"), pending)
+    return raw
+
+
+def batch_results(courses, body) -> tuple:
+    """
+    (results, pending) from a CourseBatch response: a fetch_course_raw dict
+    per course (a GraphQLError for one Canvas did not return) and the
+    follow-up pages still needed to complete them.
+    """
+    data = _data(body)
+    results, pending = [], []
+    for i, course in enumerate(courses):
+        node = data.get(f"c{i}")
+        if isinstance(node, dict):
+            results.append(course_raw(i, course, node, pending))
+        else:
+            results.append(GraphQLError(_error_message(body, f"c{i}")))
+    return results, pending
+
+
+def take_pages(results, pending, body) -> list:
+    """Fold a Pages response into `results`; returns the pages still pending after it."""
+    if not isinstance(body, dict) or not isinstance(body.get("data"), dict):
+        error = GraphQLError(_error_message(body))
+        for index, *_ in pending:
+            results[index] = error
+        return []
+    more = []
+    for j, (index, kind, owner_id, items, _) in enumerate(pending):
+        if isinstance(results[index], Exception):
+            continue
+        node = body["data"].get(f"p{j}")
+        if isinstance(node, dict):
+            take_page(index, kind, node.get(PAGES[kind][0]), items, owner_id, more)
+        else:
+            results[index] = GraphQLError(_error_message(body, f"p{j}"))
+    return [p for p in more if not isinstance(results[p[0]], Exception)]
+
+
+# ----------------- Fetch -----------------
+def fetch_course_batch(canvas, courses, user_id) -> list:
+    """
+    Fetch `courses` with one CourseBatch query, then one Pages query per
+    round of connections longer than a page. Returns one fetch_course_raw
+    dict per course, or the exception that course failed with (like a
+    failed REST call, it fails only that course); raises if the batch
+    query itself failed.
+    """
+    body = canvas.graphql(batch_query([c.get("id") for c in courses]),
+                          {"userId": user_id, "first": CANVAS_GRAPHQL_PAGE_SIZE})
+    results, pending = batch_results(courses, body)
+    while pending:
+        try:
+            body = canvas.graphql(*pages_request(pending, user_id))
+        except Exception as e:
+            body = {"errors": [{"message": str(e)}]}
+        pending = take_pages(results, pending, body)
+    return results
+
+
+async def afetch_course_batch(canvas, courses, user_id) -> list:
+    """fetch_course_batch on an AsyncCanvasClient."""
+    body = await canvas.graphql(batch_query([c.get("id") for c in courses]),
+                                {"userId": user_id, "first": CANVAS_GRAPHQL_PAGE_SIZE})
+    results, pending = batch_results(courses, body)
+    while pending:
+        try:
+            body = await canvas.graphql(*pages_request(pending, user_id))
+        except Exception as e:
+            body = {"errors": [{"message": str(e)}]}
+        pending = take_pages(results, pending, body)
+    return results
@@ -0,0 +1,538 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from pathlib import Path
+
+from .aggregation import aggregate_courses
+from .cache_snapshot import bump_cache_version
+from .canvas_client import get_async_canvas_client, get_canvas_client
+from .canvas_graphql import CANVAS_GRAPHQL_BATCH, afetch_course_batch, fetch_course_batch
+from .grade_model import update_grade_model
+from .storage import DEFAULT_CACHE_PATH, DEFAULT_SYNC_STATE_PATH, partition_for
+
+logger = logging.getLogger(__name__)
+
+# Max Canvas requests in flight during a full sync (1 = sequential)
+CANVAS_CONCURRENCY = int(os.getenv("CANVAS_CONCURRENCY", "8"))
+# "full" re-crawls every course; "incremental" skips concluded/unchanged ones
+CANVAS_SYNC_MODE = os.getenv("CANVAS_SYNC_MODE", "full")
+# "rest" fetches each course with four REST calls; "graphql" fetches
+# CANVAS_GRAPHQL_BATCH courses per GraphQL query (same entries and rows)
+CANVAS_FETCH_BACKEND = os.getenv("CANVAS_FETCH_BACKEND", "rest").lower()
+
+# Format of the course entries and CSV rows kept in the sync state. Bump it
+# whenever course_result changes what it computes: incremental syncs reuse
+# stored entries as-is, so state from an older format must be refetched.
+SYNC_STATE_VERSION = 2
+
+COURSE_LIST_PARAMS = {
+    "enrollment_state[]": ["active", "completed", "invited_or_pending"],
+    "per_page": 100,
+    "include[]": ["term", "concluded"],
+}
+
+
+def list_courses(canvas=None):
+    # With an AsyncCanvasClient this (like fetch_submissions) returns a coroutine
+    return (canvas or get_canvas_client()).get_all("/courses", params=COURSE_LIST_PARAMS)
+
+
+def submissions_fingerprint(submissions) -> str:
+    """
+    Digest of everything in the student's submissions that can move a grade.
+    Unchanged fingerprint => the course's aggregates are unchanged too.
+    """
+    if not isinstance(submissions, list):
+        return ""
+    keys = ("assignment_id", "score", "excused", "late", "workflow_state", "graded_at", "submitted_at")
+    items = sorted(
+        (json.dumps([s.get(k) for k in keys], default=str) for s in submissions if isinstance(s, dict))
+    )
+    return hashlib.sha1("\n".join(items).encode()).hexdigest()
+
+
+def is_concluded(course) -> bool:
+    return bool(course.get("concluded")) or course.get("workflow_state") == "completed"
+
+
+def fetch_submissions(course_id, canvas=None):
+    return (canvas or get_canvas_client()).get_all(f"/courses/{course_id}/students/submissions",
+                                                   params={"student_ids[]": "self", "per_page": 100})
+
+
+def course_calls(canvas, course_id, with_submissions=True) -> dict:
+    """key -> (client method, path, params) for the requests behind one course."""
+    calls = {
+        "detail": (canvas.get, f"/courses/{course_id}", None),
+        "enrollments": (canvas.get_all, f"/courses/{course_id}/enrollments",
+                        {"user_id": "self", "type[]": "StudentEnrollment"}),
+        "groups": (canvas.get_all, f"/courses/{course_id}/assignment_groups",
+                   {"include[]": "assignments", "per_page": 100}),
+    }
+    if with_submissions:
+        calls["submissions"] = (canvas.get_all, f"/courses/{course_id}/students/submissions",
+                                {"student_ids[]": "self", "per_page": 100})
+    return calls
+
+
+def fetch_course_raw(course, submit=None, submissions=None, canvas=None) -> dict:
+    """
+    Fetch one course's detail, enrollments, assignment groups and submissions.
+
+    `submit` is an executor's submit method; when given, the requests are
+    issued concurrently, otherwise they run one after another. Already
+    fetched `submissions` are reused instead of requested again.
+    """
+    canvas = canvas or get_canvas_client()
+    calls = course_calls(canvas, course.get("id"), submissions is None)
+    if submit is None:
+        fetched = {key: fetch(path, params) for key, (fetch, path, params) in calls.items()}
+    else:
+        futures = {key: submit(fetch, path, params) for key, (fetch, path, params) in calls.items()}
+        fetched = {key: f.result() for key, f in futures.items()}
+    if submissions is not None:
+        fetched["submissions"] = submissions
+    fetched["course"] = course
+    return fetched
+
+
+def error_result(course, message):
+    return {"course": {"id": course.get("id"), "name": course.get("name")}, "error": message}, None, None
+
+
+def build_course_results(raws):
+    """
+    Fold fetched courses (fetch_course_raw dicts) into (course_entry, csv_row,
+    submissions_fingerprint) tuples, aggregating all of them in one
+    vectorized pass. A course whose data cannot be read gets an error entry
+    and no row.
+    """
+    aggregates = aggregate_courses([(raw["groups"], raw["submissions"]) for raw in raws])
+    results = []
+    for raw, agg in zip(raws, aggregates):
+        if "error" in agg:
+            results.append(error_result(raw["course"], agg["error"]))
+            continue
+        try:
+            results.append(course_result(raw, agg))
+        except Exception as e:
+            results.append(error_result(raw["course"], str(e)))
+    return results
+
+
+def course_result(raw, agg):
+    course = raw["course"]
+    course_id = course.get("id")
+    term = (course.get("term") or {}).get("name", "")
+    course_info = raw["detail"]
+
+    # Get official grades
+    enrollments = raw["enrollments"]
+    final_grade, final_score = None, None
+    if isinstance(enrollments, list) and len(enrollments) > 0:
+        grades = enrollments[0].get("grades", {})
+        final_grade = grades.get("final_grade") or grades.get("current_grade")
+        final_score = grades.get("final_score") or grades.get("current_score")
+
+    categories = [
+        {key: g[key] for key in ("category", "standardized", "weight", "percent",
+                                 "graded_count", "late_count", "excused_count")}
+        for g in agg["groups"]
+    ]
+    cat_percents = agg["standardized_percents"]
+
+    course_entry = {
+        "id": course_id,
+        "name": course_info.get("name"),
+        "course_code": course_info.get("course_code"),
+        "term": term,
+        "final_grade": final_grade,
+        "final_score": final_score,
+        "categories": categories,
+        "standardized_percents": cat_percents,
+        "category_stats": agg["category_stats"],
+    }
+
+    row = {
+        "course_id": course_id,
+        "name": course_info.get("name"),
+        "course_code": course_info.get("course_code"),
+        "term": term,
+        "final_grade": final_grade,
+        "final_score": final_score,
+        "projects": cat_percents["projects"],
+        "assignments": cat_percents["assignments"],
+        "exams": cat_percents["exams"],
+        "participation": cat_percents["participation"],
+        "concluded": is_concluded(course),
+    }
+    # Share of the grade each category carries: group weights, or points when unweighted
+    group_weights = {cat: 0.0 for cat in cat_percents}
+    for g in agg["groups"]:
+        if isinstance(g["weight"], (int, float)):
+            group_weights[g["standardized"]] += g["weight"]
+    weighted = sum(group_weights.values()) > 0
+    for cat, stats in agg["category_stats"].items():
+        row[f"{cat}_weight"] = (
+            group_weights[cat] if weighted else stats["graded_points"] + stats["remaining_points"]
+        )
+    # Score spread and progress per category, for distribution.score_model_from_cache
+    for cat, stats in agg["category_stats"].items():
+        points = stats["graded_points"] + stats["remaining_points"]
+        row[f"{cat}_sd"] = stats["score_sd"]
+        row[f"{cat}_n"] = stats["graded"]
+        row[f"{cat}_remaining"] = stats["remaining_count"]
+        row[f"{cat}_done"] = stats["graded_points"] / points if points > 0 else None
+    return course_entry, row, submissions_fingerprint(raw["submissions"])
+
+
+def sync_course(course, prior=None, submit=None, canvas=None):
+    """
+    Incremental sync of one course against its `prior` state entry:
+      - concluded courses with a prior result are reused without any request;
+      - otherwise submissions are fetched first, and if their fingerprint
+        matches the prior one the stored result is reused;
+      - only courses whose submissions moved are fully re-fetched.
+    Returns (result, raw): the reused (course_entry, csv_row, fingerprint),
+    or the fetch_course_raw dict still to be aggregated (the other is None).
+    """
+    if prior:
+        if prior.get("concluded") and is_concluded(course):
+            return (prior["entry"], prior["row"], prior["fingerprint"]), None
+        if submit is None:
+            submissions = fetch_submissions(course["id"], canvas)
+        else:
+            submissions = submit(fetch_submissions, course["id"], canvas).result()
+        fingerprint = submissions_fingerprint(submissions)
+        if fingerprint and fingerprint == prior.get("fingerprint"):
+            return (prior["entry"], prior["row"], fingerprint), None
+        return None, fetch_course_raw(course, submit, submissions=submissions, canvas=canvas)
+    return None, fetch_course_raw(course, submit, canvas=canvas)
+
+
+def load_sync_state(path=DEFAULT_SYNC_STATE_PATH) -> dict:
+    """Per-course state (course id -> entry) of the last sync; empty if missing or of another SYNC_STATE_VERSION."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict) or state.get("version") != SYNC_STATE_VERSION:
+        return {}
+    courses = state.get("courses")
+    return courses if isinstance(courses, dict) else {}
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def save_sync_state(state: dict, path=DEFAULT_SYNC_STATE_PATH):
+    path = Path(path)
+    tmp = _tmp_path(path)
+    with open(tmp, "w") as f:
+        json.dump({"version": SYNC_STATE_VERSION, "courses": state}, f)
+    os.replace(tmp, path)
+
+
+def sync_canvas_data(courses, concurrency: int = 1, incremental: bool = False,
+                     state_path=DEFAULT_SYNC_STATE_PATH, progress=None, canvas=None):
+    """
+    Fetch every course and return (all_data, csv_rows) in the same order as
+    `courses`. With concurrency > 1, courses are fetched in parallel and at
+    most `concurrency` Canvas requests are in flight at any time.
+
+    Every run records per-course state at `state_path`; with `incremental`,
+    that state is used to skip concluded and unchanged courses.
+
+    `progress(done, total)` is called after each course is fetched; the
+    fetched courses are then aggregated together in one pass.
+    """
+    courses = [c for c in courses if c.get("id")]
+    state = load_sync_state(state_path) if incremental else {}
+    done = [0]
+    done_lock = threading.Lock()
+
+    def safe_fetch(course, submit=None):
+        try:
+            prior = state.get(str(course["id"]))
+            result = sync_course(course, prior, submit, canvas)
+        except Exception as e:
+            result = error_result(course, str(e)), None
+        if progress is not None:
+            with done_lock:
+                done[0] += 1
+                progress(done[0], len(courses))
+        return result
+
+    if concurrency <= 1:
+        results = [safe_fetch(c) for c in courses]
+    else:
+        # Course workers only wait on request workers, never on each other,
+        # so the two pools cannot deadlock.
+        # Workers run in copies of the caller's context (per-request metrics)
+        def submit(fn, *args):
+            return request_pool.submit(contextvars.copy_context().run, fn, *args)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as request_pool, \
+                ThreadPoolExecutor(max_workers=concurrency) as course_pool:
+            futures = [course_pool.submit(contextvars.copy_context().run, safe_fetch, c, submit) for c in courses]
+            results = [f.result() for f in futures]
+
+    return finish_sync(courses, results, state_path)
+
+
+def finish_sync(courses, results, state_path):
+    """
+    Aggregate the freshly fetched courses among sync_course `results`, save
+    the new sync state and return (all_data, csv_rows).
+    """
+    fetched = [i for i, (_, raw) in enumerate(results) if raw is not None]
+    built = dict(zip(fetched, build_course_results([results[i][1] for i in fetched])))
+    results = [built[i] if i in built else result for i, (result, _) in enumerate(results)]
+
+    new_state = {
+        str(course["id"]): {
+            "concluded": is_concluded(course),
+            "fingerprint": fingerprint,
+            "entry": entry,
+            "row": row,
+        }
+        for course, (entry, row, fingerprint) in zip(courses, results)
+        if row is not None
+    }
+    try:
+        save_sync_state(new_state, state_path)
+    except Exception as e:
+        logger.warning("Sync state write failed for %s: %s", state_path, e)
+
+    all_data = [entry for entry, _, _ in results]
+    csv_rows = [row for _, row, _ in results if row is not None]
+    return all_data, csv_rows
+
+
+# ----------------- Async sync (ASGI views) -----------------
+async def afetch_course_raw(course, submit, submissions=None, canvas=None) -> dict:
+    """fetch_course_raw on an AsyncCanvasClient; `submit(fn, *args)` awaits one limited request."""
+    calls = course_calls(canvas, course.get("id"), submissions is None)
+    values = await asyncio.gather(*(submit(fetch, path, params) for fetch, path, params in calls.values()))
+    fetched = dict(zip(calls, values))
+    if submissions is not None:
+        fetched["submissions"] = submissions
+    fetched["course"] = course
+    return fetched
+
+
+async def async_sync_course(course, prior, submit, canvas):
+    """sync_course on an AsyncCanvasClient."""
+    if prior:
+        if prior.get("concluded") and is_concluded(course):
+            return (prior["entry"], prior["row"], prior["fingerprint"]), None
+        submissions = await submit(fetch_submissions, course["id"], canvas)
+        fingerprint = submissions_fingerprint(submissions)
+        if fingerprint and fingerprint == prior.get("fingerprint"):
+            return (prior["entry"], prior["row"], fingerprint), None
+        return None, await afetch_course_raw(course, submit, submissions=submissions, canvas=canvas)
+    return None, await afetch_course_raw(course, submit, canvas=canvas)
+
+
+async def async_sync_canvas_data(courses, concurrency: int = 1, incremental: bool = False,
+                                 state_path=DEFAULT_SYNC_STATE_PATH, progress=None, canvas=None):
+    """
+    sync_canvas_data on the event loop: every course is fetched at once,
+    with at most `concurrency` Canvas requests in flight, and no threads
+    beyond the final aggregation and file writes.
+    """
+    canvas = canvas or get_async_canvas_client()
+    courses = [c for c in courses if c.get("id")]
+    state = await asyncio.to_thread(load_sync_state, state_path) if incremental else {}
+    limit = asyncio.Semaphore(max(1, concurrency))
+    done = [0]
+
+    async def submit(fn, *args):
+        async with limit:
+            return await fn(*args)
+
+    async def safe_fetch(course):
+        try:
+            result = await async_sync_course(course, state.get(str(course["id"])), submit, canvas)
+        except Exception as e:
+            result = error_result(course, str(e)), None
+        done[0] += 1
+        if progress is not None:
+            progress(done[0], len(courses))
+        return result
+
+    results = await asyncio.gather(*(safe_fetch(c) for c in courses))
+    return await asyncio.to_thread(finish_sync, courses, list(results), state_path)
+
+
+# ----------------- GraphQL bulk sync -----------------
+def graphql_plan(courses, state):
+    """
+    Split courses for a GraphQL sync: (results, batches), where results
+    holds the reused sync_course result of each concluded course with prior
+    state (None for the rest) and batches groups the indices still to fetch.
+    """
+    results = [None] * len(courses)
+    todo = []
+    for i, course in enumerate(courses):
+        prior = state.get(str(course["id"]))
+        if prior and prior.get("concluded") and is_concluded(course):
+            results[i] = (prior["entry"], prior["row"], prior["fingerprint"]), None
+        else:
+            todo.append(i)
+    batch = max(1, CANVAS_GRAPHQL_BATCH)
+    return results, [todo[i:i + batch] for i in range(0, len(todo), batch)]
+
+
+def graphql_result(course, raw, prior):
+    """sync_course result for a course fetched by GraphQL (`raw` is an exception if that failed)."""
+    if isinstance(raw, Exception):
+        return error_result(course, str(raw)), None
+    fingerprint = submissions_fingerprint(raw["submissions"])
+    if prior and fingerprint and fingerprint == prior.get("fingerprint"):
+        return (prior["entry"], prior["row"], fingerprint), None
+    return None, raw
+
+
+def graphql_sync_canvas_data(courses, concurrency: int = 1, incremental: bool = False,
+                             state_path=DEFAULT_SYNC_STATE_PATH, progress=None, canvas=None):
+    """
+    sync_canvas_data over Canvas GraphQL: the courses still to fetch go out
+    CANVAS_GRAPHQL_BATCH per query, up to `concurrency` queries at a time,
+    so a sync costs a handful of requests instead of four per course.
+    """
+    canvas = canvas or get_canvas_client()
+    courses = [c for c in courses if c.get("id")]
+    state = load_sync_state(state_path) if incremental else {}
+    results, batches = graphql_plan(courses, state)
+    done = [len(courses) - sum(map(len, batches))]
+    done_lock = threading.Lock()
+
+    def fetch(batch, user_id):
+        try:
+            if isinstance(user_id, Exception):
+                raise user_id
+            raws = fetch_course_batch(canvas, [courses[i] for i in batch], user_id)
+        except Exception as e:
+            raws = [e] * len(batch)
+        for i, raw in zip(batch, raws):
+            results[i] = graphql_result(courses[i], raw, state.get(str(courses[i]["id"])))
+        if progress is not None:
+            with done_lock:
+                done[0] += len(batch)
+                progress(done[0], len(courses))
+
+    if batches:
+        # Submissions and enrollments are filtered by user id ("self" is REST only)
+        try:
+            user_id = canvas.get("/users/self")["id"]
+        except Exception as e:
+            user_id = e  # fails every course, like each of its REST calls would
+        if concurrency <= 1 or len(batches) <= 1:
+            for batch in batches:
+                fetch(batch, user_id)
+        else:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, fetch, b, user_id) for b in batches]
+                for f in futures:
+                    f.result()
+
+    return finish_sync(courses, results, state_path)
+
+
+async def async_graphql_sync_canvas_data(courses, concurrency: int = 1, incremental: bool = False,
+                                         state_path=DEFAULT_SYNC_STATE_PATH, progress=None, canvas=None):
+    """graphql_sync_canvas_data on an AsyncCanvasClient."""
+    canvas = canvas or get_async_canvas_client()
+    courses = [c for c in courses if c.get("id")]
+    state = await asyncio.to_thread(load_sync_state, state_path) if incremental else {}
+    results, batches = graphql_plan(courses, state)
+    limit = asyncio.Semaphore(max(1, concurrency))
+    done = [len(courses) - sum(map(len, batches))]
+
+    async def fetch(batch, user_id):
+        try:
+            if isinstance(user_id, Exception):
+                raise user_id
+            async with limit:
+                raws = await afetch_course_batch(canvas, [courses[i] for i in batch], user_id)
+        except Exception as e:
+            raws = [e] * len(batch)
+        for i, raw in zip(batch, raws):
+            results[i] = graphql_result(courses[i], raw, state.get(str(courses[i]["id"])))
+        done[0] += len(batch)
+        if progress is not None:
+            progress(done[0], len(courses))
+
+    if batches:
+        try:
+            user_id = (await canvas.get("/users/self"))["id"]
+        except Exception as e:
+            user_id = e
+        await asyncio.gather(*(fetch(b, user_id) for b in batches))
+
+    return await asyncio.to_thread(finish_sync, courses, results, state_path)
+
+
+def write_cache(csv_rows, path=DEFAULT_CACHE_PATH):
+    path = Path(path)
+    tmp = _tmp_path(path)
+    import pandas as pd
+
+    pd.DataFrame(csv_rows).to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    bump_cache_version(path)
+
+
+def run_canvas_sync(concurrency: int = CANVAS_CONCURRENCY, incremental: bool = False, progress=None,
+                    partition=None, backend=None):
+    """
+    List courses, sync them over `backend` (default: CANVAS_FETCH_BACKEND),
+    rewrite the CSV cache of `partition` (default: the single-tenant files);
+    returns the per-course entries.
+    """
+    partition = partition or partition_for()
+    canvas = get_canvas_client(partition.canvas_token)
+    courses = list_courses(canvas)
+    sync = graphql_sync_canvas_data if (backend or CANVAS_FETCH_BACKEND) == "graphql" else sync_canvas_data
+    all_data, csv_rows = sync(
+        courses, concurrency, incremental=incremental, state_path=partition.sync_state_path,
+        progress=progress, canvas=canvas,
+    )
+    store_sync_results(csv_rows, partition)
+    return all_data
+
+
+async def arun_canvas_sync(concurrency: int = CANVAS_CONCURRENCY, incremental: bool = False, progress=None,
+                           partition=None, backend=None):
+    """run_canvas_sync for async views."""
+    partition = partition or partition_for()
+    canvas = get_async_canvas_client(partition.canvas_token)
+    courses = await list_courses(canvas)
+    graphql = (backend or CANVAS_FETCH_BACKEND) == "graphql"
+    sync = async_graphql_sync_canvas_data if graphql else async_sync_canvas_data
+    all_data, csv_rows = await sync(
+        courses, concurrency, incremental=incremental, state_path=partition.sync_state_path,
+        progress=progress, canvas=canvas,
+    )
+    await asyncio.to_thread(store_sync_results, csv_rows, partition)
+    return all_data
+
+
+def store_sync_results(csv_rows, partition):
+    """Rewrite the partition's CSV cache and fold newly concluded courses into its grade model."""
+    try:
+        write_cache(csv_rows, partition.cache_path)
+    except Exception as e:
+        logger.warning("Cache write failed for %s: %s", partition.cache_path, e)
+    try:
+        update_grade_model(partition.grade_model_path, csv_rows)
+    except Exception as e:
+        logger.warning("Grade model update failed for %s: %s", partition.grade_model_path, e)
@@ -0,0 +1,162 @@
+import math
+import os
+
+import numpy as np
+
+from .aggregation import CATEGORIES
+
+# ----------------- Distribution config -----------------
+# Lower bound (percent) of each letter grade, best first
+LETTER_GRADES = [
+    ("A+", 97.0), ("A", 93.0), ("A-", 90.0),
+    ("B+", 87.0), ("B", 83.0), ("B-", 80.0),
+    ("C+", 77.0), ("C", 73.0), ("C-", 70.0),
+    ("D+", 67.0), ("D", 63.0), ("D-", 60.0),
+    ("F", 0.0),
+]
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+# Standard normal quantiles for PERCENTILES
+_Z = np.array([-1.6448536, -1.2815516, -0.6744898, 0.0, 0.6744898, 1.2815516, 1.6448536])
+
+# Used while the cache holds too little history to estimate them
+# How far one assignment's percent strays from the student's category mean
+DEFAULT_ASSIGNMENT_SD = float(os.getenv("DEFAULT_ASSIGNMENT_SD", "12"))
+# How far a category's course average strays from course to course
+DEFAULT_COURSE_SD = float(os.getenv("DEFAULT_COURSE_SD", "5"))
+# Graded items per category in a typical course
+DEFAULT_ITEM_COUNTS = {"projects": 3, "assignments": 10, "exams": 3, "participation": 10}
+# Correlation of the course-level swings across categories (a hard course is hard throughout)
+COURSE_CORRELATION = float(os.getenv("COURSE_CORRELATION", "0.5"))
+# Spread left in a final score even once every graded item is known (curves,
+# rounding, items not in Canvas yet); the grade model's residual SD if larger
+MIN_PREDICTION_SD = float(os.getenv("MIN_PREDICTION_SD", "2"))
+
+
+def _column(df, name):
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    return df[name].to_numpy(dtype=float)
+
+
+def score_model_from_cache(df) -> dict:
+    """
+    The student's score spread per category, from the Canvas cache rows:
+      "assignment_sd": pooled SD of single-assignment percents within a course
+                       ({cat}_sd / {cat}_n columns),
+      "course_sd":     SD of the category average across courses,
+      "item_count":    median graded + remaining items per course.
+    Each is a length-4 array in CATEGORIES order, with defaults where the
+    history is too thin (caches from before these columns existed included).
+    """
+    assignment_sd = np.full(len(CATEGORIES), DEFAULT_ASSIGNMENT_SD)
+    course_sd = np.full(len(CATEGORIES), DEFAULT_COURSE_SD)
+    item_count = np.array([DEFAULT_ITEM_COUNTS[c] for c in CATEGORIES], dtype=float)
+
+    for i, cat in enumerate(CATEGORIES):
+        sd, n = _column(df, f"{cat}_sd"), _column(df, f"{cat}_n")
+        ok = ~np.isnan(sd) & (n > 1)
+        dof = (n[ok] - 1).sum()
+        if dof >= 5:
+            assignment_sd[i] = math.sqrt(((n[ok] - 1) * sd[ok] ** 2).sum() / dof)
+
+        means = _column(df, cat)
+        means = means[~np.isnan(means)]
+        if len(means) >= 3:
+            course_sd[i] = max(1.0, float(means.std(ddof=1)))
+
+        items = n + np.nan_to_num(_column(df, f"{cat}_remaining"))
+        items = items[~np.isnan(items) & (items > 0)]
+        if len(items):
+            item_count[i] = float(np.median(items))
+
+    return {"assignment_sd": assignment_sd, "course_sd": course_sd, "item_count": item_count}
+
+
+def _normal_cdf(x):
+    return 0.5 * (1.0 + np.vectorize(math.erf, otypes=[float])(np.asarray(x, dtype=float) / math.sqrt(2.0)))
+
+
+def predict_distributions(centers, weights, strengths, model, done=None, current=None, remaining=None,
+                          noise_sd=None) -> dict:
+    """
+    Closed-form predictive distribution of the final score for n courses.
+
+    centers:   (n,) point predictions (score_prediction's final_score);
+    weights:   (n, 4) syllabus weights in CATEGORIES order, summing to 100;
+    strengths: (4,) category strengths the centers were computed from;
+    model:     score_model_from_cache output.
+    For courses already under way (NaN / None = not started):
+    done:      (n, 4) fraction of each category's points already graded,
+    current:   (n, 4) the category percent so far,
+    remaining: (n, 4) assignments still to be graded.
+    noise_sd:  SD of the final score around its prediction (GradeModel.residual_sd),
+               at least MIN_PREDICTION_SD.
+
+    The graded part of a category is known; the rest is the student's
+    strength plus a course-level swing (correlated across categories) and
+    the average of the remaining assignments' noise, so the final score is
+    normal, with noise_sd on top so its spread never reaches zero. Returns arrays: "mean", "sd", "percentiles" (n, len(PERCENTILES))
+    and "letter_probabilities" (n, len(LETTER_GRADES)); scores are clamped
+    to 0-100, which leaves letter probabilities unchanged.
+    """
+    weights = np.asarray(weights, dtype=float) / 100.0
+    n = len(weights)
+    strengths = np.asarray(strengths, dtype=float)
+    done = np.zeros((n, 4)) if done is None else np.nan_to_num(np.asarray(done, dtype=float))
+    done = np.clip(done, 0.0, 1.0)
+    current = np.full((n, 4), np.nan) if current is None else np.asarray(current, dtype=float)
+    has_current = ~np.isnan(current)
+    done = np.where(has_current, done, 0.0)
+
+    # Known (graded) part replaces the strength-based expectation
+    shift = (weights * done * np.where(has_current, current - strengths, 0.0)).sum(axis=1)
+    mean = np.asarray(centers, dtype=float) + shift
+
+    open_share = weights * (1.0 - done)
+    items = np.broadcast_to(model["item_count"], (n, 4)).astype(float)
+    if remaining is not None:
+        remaining = np.asarray(remaining, dtype=float)
+        items = np.where(has_current & ~np.isnan(remaining), remaining, items)
+    course_sd = model["course_sd"]
+    course_cov = np.outer(course_sd, course_sd) * (COURSE_CORRELATION + (1 - COURSE_CORRELATION) * np.eye(4))
+    assignment_var = np.divide(model["assignment_sd"] ** 2, items, out=np.zeros((n, 4)), where=items > 0)
+    variance = np.einsum("nc,cd,nd->n", open_share, course_cov, open_share)
+    variance += (open_share ** 2 * assignment_var).sum(axis=1)
+    variance += max(MIN_PREDICTION_SD, noise_sd or 0.0) ** 2
+    sd = np.sqrt(variance)
+
+    percentiles = np.clip(mean[:, None] + sd[:, None] * _Z, 0.0, 100.0)
+
+    bounds = np.array([b for _, b in LETTER_GRADES[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (bounds[None, :] - mean[:, None]) / sd[:, None]
+    # P(score >= bound) for each letter's lower bound; a zero-width distribution is a step
+    at_least = np.where(sd[:, None] > 0, 1.0 - _normal_cdf(np.nan_to_num(z)), (mean[:, None] >= bounds).astype(float))
+    at_least = np.hstack([at_least, np.ones((n, 1))])
+    letter_probabilities = np.diff(np.hstack([np.zeros((n, 1)), at_least]), axis=1)
+
+    return {
+        "mean": np.clip(mean, 0.0, 100.0),
+        "sd": sd,
+        "percentiles": percentiles,
+        "letter_probabilities": letter_probabilities,
+    }
+
+
+def distribution_fields(dist: dict, i: int = 0) -> dict:
+    """Response fields for row `i` of predict_distributions: margin, range and "distribution"."""
+    pct = dist["percentiles"][i]
+    low, high = float(pct[0]), float(pct[-1])
+    probs = {letter: round(float(p), 4) for (letter, _), p in zip(LETTER_GRADES, dist["letter_probabilities"][i])}
+    return {
+        # 90% interval (5th-95th percentile)
+        "margin_of_error": round((high - low) / 2.0, 2),
+        "range": [round(low, 2), round(high, 2)],
+        "distribution": {
+            "mean": round(float(dist["mean"][i]), 2),
+            "sd": round(float(dist["sd"][i]), 2),
+            "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, pct)},
+            "letter_probabilities": probs,
+            "most_likely_letter": max(probs, key=probs.get),
+        },
+    }
@@ -0,0 +1,235 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from .aggregation import CATEGORIES
+
+# ----------------- Grade model config -----------------
+# Ridge penalty pulling the learned correction toward zero (= the plain weighted average)
+GRADE_MODEL_RIDGE = float(os.getenv("GRADE_MODEL_RIDGE", "10"))
+# Models kept in memory at once (one per user partition), least recently used dropped
+GRADE_MODEL_CACHE_SIZE = int(os.getenv("GRADE_MODEL_CACHE_SIZE", "1024"))
+
+FEATURES = ["intercept", "base"] + [f"{cat}_offset" for cat in CATEGORIES]
+# Percent the "base" feature is centered on, so the intercept means "at a typical grade"
+BASE_CENTER = 85.0
+
+
+def features(percents, weights) -> tuple:
+    """
+    Design matrix for n courses from their category percents (n, 4; NaN =
+    nothing graded in that category) and category weights (n, 4; any scale).
+
+    "base" is the weighted average of the graded categories (what the rule
+    table scores); the other features are the intercept and each category's
+    offset from base. Returns (X (n, len(FEATURES)), base (n,)).
+    """
+    percents = np.asarray(percents, dtype=float)
+    has = ~np.isnan(percents)
+    w = np.where(has, np.nan_to_num(np.asarray(weights, dtype=float)), 0.0)
+    total = w.sum(axis=1, keepdims=True)
+    w = np.divide(w, total, out=np.zeros_like(w), where=total > 0)
+    base = (w * np.nan_to_num(percents)).sum(axis=1)
+    offsets = np.where(has, percents - base[:, None], 0.0)
+    X = np.column_stack([np.ones(len(base)), base - BASE_CENTER, offsets])
+    return X, base
+
+
+class GradeModel:
+    """
+    Ridge regression of a course's final score on its category percents,
+    fitted to the student's own completed courses.
+
+    It predicts the correction to the weighted average (final score - base),
+    so an untrained model predicts exactly the weighted average. Only the
+    sufficient statistics (XᵀX, Xᵀy) are kept: adding courses is a rank-n
+    update, never a refit over the history, and each course counts once.
+    """
+
+    def __init__(self, xtx=None, xty=None, yty=0.0, course_ids=()):
+        k = len(FEATURES)
+        self.xtx = np.zeros((k, k)) if xtx is None else np.asarray(xtx, dtype=float)
+        self.xty = np.zeros(k) if xty is None else np.asarray(xty, dtype=float)
+        self.yty = float(yty)
+        self.course_ids = {int(c) for c in course_ids}
+        self._coef = None
+
+    @property
+    def rows(self) -> int:
+        return len(self.course_ids)
+
+    def add(self, course_ids, percents, weights, final_scores) -> int:
+        """Fold completed courses in, skipping ones already seen or unusable; returns how many were added."""
+        percents = np.asarray(percents, dtype=float).reshape(-1, len(CATEGORIES))
+        weights = np.asarray(weights, dtype=float).reshape(-1, len(CATEGORIES))
+        X, base = features(percents, weights)
+        y = np.asarray(final_scores, dtype=float) - base
+        usable = ~np.isnan(y) & (~np.isnan(percents) & (np.nan_to_num(weights) > 0)).any(axis=1)
+
+        keep = []
+        for i, course_id in enumerate(course_ids):
+            if usable[i] and int(course_id) not in self.course_ids:
+                self.course_ids.add(int(course_id))
+                keep.append(i)
+        if keep:
+            X, y = X[keep], y[keep]
+            self.xtx += X.T @ X
+            self.xty += X.T @ y
+            self.yty += float(y @ y)
+            self._coef = None
+        return len(keep)
+
+    def coefficients(self) -> np.ndarray:
+        if self._coef is None:
+            penalty = GRADE_MODEL_RIDGE * np.eye(len(FEATURES))
+            self._coef = np.linalg.solve(self.xtx + penalty, self.xty)
+        return self._coef
+
+    def predict(self, percents, weights) -> np.ndarray:
+        """Predicted final score for n courses (same inputs as features)."""
+        X, base = features(percents, weights)
+        return base + X @ self.coefficients()
+
+    def residual_sd(self):
+        """RMS training error of the fitted correction, or None before any course is added."""
+        if not self.rows:
+            return None
+        coef = self.coefficients()
+        sse = self.yty - 2.0 * coef @ self.xty + coef @ self.xtx @ coef
+        return math.sqrt(max(0.0, float(sse)) / self.rows)
+
+    def to_dict(self) -> dict:
+        return {
+            "features": FEATURES,
+            "rows": self.rows,
+            "coefficients": self.coefficients().tolist(),
+            "residual_sd": self.residual_sd(),
+            "xtx": self.xtx.tolist(),
+            "xty": self.xty.tolist(),
+            "yty": self.yty,
+            "course_ids": sorted(self.course_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GradeModel":
+        if data.get("features") != FEATURES:
+            raise ValueError("grade model was trained on different features")
+        try:
+            return cls(data["xtx"], data["xty"], data["yty"], data["course_ids"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"malformed grade model: {e}") from None
+
+
+# ----------------- Training data -----------------
+def _number(value) -> float:
+    try:
+        return float("nan") if value is None else float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def training_arrays(rows) -> tuple:
+    """
+    (course_ids, percents, weights, final_scores) from Canvas cache rows
+    (canvas_sync csv rows or cache DataFrame records), keeping concluded
+    courses only: an in-progress course's score is not final yet. Rows
+    without per-category weights weigh the graded categories equally.
+    """
+    ids, percents, weights, finals = [], [], [], []
+    for row in rows:
+        if _number(row.get("concluded")) != 1.0:  # False, missing or NaN
+            continue
+        course_id = _number(row.get("course_id"))
+        if math.isnan(course_id):
+            continue
+        w = [_number(row.get(f"{cat}_weight")) for cat in CATEGORIES]
+        ids.append(int(course_id))
+        percents.append([_number(row.get(cat)) for cat in CATEGORIES])
+        weights.append([1.0] * len(CATEGORIES) if all(math.isnan(v) for v in w) else w)
+        finals.append(_number(row.get("final_score")))
+    return ids, percents, weights, finals
+
+
+# ----------------- Persistence -----------------
+def load_grade_model(path) -> GradeModel:
+    """The model stored at `path` (an untrained one if there is none); raises ValueError if unreadable."""
+    try:
+        with open(path) as f:
+            return GradeModel.from_dict(json.load(f))
+    except FileNotFoundError:
+        return GradeModel()
+
+
+def save_grade_model(model: GradeModel, path):
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(model.to_dict(), f)
+    os.replace(tmp, path)
+
+
+def update_grade_model(path, rows) -> GradeModel:
+    """
+    Fold the concluded courses among `rows` that the model at `path` has not
+    seen into it, saving it only if something was added. Called after every
+    sync, so retraining costs one small update per newly completed course.
+    """
+    try:
+        model = load_grade_model(path)
+    except ValueError:
+        # Unreadable or trained on other features: start over from the full cache
+        model = GradeModel()
+    if model.add(*training_arrays(rows)):
+        save_grade_model(model, path)
+    return model
+
+
+# ----------------- In-memory models -----------------
+_models = OrderedDict()
+_lock = threading.Lock()
+
+
+def _stamp(path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def get_grade_model(path, df=None) -> GradeModel:
+    """
+    The model stored at `path`, reloaded only when the file changes. With no
+    usable file, a partition synced before the model existed is trained once
+    from its cache DataFrame `df`.
+    """
+    path = Path(path)
+    key = str(path.resolve())
+    stamp = _stamp(path)
+    with _lock:
+        entry = _models.get(key)
+        if entry is not None and entry[0] == stamp:
+            _models.move_to_end(key)
+            return entry[1]
+
+    try:
+        model = load_grade_model(path) if stamp is not None else None
+    except ValueError:
+        model = None
+    if model is None:
+        model = GradeModel()
+        if df is not None and model.add(*training_arrays(df.to_dict("records"))):
+            save_grade_model(model, path)
+            stamp = _stamp(path)
+
+    with _lock:
+        _models[key] = (stamp, model)
+        _models.move_to_end(key)
+        while len(_models) > GRADE_MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+    return model
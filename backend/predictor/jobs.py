@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .canvas_sync import run_canvas_sync
+from .models import SyncJob
+from .storage import partition_from_key
+
+# Start a worker thread inside the web process when a job is queued.
+# Disable when running `manage.py run_sync_worker` as a separate process.
+SYNC_WORKER_INPROCESS = os.getenv("SYNC_WORKER_INPROCESS", "1").lower() in ("1", "true", "yes")
+# A running job not updated for this long is assumed dead (worker crashed) and requeued
+SYNC_JOB_STALE_SECONDS = float(os.getenv("SYNC_JOB_STALE_SECONDS", "600"))
+# Min seconds between progress writes, to keep SQLite write traffic down
+PROGRESS_INTERVAL = 0.5
+# Lookup/create rounds before enqueue gives up on a user whose jobs keep finishing under it
+ENQUEUE_ATTEMPTS = 3
+
+_worker = None
+_worker_lock = threading.Lock()
+# Canvas tokens of this process's per-user jobs (job pk -> token). They are
+# secrets, so they are never written to the job table: only the process that
+# holds a job's token claims it, and a restart loses it (see requeue_stale_jobs).
+_job_tokens = {}
+_job_tokens_lock = threading.Lock()
+
+
+def _lost_enqueue_race(error: IntegrityError) -> bool:
+    """Whether `error` violates one_active_sync_job_per_owner (SQLite names the column instead)."""
+    message = str(error)
+    return "one_active_sync_job_per_owner" in message or f"{SyncJob._meta.db_table}.owner" in message
+
+
+def enqueue_sync_job(partition, concurrency: int, mode: str):
+    """
+    Return (job, created). Coalesces onto the user's queued/running job if
+    there is one, so repeated sync clicks do not stack up crawls.
+
+    A per-user job runs on this process's worker thread whatever
+    SYNC_WORKER_INPROCESS says, since only this process holds its token.
+    """
+    active = SyncJob.objects.filter(owner=partition.key, status__in=SyncJob.ACTIVE)
+    for _ in range(ENQUEUE_ATTEMPTS):
+        job = active.first()
+        if job is not None:
+            created = False
+            break
+        try:
+            with transaction.atomic():
+                job = SyncJob.objects.create(owner=partition.key, concurrency=concurrency, mode=mode)
+            created = True
+            break
+        except IntegrityError as e:
+            # A concurrent request queued the user's job first: look again and
+            # coalesce onto it. Any other violation is a bad job, not a race.
+            if not _lost_enqueue_race(e):
+                raise
+    else:
+        raise RuntimeError(f"Could not queue a sync job for {partition.key} after {ENQUEUE_ATTEMPTS} attempts")
+    if partition.canvas_token and job.status == SyncJob.QUEUED:
+        # Also adopts a queued job whose token was lost with its process
+        with _job_tokens_lock:
+            _job_tokens[job.pk] = partition.canvas_token
+    if SYNC_WORKER_INPROCESS or partition.canvas_token:
+        ensure_worker()
+    return job, created
+
+
+def requeue_stale_jobs():
+    cutoff = timezone.now() - timedelta(seconds=SYNC_JOB_STALE_SECONDS)
+    stale = SyncJob.objects.filter(status=SyncJob.RUNNING, updated_at__lt=cutoff)
+    # A dead worker took the user's token with it: they have to start the sync again
+    stale.exclude(owner="default").update(
+        status=SyncJob.FAILED, error="The sync worker stopped; start the sync again.", finished_at=timezone.now()
+    )
+    stale.update(status=SyncJob.QUEUED)
+
+
+def claimable_jobs():
+    """Queued jobs this process can run: shared-token jobs, and per-user jobs whose token it holds."""
+    with _job_tokens_lock:
+        held = list(_job_tokens)
+    return SyncJob.objects.filter(status=SyncJob.QUEUED).filter(Q(owner="default") | Q(pk__in=held))
+
+
+def claim_next_job():
+    """Atomically move the oldest claimable job to running; None if there is none."""
+    for job in claimable_jobs().order_by("created_at")[:5]:
+        claimed = SyncJob.objects.filter(pk=job.pk, status=SyncJob.QUEUED).update(
+            status=SyncJob.RUNNING, started_at=timezone.now(), updated_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_job(job: SyncJob):
+    last_write = [0.0]
+
+    def progress(done, total):
+        now = time.monotonic()
+        if done == total or now - last_write[0] >= PROGRESS_INTERVAL:
+            last_write[0] = now
+            SyncJob.objects.filter(pk=job.pk).update(
+                courses_done=done, courses_total=total, updated_at=timezone.now()
+            )
+
+    with _job_tokens_lock:
+        token = _job_tokens.pop(job.pk, None)
+    partition = partition_from_key(job.owner, token)
+    try:
+        result = run_canvas_sync(
+            job.concurrency, incremental=job.mode == "incremental", progress=progress, partition=partition
+        )
+        SyncJob.objects.filter(pk=job.pk).update(
+            status=SyncJob.SUCCEEDED, result=result, finished_at=timezone.now()
+        )
+    except Exception as e:
+        SyncJob.objects.filter(pk=job.pk).update(
+            status=SyncJob.FAILED, error=str(e), finished_at=timezone.now()
+        )
+
+
+def work(stop_when_empty: bool = True, poll_seconds: float = 2.0):
+    """Process queued jobs one at a time."""
+    requeue_stale_jobs()
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+        if job is not None:
+            run_job(job)
+            continue
+        if stop_when_empty:
+            return
+        time.sleep(poll_seconds)
+
+
+def _worker_main():
+    global _worker
+    try:
+        while True:
+            work(stop_when_empty=True)
+            # Re-check under the lock: a job queued after the last claim must
+            # either be seen here or find _worker cleared in ensure_worker().
+            with _worker_lock:
+                if not claimable_jobs().exists():
+                    _worker = None
+                    return
+    except Exception:
+        with _worker_lock:
+            _worker = None
+        raise
+    finally:
+        close_old_connections()
+
+
+def ensure_worker():
+    """Start the in-process worker thread unless one is already draining the queue."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_main, name="canvas-sync-worker", daemon=True)
+            _worker.start()
@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .metrics import record_llm_cache, record_tokens, record_upstream
+from .resilience import Policy
+
+logger = logging.getLogger(__name__)
+
+# ----------------- LLM response cache config -----------------
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# ----------------- OpenAI call policy -----------------
+# Per-attempt timeout (seconds) and extra attempts for timeouts / 429 / 5xx.
+# The client itself is built with max_retries=0 so retries are not doubled.
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_RETRIES = int(os.getenv("OPENAI_RETRIES", "1"))
+
+OPENAI_POLICY = Policy("openai", timeout=OPENAI_TIMEOUT, retries=OPENAI_RETRIES)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+"""
+
+
+class LLMCache:
+    """
+    Content-addressed store of chat completion texts, keyed on the model,
+    messages and every other request parameter. Entries expire after `ttl`
+    seconds; past `max_entries` / `max_bytes` the least recently used go.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL,
+                 max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(**request) -> str:
+        payload = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _count(self, attr, n=1):
+        with self._counter_lock:
+            setattr(self, attr, getattr(self, attr) + n)
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT content FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return row[0]
+
+    def put(self, key, content: str):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, content, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, content, len(content.encode()), now, now),
+        )
+        self.evict(now)
+
+    def evict(self, now=None):
+        conn = self._conn()
+        now = now or time.time()
+        removed = conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,)).rowcount
+        removed += conn.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        removed += conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM "
+            "(SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS running FROM responses) "
+            "WHERE running > ?)",
+            (self.max_bytes,),
+        ).rowcount
+        if removed:
+            self._count("evictions", removed)
+
+    def stats(self) -> dict:
+        entries, size = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else None,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
+
+
+def _lookup(cache, key):
+    try:
+        content = cache.get(key)
+    except sqlite3.Error as e:
+        logger.warning("LLM cache read failed: %s", e)
+        content = None
+    record_llm_cache(content is not None)
+    return content
+
+
+def _store(cache, key, content):
+    try:
+        cache.put(key, content)
+    except sqlite3.Error as e:
+        logger.warning("LLM cache write failed: %s", e)
+
+
+def _create_completion(client, request):
+    """The live API call under OPENAI_POLICY, with latency and token usage recorded."""
+    def attempt(timeout):
+        start = time.perf_counter()
+        try:
+            completion = client.chat.completions.create(timeout=timeout, **request)
+        except Exception:
+            record_upstream("openai", time.perf_counter() - start, ok=False)
+            raise
+        record_upstream("openai", time.perf_counter() - start)
+        record_tokens(request.get("model", ""), completion.usage)
+        return completion
+
+    return OPENAI_POLICY.call(attempt)
+
+
+def cached_chat_completion(client, **request) -> str:
+    """
+    client.chat.completions.create(**request), returning the first choice's
+    message content and serving identical requests from the cache.
+    """
+    if not LLM_CACHE_ENABLED:
+        return _create_completion(client, request).choices[0].message.content
+
+    cache = get_llm_cache()
+    key = cache.make_key(**request)
+    content = _lookup(cache, key)
+    if content is not None:
+        return content
+
+    completion = _create_completion(client, request)
+    content = completion.choices[0].message.content
+    if content is not None:
+        _store(cache, key, content)
+    return content
+
+
+def stream_chat_completion(client, **request):
+    """
+    Streaming variant of cached_chat_completion: yields text deltas as the
+    API produces them. Shares cache entries with the non-streaming call; a
+    hit is yielded as a single delta.
+    """
+    cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+    key = cache.make_key(**request) if cache else None
+    if cache:
+        content = _lookup(cache, key)
+        if content is not None:
+            yield content
+            return
+
+    parts = []
+    start = time.perf_counter()
+    ok = False
+    try:
+        # include_usage adds a final chunk with token counts (and no choices).
+        # Only opening the stream is retried; a stream that breaks midway is not.
+        stream = OPENAI_POLICY.call(lambda timeout: client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, timeout=timeout, **request
+        ))
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                record_tokens(request.get("model", ""), chunk.usage)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        ok = True
+    finally:
+        record_upstream("openai", time.perf_counter() - start, ok=ok)
+
+    if cache and parts:
+        _store(cache, key, "".join(parts))
+
+
+# ----------------- Async (AsyncOpenAI client) -----------------
+# The cache is local SQLite; its reads and writes run in a worker thread so
+# the event loop never waits on disk.
+async def _acreate_completion(client, request):
+    async def attempt(timeout):
+        start = time.perf_counter()
+        try:
+            completion = await client.chat.completions.create(timeout=timeout, **request)
+        except Exception:
+            record_upstream("openai", time.perf_counter() - start, ok=False)
+            raise
+        record_upstream("openai", time.perf_counter() - start)
+        record_tokens(request.get("model", ""), completion.usage)
+        return completion
+
+    return await OPENAI_POLICY.acall(attempt)
+
+
+async def acached_chat_completion(client, **request) -> str:
+    """cached_chat_completion for an AsyncOpenAI client."""
+    if not LLM_CACHE_ENABLED:
+        return (await _acreate_completion(client, request)).choices[0].message.content
+
+    cache = get_llm_cache()
+    key = cache.make_key(**request)
+    content = await asyncio.to_thread(_lookup, cache, key)
+    if content is not None:
+        return content
+
+    completion = await _acreate_completion(client, request)
+    content = completion.choices[0].message.content
+    if content is not None:
+        await asyncio.to_thread(_store, cache, key, content)
+    return content
+
+
+async def astream_chat_completion(client, **request):
+    """stream_chat_completion for an AsyncOpenAI client (an async generator of deltas)."""
+    cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+    key = cache.make_key(**request) if cache else None
+    if cache:
+        content = await asyncio.to_thread(_lookup, cache, key)
+        if content is not None:
+            yield content
+            return
+
+    parts = []
+    start = time.perf_counter()
+    ok = False
+    try:
+        async def attempt(timeout):
+            return await client.chat.completions.create(
+                stream=True, stream_options={"include_usage": True}, timeout=timeout, **request
+            )
+
+        stream = await OPENAI_POLICY.acall(attempt)
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                record_tokens(request.get("model", ""), chunk.usage)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        ok = True
+    finally:
+        record_upstream("openai", time.perf_counter() - start, ok=ok)
+
+    if cache and parts:
+        await asyncio.to_thread(_store, cache, key, "".join(parts))
@@ -0,0 +1,256 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from itertools import count
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from predictor.bench import Cassette, FakeCanvas, FakeOpenAI, FakeRMP, measure_startup, run_load
+
+# Endpoint name -> (method, path, body factory). Bodies take a call counter so
+# professor ids rotate and RMP lookups are not all for the same professor.
+SCENARIOS = {
+    "canvas_all_data": ("GET", "/api/canvas/all-data/", None),
+    "canvas_courses": ("GET", "/api/canvas/courses/", None),
+    "predict_grade": ("POST", "/api/predict-grade/", lambda n, opts: {
+        "canvas_course_id": 1000 + n % max(1, opts["courses"]),
+        "professor_id": 1 + n % 500,
+        "syllabus_text": "Grading: Homework 30%, Exams 45%, Final Project 20%, Participation 5%.",
+    }),
+    "explain_prediction": ("POST", "/api/explain/", lambda n, opts: {
+        "course": "CS 1501",
+        "predicted_grade": "B+",
+        "factors": ["strong homework average", "hard exams", "professor difficulty 3.4"],
+        "professor_id": 1 + n % 500,
+    }),
+}
+# predict_grade reads the Canvas cache, so a sync runs once before it
+NEEDS_CACHE = {"predict_grade"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark API endpoints against local Canvas / OpenAI / RMP stand-ins "
+        "and report p50/p95/p99 latency and throughput per endpoint."
+    )
+    # URL checks would import the views before the stand-in URLs are in the environment
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", action="append", choices=sorted(SCENARIOS),
+                            help="Endpoint to benchmark (repeatable; default: all).")
+        parser.add_argument("--requests", type=int, default=50, help="Measured requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients.")
+        parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per endpoint.")
+        parser.add_argument("--canvas-latency", type=float, default=40.0, help="Canvas latency per request (ms).")
+        parser.add_argument("--openai-latency", type=float, default=400.0, help="OpenAI latency per request (ms).")
+        parser.add_argument("--rmp-latency", type=float, default=150.0, help="RMP latency per lookup (ms).")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this (ms).")
+        parser.add_argument("--courses", type=int, default=12, help="Courses in the fake Canvas account.")
+        parser.add_argument("--groups", type=int, default=5, help="Assignment groups per course.")
+        parser.add_argument("--assignments", type=int, default=8, help="Assignments per group.")
+        parser.add_argument("--reply-words", type=int, default=120, help="Words in each fake LLM reply.")
+        parser.add_argument("--sync-concurrency", type=int, default=8, help="`concurrency` for canvas_all_data.")
+        parser.add_argument("--canvas-backend", choices=["rest", "graphql"], default="rest",
+                            help="CANVAS_FETCH_BACKEND for syncs (run once with each to compare them).")
+        parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache on.")
+        parser.add_argument("--cassettes", help="Directory of canvas.json / openai.json cassettes to replay.")
+        parser.add_argument("--record", action="store_true",
+                            help="With --cassettes: proxy to the real Canvas/OpenAI (CANVAS_API_URL, "
+                                 "CANVAS_TOKEN, OPENAI_API_KEY) and record the cassettes.")
+        parser.add_argument("--target",
+                            help="Benchmark a running server at this base URL instead of in-process "
+                                 "(start it with the environment printed by --serve).")
+        parser.add_argument("--serve", action="store_true",
+                            help="Only start the stand-ins and print the environment to point a server at them.")
+        parser.add_argument("--startup", type=int, metavar="RUNS",
+                            help="Instead of endpoints, cold-start RUNS fresh worker processes and "
+                                 "report their boot and first-request time.")
+        parser.add_argument("--startup-path", default="/api/health/",
+                            help="Request served by each --startup worker.")
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+
+    def handle(self, *args, **opts):
+        if opts["startup"]:
+            self.report_startup(measure_startup(opts["startup"], opts["startup_path"], cwd=settings.BASE_DIR), opts)
+            return
+        if "predictor.views" in sys.modules:
+            raise CommandError("predictor.views is already imported; run the benchmark in a fresh process.")
+        if opts["record"] and not opts["cassettes"]:
+            raise CommandError("--record needs --cassettes.")
+
+        if opts["target"]:
+            self.fakes, self.canvas_token = {}, "bench-token"
+            self.report(self.run_scenarios(opts), opts)
+            return
+
+        with ExitStack() as stack:
+            env = self.start_fakes(stack, opts)
+            if opts["serve"]:
+                for name, value in env.items():
+                    self.stdout.write(f"{name}={value}")
+                self.stdout.write("Stand-ins running; Ctrl-C to stop.")
+                try:
+                    while True:
+                        time.sleep(3600)
+                except KeyboardInterrupt:
+                    return
+            os.environ.update(env)
+            results = self.run_scenarios(opts)
+
+        self.report(results, opts)
+
+    # ----------------- Stand-ins -----------------
+    def start_fakes(self, stack, opts) -> dict:
+        """Start the stand-ins; returns the environment that points the app at them."""
+        canvas_cassette = openai_cassette = None
+        canvas_upstream = openai_upstream = None
+        if opts["cassettes"]:
+            os.makedirs(opts["cassettes"], exist_ok=True)
+            canvas_cassette = Cassette(os.path.join(opts["cassettes"], "canvas.json"))
+            openai_cassette = Cassette(os.path.join(opts["cassettes"], "openai.json"))
+            if opts["record"]:
+                real = urlsplit(os.getenv("CANVAS_API_URL", "https://canvas.pitt.edu/api/v1"))
+                canvas_upstream = f"{real.scheme}://{real.netloc}"
+                real = urlsplit(os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"))
+                openai_upstream = f"{real.scheme}://{real.netloc}"
+                stack.callback(canvas_cassette.save)
+                stack.callback(openai_cassette.save)
+
+        # In replay/record mode latency comes from the recording unless given explicitly
+        replaying = bool(opts["cassettes"])
+        canvas = stack.enter_context(FakeCanvas(
+            courses=opts["courses"], groups=opts["groups"], assignments=opts["assignments"],
+            latency=opts["canvas_latency"] / 1000.0 if not replaying else 0.0,
+            jitter=opts["jitter"] / 1000.0, cassette=canvas_cassette, upstream=canvas_upstream,
+        ))
+        openai = stack.enter_context(FakeOpenAI(
+            reply_words=opts["reply_words"],
+            latency=opts["openai_latency"] / 1000.0 if not replaying else 0.0,
+            jitter=opts["jitter"] / 1000.0, cassette=openai_cassette, upstream=openai_upstream,
+        ))
+        rmp = FakeRMP(latency=opts["rmp_latency"] / 1000.0, jitter=opts["jitter"] / 1000.0)
+        stack.enter_context(rmp.installed())
+        self.fakes = {"canvas": canvas, "openai": openai, "rmp": rmp}
+
+        data_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="bench-"))
+        real_canvas_path = urlsplit(os.getenv("CANVAS_API_URL", "https://canvas.pitt.edu/api/v1")).path
+        self.canvas_token = os.getenv("CANVAS_TOKEN", "") if opts["record"] else "bench-token"
+        return {
+            "CANVAS_API_URL": canvas.origin + (real_canvas_path if opts["record"] else FakeCanvas.API_ROOT),
+            "CANVAS_TOKEN": self.canvas_token,
+            "OPENAI_BASE_URL": openai.origin + "/v1",
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "") if opts["record"] else "sk-bench",
+            "DATA_DIR": data_dir,
+            "LLM_CACHE_ENABLED": "1" if opts["llm_cache"] else "0",
+            "LLM_CACHE_PATH": os.path.join(data_dir, "llm_cache.sqlite3"),
+            # Exercise the per-professor fetch rather than the school-wide index
+            "RMP_INDEX_ENABLED": "0",
+            "CANVAS_FETCH_BACKEND": opts["canvas_backend"],
+        }
+
+    # ----------------- Load -----------------
+    def make_caller(self, opts):
+        """call(method, path, body) -> status code, over HTTP (--target) or the in-process test client."""
+        local = threading.local()
+        headers = {"X-Canvas-Token": self.canvas_token}
+
+        if opts["target"]:
+            import requests
+
+            base = opts["target"].rstrip("/")
+
+            def call(method, path, body):
+                if not hasattr(local, "session"):
+                    local.session = requests.Session()
+                return local.session.request(method, base + path, json=body, headers=headers, timeout=300).status_code
+        else:
+            from django.test import Client
+
+            def call(method, path, body):
+                if not hasattr(local, "client"):
+                    local.client = Client(SERVER_NAME="localhost", HTTP_X_CANVAS_TOKEN=self.canvas_token)
+                if method == "GET":
+                    response = local.client.get(path)
+                else:
+                    response = local.client.post(path, body, content_type="application/json")
+                # Drain streamed bodies so their full duration is measured
+                if getattr(response, "streaming", False):
+                    b"".join(response.streaming_content)
+                return response.status_code
+        return call
+
+    def run_scenarios(self, opts) -> dict:
+        call = self.make_caller(opts)
+        names = opts["endpoint"] or list(SCENARIOS)
+        sync_path = f"/api/canvas/all-data/?concurrency={opts['sync_concurrency']}"
+
+        if NEEDS_CACHE & set(names):
+            status = call("GET", sync_path, None)
+            if status >= 400:
+                raise CommandError(f"Seeding the Canvas cache failed with HTTP {status}.")
+
+        results = {}
+        for name in names:
+            method, path, body = SCENARIOS[name]
+            if name == "canvas_all_data":
+                path = sync_path
+            counter = count()
+
+            def one(method=method, path=path, body=body, counter=counter):
+                return call(method, path, body(next(counter), opts) if body else None)
+
+            before = {k: getattr(f, "requests", getattr(f, "calls", 0)) for k, f in self.fakes.items()}
+            self.stdout.write(f"{name}: {opts['requests']} requests x {opts['concurrency']} clients ...")
+            summary = run_load(one, opts["requests"], opts["concurrency"], opts["warmup"])
+            summary["upstream_calls"] = {
+                k: getattr(f, "requests", getattr(f, "calls", 0)) - before[k] for k, f in self.fakes.items()
+            }
+            results[name] = summary
+        return results
+
+    def report(self, results, opts):
+        columns = ["requests", "errors", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms", "throughput_rps"]
+        widths = [max(len(n) for n in list(results) + ["endpoint"])] + [max(len(c), 9) for c in columns]
+        self.stdout.write("")
+        self.stdout.write("  ".join(h.ljust(w) for h, w in zip(["endpoint"] + columns, widths)))
+        for name, summary in results.items():
+            cells = [name] + [str(summary.get(c, "-")) for c in columns]
+            self.stdout.write("  ".join(c.ljust(w) for c, w in zip(cells, widths)))
+
+        if opts["cassettes"] and not opts["record"]:
+            misses = {k: f.misses for k, f in self.fakes.items() if hasattr(f, "misses") and f.misses}
+            if misses:
+                self.stderr.write(f"Cassette misses (served as 404): {misses}")
+
+        if opts["json_path"]:
+            config = {k: opts[k] for k in (
+                "requests", "concurrency", "warmup", "canvas_latency", "openai_latency", "rmp_latency",
+                "jitter", "courses", "groups", "assignments", "reply_words", "sync_concurrency",
+                "canvas_backend", "llm_cache", "cassettes", "target",
+            )}
+            with open(opts["json_path"], "w") as f:
+                json.dump({"config": config, "results": results}, f, indent=2)
+
+    def report_startup(self, summary, opts):
+        phases = [k for k, v in summary.items() if isinstance(v, dict) and "p50_ms" in v]
+        columns = ["p50_ms", "p95_ms", "max_ms"]
+        widths = [max(len(p) for p in phases + ["phase"])] + [9] * len(columns)
+        self.stdout.write(f"{summary['runs']} cold starts of {opts['startup_path']}, {summary['errors']} errors")
+        self.stdout.write("  ".join(h.ljust(w) for h, w in zip(["phase"] + columns, widths)))
+        for phase in phases:
+            cells = [phase] + [str(summary[phase][c]) for c in columns]
+            self.stdout.write("  ".join(c.ljust(w) for c, w in zip(cells, widths)))
+        self.stdout.write("Heavy modules loaded (runs): " + ", ".join(
+            f"{name}={n}" for name, n in summary["loaded"].items()))
+
+        if opts["json_path"]:
+            with open(opts["json_path"], "w") as f:
+                json.dump({"config": {"startup": opts["startup"], "startup_path": opts["startup_path"]},
+                           "startup": summary}, f, indent=2)
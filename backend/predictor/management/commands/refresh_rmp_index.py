@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from predictor.rmp_index import RMP_INDEX_PATH, RMP_SCHOOL_ID, refresh_index
+
+
+class Command(BaseCommand):
+    help = "Download every professor of a school from RateMyProfessor into the local index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school-id", default=RMP_SCHOOL_ID)
+        parser.add_argument("--path", default=str(RMP_INDEX_PATH))
+
+    def handle(self, *args, **options):
+        index = refresh_index(options["school_id"], options["path"])
+        self.stdout.write(f"Indexed {len(index)} professors for school {index.school_id} -> {options['path']}")
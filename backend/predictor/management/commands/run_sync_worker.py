@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from predictor.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Process queued Canvas sync jobs (use with SYNC_WORKER_INPROCESS=0 on the web workers)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds between queue polls.")
+
+    def handle(self, *args, **options):
+        work(stop_when_empty=options["once"], poll_seconds=options["poll"])
@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# ----------------- Metrics config -----------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+# Add a Server-Timing header (stages + upstream time) to every API response
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "").lower() in ("1", "true", "yes")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "predictor_http_request_seconds": (
+        "histogram", "API request wall time by route, method and status.", SECONDS_BUCKETS),
+    "predictor_http_response_bytes": (
+        "histogram", "API response body size (non-streaming responses).", BYTES_BUCKETS),
+    "predictor_stage_seconds": (
+        "histogram", "Wall time of one named stage of a request.", SECONDS_BUCKETS),
+    "predictor_upstream_requests_total": (
+        "counter", "Calls to Canvas / RMP / OpenAI by outcome.", None),
+    "predictor_upstream_seconds": (
+        "histogram", "Latency of calls to Canvas / RMP / OpenAI.", SECONDS_BUCKETS),
+    "predictor_upstream_response_bytes": (
+        "histogram", "Response payload size from Canvas / RMP / OpenAI.", BYTES_BUCKETS),
+    "predictor_upstream_retries_total": (
+        "counter", "Retried calls to Canvas / RMP / OpenAI.", None),
+    "predictor_circuit_rejections_total": (
+        "counter", "Calls failed fast by an open circuit breaker.", None),
+    "predictor_canvas_backoffs_total": (
+        "counter", "Canvas concurrency cuts by reason (throttled / low_remaining).", None),
+    "predictor_hedged_requests_total": (
+        "counter", "Hedged calls by which copy answered first (primary / hedge).", None),
+    "predictor_openai_tokens_total": (
+        "counter", "OpenAI token usage by model and kind (prompt / completion).", None),
+    "predictor_llm_cache_requests_total": (
+        "counter", "LLM response cache lookups by result (hit / miss).", None),
+}
+
+
+class Registry:
+    """
+    In-process counters and histograms, rendered in the Prometheus text
+    format. Each worker process has its own registry, so scrape every
+    worker (or run one per pod).
+    """
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+    def inc(self, name, value=1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = self.metrics[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            series[bisect_left(buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {k: list(v) for k, v in self.histograms.items()}
+
+        lines = []
+        for name, (kind, help_text, buckets) in self.metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (series, labels), value in sorted(counters.items()):
+                    if series == name:
+                        lines.append(f"{name}{_labels(labels)} {value:g}")
+                continue
+            for (series, labels), data in sorted(histograms.items()):
+                if series != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(buckets + (float("inf"),), data[:-1]):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {data[-1]:.6g}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+REGISTRY = Registry()
+
+
+# ----------------- Per-request timings (Server-Timing) -----------------
+# name -> [total seconds, count] for the request being served; None outside one.
+# Pipeline stages copy the context into their worker threads, so their
+# upstream calls are attributed to the request too.
+_request_timings = ContextVar("request_timings", default=None)
+_request_timings_lock = threading.Lock()
+
+
+def add_timing(name: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is None:
+        return
+    with _request_timings_lock:
+        entry = timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def server_timing_header(timings: dict, total: float) -> str:
+    parts = []
+    for name, (seconds, calls) in timings.items():
+        desc = f';desc="{calls} calls"' if calls > 1 else ""
+        parts.append(f"{name};dur={seconds * 1000.0:.1f}{desc}")
+    parts.append(f"total;dur={total * 1000.0:.1f}")
+    return ", ".join(parts)
+
+
+# ----------------- Recording helpers -----------------
+def record_stage(stage: str, seconds: float):
+    if METRICS_ENABLED:
+        REGISTRY.observe("predictor_stage_seconds", seconds, stage=stage)
+    add_timing(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time the block as stage `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_pipeline(pipeline):
+    """Record every stage timing of a finished predictor.pipeline.Pipeline."""
+    for name, (start_ms, end_ms) in pipeline.timings.items():
+        record_stage(name, (end_ms - start_ms) / 1000.0)
+
+
+def record_upstream(service: str, seconds: float, ok: bool = True, response_bytes=None):
+    """One call to an upstream service ("canvas", "rmp", "openai")."""
+    add_timing(f"upstream_{service}", seconds)
+    if not METRICS_ENABLED:
+        return
+    REGISTRY.inc("predictor_upstream_requests_total", service=service, outcome="ok" if ok else "error")
+    REGISTRY.observe("predictor_upstream_seconds", seconds, service=service)
+    if response_bytes is not None:
+        REGISTRY.observe("predictor_upstream_response_bytes", response_bytes, service=service)
+
+
+def record_tokens(model: str, usage):
+    """OpenAI `usage` object (or dict) of one completion."""
+    if not METRICS_ENABLED or usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        value = usage.get(f"{kind}_tokens") if isinstance(usage, dict) else getattr(usage, f"{kind}_tokens", None)
+        if value:
+            REGISTRY.inc("predictor_openai_tokens_total", value, model=model, kind=kind)
+
+
+def record_llm_cache(hit: bool):
+    if METRICS_ENABLED:
+        REGISTRY.inc("predictor_llm_cache_requests_total", result="hit" if hit else "miss")
+
+
+# ----------------- Middleware -----------------
+class MetricsMiddleware:
+    """
+    Times every request (labelled by URL route, not raw path, to keep label
+    cardinality bounded) and, with SERVER_TIMING_ENABLED, reports the
+    request's stage and upstream timings in a Server-Timing header.
+    Runs natively under both WSGI and ASGI, so async views stay on the
+    event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def finish(self, request, response, timings, elapsed):
+        if METRICS_ENABLED:
+            match = getattr(request, "resolver_match", None)
+            route = match.route if match is not None else "unmatched"
+            REGISTRY.observe("predictor_http_request_seconds", elapsed,
+                             route=route, method=request.method, status=response.status_code)
+            if not response.streaming:
+                REGISTRY.observe("predictor_http_response_bytes", len(response.content), route=route)
+
+        if SERVER_TIMING_ENABLED:
+            response["Server-Timing"] = server_timing_header(timings, elapsed)
+            response["Timing-Allow-Origin"] = "*"
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncjob',
+            name='canvas_token',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='syncjob',
+            name='owner',
+            field=models.CharField(db_index=True, default='default', max_length=64),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0002_sync_job_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Syllabus',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('source_type', models.CharField(default='text', max_length=8)),
+                ('weights', models.JSONField(blank=True, null=True)),
+                ('confidence', models.FloatField(default=0.0)),
+                ('extra_credit', models.BooleanField(default=False)),
+                ('components', models.JSONField(blank=True, default=list)),
+                ('submissions', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'syllabi',
+            },
+        ),
+        migrations.CreateModel(
+            name='SyllabusSource',
+            fields=[
+                ('source_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('syllabus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sources', to='predictor.syllabus')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:47
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0003_syllabus'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='syncjob',
+            name='canvas_token',
+        ),
+    ]
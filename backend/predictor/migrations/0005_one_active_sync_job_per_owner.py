@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0004_remove_sync_job_token'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='syncjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('queued', 'running'))), fields=('owner',), name='one_active_sync_job_per_owner'),
+        ),
+    ]
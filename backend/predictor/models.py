@@ -1,3 +1,111 @@
 from django.db import models
 
 # Create your models here.
+
+
+class SyncJob(models.Model):
+    """A background Canvas sync; the table doubles as the job queue."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+    ACTIVE = (QUEUED, RUNNING)
+
+    # storage.UserPartition key of the user the sync is for
+    owner = models.CharField(max_length=64, default="default", db_index=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    mode = models.CharField(max_length=16, default="full")
+    concurrency = models.PositiveIntegerField(default=1)
+    courses_done = models.PositiveIntegerField(default=0)
+    courses_total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        constraints = [
+            # At most one queued/running job per user; enqueue_sync_job coalesces onto it
+            models.UniqueConstraint(
+                fields=["owner"], condition=models.Q(status__in=("queued", "running")),
+                name="one_active_sync_job_per_owner",
+            ),
+        ]
+
+    def as_dict(self, include_result=False) -> dict:
+        data = {
+            "job_id": self.pk,
+            "status": self.status,
+            "mode": self.mode,
+            "progress": {"done": self.courses_done, "total": self.courses_total},
+            "error": self.error or None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class Syllabus(models.Model):
+    """An ingested syllabus, stored and parsed once per distinct normalized text."""
+
+    # sha256 of the normalized text; predictions reference it as "syllabus_hash"
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    text = models.TextField()
+    source_type = models.CharField(max_length=8, default="text")  # pdf / docx / html / text
+    # syllabus.parse_grading_breakdown output, computed at ingestion
+    weights = models.JSONField(null=True, blank=True)
+    confidence = models.FloatField(default=0.0)
+    extra_credit = models.BooleanField(default=False)
+    components = models.JSONField(default=list, blank=True)
+    # Submissions that resolved to this syllabus (uploads and pasted text)
+    submissions = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "syllabi"
+
+    def breakdown(self) -> dict:
+        """Same shape as syllabus.parse_grading_breakdown(self.text)."""
+        return {
+            "weights": self.weights,
+            "confidence": self.confidence,
+            "extra_credit": self.extra_credit,
+            "components": [tuple(c) for c in self.components],
+        }
+
+    def as_dict(self, include_text=False) -> dict:
+        data = {
+            "syllabus_hash": self.content_hash,
+            "source_type": self.source_type,
+            "weights": self.weights,
+            "confidence": self.confidence,
+            "extra_credit": self.extra_credit,
+            "components": self.components,
+            "chars": len(self.text),
+            "submissions": self.submissions,
+            "created_at": self.created_at,
+        }
+        if include_text:
+            data["text"] = self.text
+        return data
+
+
+class SyllabusSource(models.Model):
+    """An uploaded file's bytes hash -> the syllabus it extracted to, so re-uploads skip extraction."""
+
+    source_hash = models.CharField(max_length=64, primary_key=True)
+    syllabus = models.ForeignKey(Syllabus, on_delete=models.CASCADE, related_name="sources")
+    created_at = models.DateTimeField(auto_now_add=True)
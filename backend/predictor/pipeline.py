@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import inspect
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Pipeline:
+    """
+    Small dependency-aware stage runner.
+
+    Each stage is `fn(**results_of_its_deps)`; a stage starts as soon as all
+    of its dependencies have finished, so independent stages overlap and the
+    wall time approaches the longest dependency chain. `run()` returns the
+    stage results; `report()` describes timings and that critical path.
+    `arun()` does the same on an event loop, for async views.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+        self.wall_ms = None
+
+    def stage(self, name, fn, deps=()):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dep!r}")
+        self.stages[name] = (fn, tuple(deps))
+        return self
+
+    def _run_stage(self, name, results, origin):
+        fn, deps = self.stages[name]
+        start = time.perf_counter()
+        try:
+            return fn(**{dep: results[dep] for dep in deps})
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = ((start - origin) * 1000.0, (end - origin) * 1000.0)
+
+    def run(self, parallel: bool = True, max_workers: int = 4) -> dict:
+        results = {}
+        origin = time.perf_counter()
+
+        if not parallel:
+            # Declaration order is already a valid topological order
+            for name in self.stages:
+                results[name] = self._run_stage(name, results, origin)
+            self.wall_ms = (time.perf_counter() - origin) * 1000.0
+            return results
+
+        pending = dict(self.stages)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                for name, (_, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        # Stages see the caller's context vars (e.g. per-request metrics)
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, self._run_stage, name, results, origin)] = name
+                        del pending[name]
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        self.wall_ms = (time.perf_counter() - origin) * 1000.0
+        return results
+
+    async def _arun_stage(self, name, results, origin):
+        fn, deps = self.stages[name]
+        start = time.perf_counter()
+        try:
+            kwargs = {dep: results[dep] for dep in deps}
+            if inspect.iscoroutinefunction(fn):
+                return await fn(**kwargs)
+            # Plain stages may block (sync upstream clients), so they get a thread
+            result = await asyncio.to_thread(fn, **kwargs)
+            return await result if inspect.isawaitable(result) else result
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = ((start - origin) * 1000.0, (end - origin) * 1000.0)
+
+    async def arun(self) -> dict:
+        """
+        run() for an event loop: each stage is a task started once its deps
+        finish. Coroutine stages (or stages returning an awaitable) are
+        awaited on the loop; plain ones run in a worker thread.
+        """
+        results = {}
+        origin = time.perf_counter()
+        pending = dict(self.stages)
+        running = {}
+        try:
+            while pending or running:
+                for name, (_, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        running[asyncio.ensure_future(self._arun_stage(name, results, origin))] = name
+                        del pending[name]
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[running.pop(task)] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+        self.wall_ms = (time.perf_counter() - origin) * 1000.0
+        return results
+
+    def critical_path(self):
+        """Longest chain of dependent stages by measured duration."""
+        if not self.timings:
+            return []
+        best, via = {}, {}
+        for name, (_, deps) in self.stages.items():
+            if name not in self.timings:
+                continue
+            start, end = self.timings[name]
+            prev = max((d for d in deps if d in best), key=lambda d: best[d], default=None)
+            best[name] = (end - start) + (best[prev] if prev else 0.0)
+            via[name] = prev
+        name = max(best, key=best.get)
+        path = []
+        while name:
+            path.append(name)
+            name = via[name]
+        return path[::-1]
+
+    def report(self) -> dict:
+        path = self.critical_path()
+        return {
+            "stages": {
+                name: {
+                    "start_ms": round(start, 2),
+                    "duration_ms": round(end - start, 2),
+                    "deps": list(self.stages[name][1]),
+                }
+                for name, (start, end) in self.timings.items()
+            },
+            "critical_path": path,
+            "critical_path_ms": round(sum(self.timings[n][1] - self.timings[n][0] for n in path), 2),
+            "sum_ms": round(sum(end - start for start, end in self.timings.values()), 2),
+            "wall_ms": round(self.wall_ms or 0.0, 2),
+        }
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .metrics import METRICS_ENABLED, REGISTRY
+
+# ----------------- Canvas rate-limit config -----------------
+# Canvas meters each token with a leaky bucket (700 units by default), reported
+# on every response as X-Rate-Limit-Remaining, with the request's X-Request-Cost.
+# Concurrent requests per token at the start of a sync, and the most ever allowed
+CANVAS_AIMD_INITIAL = int(os.getenv("CANVAS_AIMD_INITIAL", "4"))
+CANVAS_AIMD_MAX = int(os.getenv("CANVAS_AIMD_MAX", "32"))
+# Back off once the bucket would drop below this many units with every in-flight request charged
+CANVAS_RATE_LIMIT_FLOOR = float(os.getenv("CANVAS_RATE_LIMIT_FLOOR", "150"))
+# Factor the limit is multiplied by on each back-off
+CANVAS_AIMD_DECREASE = float(os.getenv("CANVAS_AIMD_DECREASE", "0.5"))
+# Per-token limiters kept in memory at once, least recently used dropped
+LIMITER_CACHE_SIZE = int(os.getenv("LIMITER_CACHE_SIZE", "1024"))
+
+
+def _header(headers, name):
+    try:
+        value = headers.get(name) if headers is not None else None
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(status_code: int, headers, text: str = "") -> bool:
+    """Canvas answers an empty bucket with 403 "Rate Limit Exceeded" (some proxies send 429)."""
+    if status_code == 429:
+        return True
+    if status_code != 403:
+        return False
+    remaining = _header(headers, "X-Rate-Limit-Remaining")
+    return "rate limit exceeded" in (text or "").lower() or (remaining is not None and remaining <= 0)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one Canvas token, shared by the sync
+    (threads) and async (event loop) clients.
+
+    Each answered request adds 1/limit to the limit (one more slot per
+    window of successful requests). The limit is cut by CANVAS_AIMD_DECREASE
+    when a request is throttled, or before that happens: when the bucket
+    left after charging every in-flight request at the average
+    X-Request-Cost would fall below CANVAS_RATE_LIMIT_FLOOR. Only requests
+    sent after the last cut can cut again, so one burst of bad news halves
+    the limit once instead of collapsing it to 1.
+    """
+
+    def __init__(self, initial=CANVAS_AIMD_INITIAL, maximum=CANVAS_AIMD_MAX,
+                 floor=CANVAS_RATE_LIMIT_FLOOR, decrease=CANVAS_AIMD_DECREASE):
+        self.maximum = max(1, maximum)
+        self.limit = float(min(max(1, initial), self.maximum))
+        self.floor = floor
+        self.decrease = decrease
+        self.in_flight = 0
+        self.cost = None        # moving average of X-Request-Cost
+        self.remaining = None   # last X-Rate-Limit-Remaining seen
+        self.cut_at = 0.0
+        self.throttled = 0
+        self._cond = threading.Condition()
+        self._waiters = deque()  # (loop, future) of async callers waiting for a slot
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def acquire(self) -> float:
+        """Block until a slot is free; returns the send time to pass to release()."""
+        with self._cond:
+            while not self._has_slot():
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def aacquire(self) -> float:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._has_slot():
+                    self.in_flight += 1
+                    return time.monotonic()
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+            await future
+
+    def release(self, sent_at: float, headers=None, throttled: bool = False):
+        """Free the slot taken at `sent_at` and adapt to the response's headers (None: no response)."""
+        with self._cond:
+            self.in_flight -= 1
+            self._adapt(sent_at, headers, throttled)
+            self._cond.notify_all()
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                loop.call_soon_threadsafe(_wake, future)
+
+    def _adapt(self, sent_at, headers, throttled):
+        cost = _header(headers, "X-Request-Cost")
+        if cost is not None:
+            self.cost = cost if self.cost is None else 0.8 * self.cost + 0.2 * cost
+        remaining = _header(headers, "X-Rate-Limit-Remaining")
+        if remaining is not None:
+            self.remaining = remaining
+
+        if throttled:
+            self.throttled += 1
+            self._cut(sent_at, "throttled")
+        elif remaining is not None and remaining - self.in_flight * (self.cost or 0.0) < self.floor:
+            self._cut(sent_at, "low_remaining")
+        elif headers is not None:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def _cut(self, sent_at, reason):
+        if sent_at < self.cut_at:
+            return
+        self.limit = max(1.0, self.limit * self.decrease)
+        self.cut_at = time.monotonic()
+        if METRICS_ENABLED:
+            REGISTRY.inc("predictor_canvas_backoffs_total", reason=reason)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "remaining": self.remaining,
+                "average_cost": self.cost,
+                "throttled": self.throttled,
+            }
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# ----------------- Per-token limiters -----------------
+# Keyed by a digest of the token: Canvas' bucket is per token, shared by every request using it
+_limiters = OrderedDict()
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(token) -> AdaptiveLimiter:
+    key = hashlib.sha256(str(token).encode()).hexdigest()
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AdaptiveLimiter()
+        _limiters.move_to_end(key)
+        if len(_limiters) > LIMITER_CACHE_SIZE:
+            # Least recently used first, but one with requests in flight is kept: its clients still count on it
+            for old in list(_limiters)[:-1]:
+                if not _limiters[old].in_flight:
+                    del _limiters[old]
+                    if len(_limiters) <= LIMITER_CACHE_SIZE:
+                        break
+    return limiter
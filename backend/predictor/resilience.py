@@ -0,0 +1,290 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from .metrics import METRICS_ENABLED, REGISTRY
+
+# ----------------- Circuit breaker config -----------------
+# Consecutive failed calls that open a service's breaker
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+# Seconds an open breaker fails fast before letting one trial call through
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Threads for hedged requests and for calls whose client cannot take a timeout
+RESILIENCE_WORKERS = int(os.getenv("RESILIENCE_WORKERS", "16"))
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class UpstreamError(Exception):
+    """An upstream call that failed for good (deadline, retries exhausted or breaker open)."""
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class DeadlineExceeded(UpstreamError):
+    pass
+
+
+class RetryableStatus(UpstreamError):
+    """Raised inside an attempt for a retryable HTTP status; carries the response."""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class Throttled(RetryableStatus):
+    """A rate-limited response: retried after backoff, but the service is up, so the breaker is not charged."""
+
+
+def is_retryable(exc) -> bool:
+    """Timeouts, connection errors, 429 and 5xx are worth retrying; other errors are not."""
+    if isinstance(exc, (RetryableStatus, DeadlineExceeded, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # requests / httpx / openai connection and timeout errors (httpx.ConnectError included)
+    name = type(exc).__name__
+    return "Timeout" in name or "Connect" in name
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failures` consecutive failures; open calls fail
+    fast with CircuitOpenError for `reset_seconds`; then one half-open
+    trial call decides whether to close again or re-open.
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return
+        if METRICS_ENABLED:
+            REGISTRY.inc("predictor_circuit_rejections_total", service=self.name)
+        raise CircuitOpenError(f"{self.name} circuit open; failing fast")
+
+    def record(self, ok: bool):
+        with self.lock:
+            self.trial_running = False
+            if ok:
+                self.consecutive = 0
+                self.opened_at = None
+                return
+            self.consecutive += 1
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=RESILIENCE_WORKERS, thread_name_prefix="upstream")
+    return _pool
+
+
+def _submit(fn, *args):
+    return _executor().submit(contextvars.copy_context().run, fn, *args)
+
+
+class Policy:
+    """
+    How to call one upstream service.
+
+    `call(attempt)` runs `attempt(timeout)` under:
+      - a total `deadline` (seconds) across every attempt and backoff sleep;
+        each attempt gets min(`timeout`, time left) as its own timeout;
+      - up to `retries` extra attempts for retryable errors (is_retryable),
+        with full-jitter exponential backoff (`backoff` * 2^n, capped);
+      - the service's circuit breaker, so a dead upstream fails fast;
+      - with `hedge_after` (seconds, idempotent calls only), a second copy of
+        a slow attempt is started and the first result to arrive wins.
+    With `enforce_timeout`, attempts run in a worker thread and are abandoned
+    at their timeout, for clients that do not take a timeout themselves.
+
+    `acall(attempt)` is the same for an async `attempt(timeout)`, on the
+    event loop instead of threads; both share the service's breaker.
+    """
+
+    def __init__(self, name, timeout, deadline=None, retries=0, backoff=0.25, max_backoff=4.0,
+                 hedge_after=None, enforce_timeout=False, breaker=None):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline or timeout * (retries + 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.enforce_timeout = enforce_timeout
+        self.breaker = breaker or CircuitBreaker(name)
+
+    def call(self, attempt, idempotent=False):
+        end = time.monotonic() + self.deadline
+        for n in range(self.retries + 1):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"{self.name} deadline of {self.deadline:g}s exceeded")
+            self.breaker.before_call()
+            try:
+                if idempotent and self.hedge_after:
+                    result = self._hedged(attempt, min(self.timeout, remaining))
+                else:
+                    result = self._attempt(attempt, min(self.timeout, remaining))
+            except Exception as e:
+                retryable = is_retryable(e)
+                # Only outages count against the breaker; a 404, bad request or throttle means the service is up
+                self.breaker.record(not retryable or isinstance(e, Throttled))
+                if n == self.retries or not retryable:
+                    if isinstance(e, RetryableStatus):
+                        return e.response
+                    raise
+                if METRICS_ENABLED:
+                    REGISTRY.inc("predictor_upstream_retries_total", service=self.name)
+                time.sleep(min(self._backoff(n, e), max(0.0, end - time.monotonic())))
+                continue
+            self.breaker.record(True)
+            return result
+
+    async def acall(self, attempt, idempotent=False):
+        end = time.monotonic() + self.deadline
+        for n in range(self.retries + 1):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"{self.name} deadline of {self.deadline:g}s exceeded")
+            self.breaker.before_call()
+            try:
+                if idempotent and self.hedge_after:
+                    result = await self._ahedged(attempt, min(self.timeout, remaining))
+                else:
+                    result = await self._aattempt(attempt, min(self.timeout, remaining))
+            except Exception as e:
+                retryable = is_retryable(e)
+                self.breaker.record(not retryable or isinstance(e, Throttled))
+                if n == self.retries or not retryable:
+                    if isinstance(e, RetryableStatus):
+                        return e.response
+                    raise
+                if METRICS_ENABLED:
+                    REGISTRY.inc("predictor_upstream_retries_total", service=self.name)
+                await asyncio.sleep(min(self._backoff(n, e), max(0.0, end - time.monotonic())))
+                continue
+            self.breaker.record(True)
+            return result
+
+    def _backoff(self, n, exc) -> float:
+        retry_after = getattr(getattr(exc, "response", None), "headers", {}).get("Retry-After")
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.max_backoff)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** n)))
+
+    def _attempt(self, attempt, timeout):
+        if not self.enforce_timeout:
+            return attempt(timeout)
+        future = _submit(attempt, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise DeadlineExceeded(f"{self.name} call timed out after {timeout:g}s") from None
+
+    async def _aattempt(self, attempt, timeout):
+        if not self.enforce_timeout:
+            return await attempt(timeout)
+        try:
+            return await asyncio.wait_for(attempt(timeout), timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{self.name} call timed out after {timeout:g}s") from None
+
+    async def _ahedged(self, attempt, timeout):
+        primary = asyncio.ensure_future(self._aattempt(attempt, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=min(self.hedge_after, timeout))
+        if done:
+            return primary.result()
+        hedge = asyncio.ensure_future(self._aattempt(attempt, max(0.0, timeout - self.hedge_after)))
+        pending = {primary: "primary", hedge: "hedge"}
+        error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    winner = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if METRICS_ENABLED:
+                        REGISTRY.inc("predictor_hedged_requests_total", service=self.name, winner=winner)
+                    return task.result()
+            raise error
+        finally:
+            # Unlike a thread, the losing request can actually be cancelled
+            for task in pending:
+                task.cancel()
+
+    def _hedged(self, attempt, timeout):
+        # Both copies run `attempt` itself on the pool and the timeout is
+        # enforced by how long we wait for them. Going through _attempt would
+        # park each copy on a pool thread waiting for another pool thread,
+        # which starves the pool once many hedged calls are in flight.
+        end = time.monotonic() + timeout
+        primary = _submit(attempt, timeout)
+        try:
+            return primary.result(timeout=min(self.hedge_after, timeout))
+        except FutureTimeoutError:
+            pass
+        hedge = _submit(attempt, max(0.0, timeout - self.hedge_after))
+        pending = {primary: "primary", hedge: "hedge"}
+        error = None
+        while pending:
+            left = max(0.0, end - time.monotonic()) if self.enforce_timeout else None
+            done, _ = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"{self.name} call timed out after {timeout:g}s")
+            for future in done:
+                winner = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if METRICS_ENABLED:
+                    REGISTRY.inc("predictor_hedged_requests_total", service=self.name, winner=winner)
+                return result
+        raise error
@@ -0,0 +1,223 @@
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from .metrics import record_upstream
+from .resilience import Policy
+
+logger = logging.getLogger(__name__)
+
+# ----------------- RMP index config -----------------
+RMP_SCHOOL_ID = os.getenv("RMP_SCHOOL_ID", "1381")
+RMP_INDEX_PATH = Path(os.getenv("RMP_INDEX_PATH", "rmp_index.json.gz"))
+RMP_REFRESH_SECONDS = float(os.getenv("RMP_REFRESH_SECONDS", str(24 * 3600)))
+RMP_INDEX_ENABLED = os.getenv("RMP_INDEX_ENABLED", "1").lower() in ("1", "true", "yes")
+# Live single-professor lookups: per-attempt timeout, extra attempts, and
+# hedge delay in seconds (0 = off). The RMP library takes no timeout, so
+# slow lookups are abandoned in a worker thread.
+RMP_TIMEOUT = float(os.getenv("RMP_TIMEOUT", "8"))
+RMP_RETRIES = int(os.getenv("RMP_RETRIES", "1"))
+RMP_HEDGE_AFTER = float(os.getenv("RMP_HEDGE_AFTER", "0"))
+
+RMP_POLICY = Policy("rmp", timeout=RMP_TIMEOUT, retries=RMP_RETRIES,
+                    hedge_after=RMP_HEDGE_AFTER or None, enforce_timeout=True)
+
+# Column order of the rows stored on disk
+FIELDS = ["id", "first_name", "last_name", "department",
+          "avg_rating", "avg_difficulty", "num_ratings", "would_take_again_percent"]
+
+
+def safe_float(val):
+    try:
+        return float(str(val).replace("%", "").strip())
+    except Exception:
+        return None
+
+
+def safe_int(val):
+    try:
+        return int(val)
+    except Exception:
+        return None
+
+
+def professor_record(prof) -> dict:
+    """The get_professor_info dict for an RMP Professor / Professor_Gist object."""
+    return {
+        "name": f"{prof.first_name} {prof.last_name}",
+        "avg_rating": safe_float(prof.avg_rating),
+        "avg_difficulty": safe_float(prof.avg_difficulty),
+        "num_ratings": safe_int(prof.num_ratings),
+        "would_take_again_percent": safe_float(prof.would_take_again_percent),
+    }
+
+
+def fetch_professor(professor_id):
+    """Live RMP lookup of one professor under RMP_POLICY; returns the library's Professor."""
+    def attempt(timeout):
+        start = time.perf_counter()
+        try:
+            import RateMyProfessor_Database_APIs
+
+            prof = RateMyProfessor_Database_APIs.fetch_a_professor(professor_id)
+        except Exception:
+            record_upstream("rmp", time.perf_counter() - start, ok=False)
+            raise
+        record_upstream("rmp", time.perf_counter() - start)
+        return prof
+
+    # A GraphQL read: safe to retry and hedge
+    return RMP_POLICY.call(attempt, idempotent=True)
+
+
+def normalize_name(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9 ]+", " ", name.lower()).split())
+
+
+class ProfessorIndex:
+    """
+    All professors of one school, keyed by RMP legacy id, with a secondary
+    normalized-name index. Stored on disk as gzipped JSON rows (FIELDS order).
+    """
+
+    def __init__(self, rows, school_id=RMP_SCHOOL_ID, built_at=None):
+        self.school_id = str(school_id)
+        self.built_at = built_at or time.time()
+        self.rows = {}
+        self.by_name = {}
+        for row in rows:
+            rec = dict(zip(FIELDS, row))
+            if rec["id"] is None:
+                continue
+            self.rows[rec["id"]] = rec
+            key = normalize_name(f"{rec['first_name']} {rec['last_name']}")
+            self.by_name.setdefault(key, []).append(rec["id"])
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def fetch(cls, school_id=RMP_SCHOOL_ID):
+        import RateMyProfessor_Database_APIs
+
+        start = time.perf_counter()
+        try:
+            professors = RateMyProfessor_Database_APIs.fetch_all_professors_from_a_school(school_id)
+        except Exception:
+            record_upstream("rmp", time.perf_counter() - start, ok=False)
+            raise
+        record_upstream("rmp", time.perf_counter() - start)
+        rows = [
+            [safe_int(p.legacy_id), p.first_name, p.last_name, p.department,
+             safe_float(p.avg_rating), safe_float(p.avg_difficulty), safe_int(p.num_ratings),
+             safe_float(p.would_take_again_percent)]
+            for p in professors
+        ]
+        return cls(rows, school_id)
+
+    @classmethod
+    def load(cls, path=RMP_INDEX_PATH):
+        with gzip.open(path, "rt") as f:
+            blob = json.load(f)
+        return cls(blob["rows"], blob["school_id"], blob["built_at"])
+
+    def save(self, path=RMP_INDEX_PATH):
+        path = Path(path)
+        blob = {
+            "school_id": self.school_id,
+            "built_at": self.built_at,
+            "fields": FIELDS,
+            "rows": [[rec[f] for f in FIELDS] for rec in self.rows.values()],
+        }
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp, "wt") as f:
+            json.dump(blob, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def get(self, professor_id):
+        rec = self.rows.get(safe_int(professor_id))
+        if rec is None:
+            return None
+        return {
+            "name": f"{rec['first_name']} {rec['last_name']}",
+            "avg_rating": rec["avg_rating"],
+            "avg_difficulty": rec["avg_difficulty"],
+            "num_ratings": rec["num_ratings"],
+            "would_take_again_percent": rec["would_take_again_percent"],
+        }
+
+    def search(self, name: str, limit: int = 10):
+        """Exact normalized-name matches first, then names containing every query token."""
+        query = normalize_name(name)
+        if not query:
+            return []
+        ids = list(self.by_name.get(query, []))
+        if len(ids) < limit:
+            tokens = query.split()
+            for key, key_ids in self.by_name.items():
+                if key != query and all(t in key for t in tokens):
+                    ids.extend(key_ids)
+                    if len(ids) >= limit:
+                        break
+        return [{"id": i, **self.get(i), "department": self.rows[i]["department"]} for i in ids[:limit]]
+
+
+_index = None
+_index_lock = threading.Lock()
+_refresher = None
+
+
+def refresh_index(school_id=RMP_SCHOOL_ID, path=RMP_INDEX_PATH):
+    """Re-download the school and atomically swap in (and persist) the new index."""
+    global _index
+    index = ProfessorIndex.fetch(school_id)
+    index.save(path)
+    _index = index
+    return index
+
+
+def _refresh_loop():
+    global _index
+    while True:
+        index = _index
+        age = time.time() - index.built_at if index else RMP_REFRESH_SECONDS
+        time.sleep(max(0.0, RMP_REFRESH_SECONDS - age))
+        try:
+            # Another worker (or the management command) may have refreshed the file already
+            on_disk = ProfessorIndex.load() if RMP_INDEX_PATH.exists() else None
+            if on_disk and time.time() - on_disk.built_at < RMP_REFRESH_SECONDS:
+                _index = on_disk
+            else:
+                refresh_index()
+        except Exception as e:
+            logger.warning("RMP index refresh failed: %s", e)
+            time.sleep(min(RMP_REFRESH_SECONDS, 300))
+
+
+def get_rmp_index():
+    """
+    Process-wide index: loaded from disk on first use and kept fresh by a
+    daemon thread every RMP_REFRESH_SECONDS. With no file yet, the thread
+    builds it right away and None is returned until it is ready (callers
+    fall back to the live per-professor fetch).
+    """
+    global _index, _refresher
+    if not RMP_INDEX_ENABLED:
+        return None
+    if _refresher is None:
+        with _index_lock:
+            if _refresher is None:
+                try:
+                    _index = ProfessorIndex.load()
+                except (OSError, ValueError, KeyError):
+                    _index = None
+                _refresher = threading.Thread(target=_refresh_loop, name="rmp-index-refresh", daemon=True)
+                _refresher.start()
+    return _index
@@ -0,0 +1,107 @@
+import numpy as np
+
+from .aggregation import CATEGORIES
+from .strengths import DEFAULT_OVERALL
+
+# Syllabus weights used when the syllabus does not state any
+DEFAULT_WEIGHTS = {"projects": 25.0, "assignments": 35.0, "exams": 35.0, "participation": 5.0}
+
+
+def difficulty_drag(avg_difficulty) -> float:
+    if avg_difficulty is None:
+        return 0.0
+    if avg_difficulty >= 4.0:
+        return -3.0
+    if avg_difficulty >= 3.3:
+        return -2.0
+    if avg_difficulty >= 2.7:
+        return -1.0
+    return 0.0
+
+
+def margin_of_error(would_take_again_percent) -> float:
+    if would_take_again_percent is None:
+        return 5.0
+    if would_take_again_percent < 30:
+        return 6.0
+    if would_take_again_percent <= 100:
+        return 4.0
+    return 3.0
+
+
+def score_prediction(strengths: dict, weights: dict, rmp=None, extra_credit: bool = False, model=None) -> dict:
+    """
+    The rule table predict_grade scores with: the weighted average of the
+    category strengths, then difficulty / punctuality / extra-credit
+    adjustments. A trained `model` (grade_model.GradeModel) replaces the
+    weighted average with its prediction from the student's past courses;
+    its fit already reflects the student's punctuality, so the punctuality
+    bonus is skipped.
+
+    Returns the four weights (normalized to 100), "final_score",
+    "margin_of_error" and "range".
+    """
+    total = sum(weights.values())
+    if total > 0:
+        weights = {k: v * 100.0 / total for k, v in weights.items()}
+
+    cs = strengths.get("category_strengths", {})
+    if model is not None:
+        score = float(model.predict([[float(cs.get(k, DEFAULT_OVERALL)) for k in CATEGORIES]],
+                                    [[weights[k] for k in CATEGORIES]])[0])
+    else:
+        score = sum(float(cs.get(k, DEFAULT_OVERALL)) * (weights[k] / 100.0) for k in CATEGORIES)
+
+    rmp = rmp or {}
+    score += difficulty_drag(rmp.get("avg_difficulty"))
+    if model is None and (strengths.get("punctual_strength") or 0) > 90:
+        score += 2.0
+    if extra_credit:
+        score += 3.0
+
+    score = max(0.0, min(100.0, score))
+    margin = margin_of_error(rmp.get("would_take_again_percent"))
+    return {
+        **weights,
+        "final_score": score,
+        "margin_of_error": margin,
+        "range": [max(0.0, score - margin), min(100.0, score + margin)],
+    }
+
+
+def score_predictions_batch(strengths: dict, weights, avg_difficulty, would_take_again, extra_credit, model=None):
+    """
+    Vectorized score_prediction for one student against n candidate courses.
+
+    `weights` is an (n, 4) array in CATEGORIES order; the other arguments are
+    length-n sequences (None/NaN = unknown), and `model` is as in
+    score_prediction. Returns a dict of arrays: normalized "weights",
+    "final_score", "margin_of_error", "low", "high".
+    """
+    weights = np.asarray(weights, dtype=float)
+    totals = weights.sum(axis=1, keepdims=True)
+    weights = np.divide(weights * 100.0, totals, out=weights.copy(), where=totals > 0)
+
+    cs = strengths.get("category_strengths", {})
+    strength_vec = np.array([float(cs.get(k, DEFAULT_OVERALL)) for k in CATEGORIES])
+    if model is not None:
+        score = model.predict(np.broadcast_to(strength_vec, weights.shape), weights)
+    else:
+        score = weights @ strength_vec / 100.0
+
+    d = np.array([np.nan if v is None else v for v in avg_difficulty], dtype=float)
+    score += np.select([d >= 4.0, d >= 3.3, d >= 2.7], [-3.0, -2.0, -1.0], default=0.0)
+    if model is None and (strengths.get("punctual_strength") or 0) > 90:
+        score += 2.0
+    score += np.where(np.asarray(extra_credit, dtype=bool), 3.0, 0.0)
+    score = np.clip(score, 0.0, 100.0)
+
+    w = np.array([np.nan if v is None else v for v in would_take_again], dtype=float)
+    margin = np.select([np.isnan(w), w < 30, w <= 100], [5.0, 6.0, 4.0], default=3.0)
+    return {
+        "weights": weights,
+        "final_score": score,
+        "margin_of_error": margin,
+        "low": np.maximum(0.0, score - margin),
+        "high": np.minimum(100.0, score + margin),
+    }
@@ -0,0 +1,96 @@
+import hashlib
+import os
+from pathlib import Path
+
+# ----------------- Per-user storage config -----------------
+# Root of the per-user partitions: DATA_DIR/users/<aa>/<key>/
+DATA_DIR = Path(os.getenv("DATA_DIR", "user_data"))
+# Request header carrying a student's own Canvas token
+CANVAS_TOKEN_HEADER = "HTTP_X_CANVAS_TOKEN"
+
+# Legacy single-tenant files, used when a request carries no identity
+DEFAULT_CACHE_PATH = Path("canvas_data_cache.csv")
+DEFAULT_SYNC_STATE_PATH = Path("canvas_sync_state.json")
+DEFAULT_GRADE_MODEL_PATH = Path("grade_model.json")
+
+
+class UserPartition:
+    """
+    One student's slice of the data store. Each user only ever reads and
+    writes their own directory, and every file is replaced atomically, so
+    users never contend on a shared file or lock.
+    """
+
+    def __init__(self, key: str, canvas_token=None, root=None):
+        self.key = key
+        self.canvas_token = canvas_token
+        self.root = Path(root) if root is not None else None
+
+    @property
+    def is_default(self) -> bool:
+        return self.root is None
+
+    def path(self, name: str, default: Path) -> Path:
+        if self.root is None:
+            return default
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / name
+
+    @property
+    def cache_path(self) -> Path:
+        return self.path("canvas_data_cache.csv", DEFAULT_CACHE_PATH)
+
+    @property
+    def sync_state_path(self) -> Path:
+        return self.path("canvas_sync_state.json", DEFAULT_SYNC_STATE_PATH)
+
+    @property
+    def grade_model_path(self) -> Path:
+        return self.path("grade_model.json", DEFAULT_GRADE_MODEL_PATH)
+
+
+def partition_key(identity: str) -> str:
+    # Tokens are secrets: only a digest ever reaches the filesystem
+    return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+
+def partition_from_key(key: str, canvas_token=None) -> UserPartition:
+    if key == "default":
+        return UserPartition("default", canvas_token)
+    return UserPartition(key, canvas_token, DATA_DIR / "users" / key[:2] / key)
+
+
+def partition_for(identity=None, canvas_token=None) -> UserPartition:
+    if not identity:
+        return partition_from_key("default", canvas_token)
+    return partition_from_key(partition_key(identity), canvas_token)
+
+
+def partition_for_token(token: str, user=None) -> UserPartition:
+    """
+    Partition for a request carrying `token`: the logged-in Django user's own
+    (kept across token changes) if there is one, else the token's. Without a
+    token the caller gets the legacy single-tenant files, which sync with the
+    server's CANVAS_TOKEN: a per-user partition must never be filled with
+    another account's Canvas data.
+    """
+    if not token:
+        return partition_for()
+    if user is not None and user.is_authenticated:
+        return partition_for(f"user:{user.pk}", canvas_token=token)
+    return partition_for(f"token:{token}", canvas_token=token)
+
+
+def partition_for_request(request) -> UserPartition:
+    """Partition for the caller, from their X-Canvas-Token and login (see partition_for_token)."""
+    token = (request.META.get(CANVAS_TOKEN_HEADER) or "").strip()
+    return partition_for_token(token, getattr(request, "user", None))
+
+
+async def apartition_for_request(request) -> UserPartition:
+    """partition_for_request for async views, where the user must be loaded with request.auser()."""
+    token = (request.META.get(CANVAS_TOKEN_HEADER) or "").strip()
+    if not token:
+        return partition_for()
+    auser = getattr(request, "auser", None)
+    return partition_for_token(token, await auser() if auser is not None else None)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from .aggregation import CATEGORIES
+
+# Used when a student has no graded history in any category
+DEFAULT_OVERALL = 85.0
+
+
+def _as_matrix(means_rows) -> np.ndarray:
+    """List of {category: percent | None} dicts -> (n, 4) float array, NaN for nulls."""
+    return np.array(
+        [[np.nan if row.get(cat) is None else float(row[cat]) for cat in CATEGORIES] for row in means_rows],
+        dtype=float,
+    ).reshape(-1, len(CATEGORIES))
+
+
+def compute_strengths_matrix(means: np.ndarray):
+    """
+    Vectorized strengths for an (n, 4) matrix of category means (NaN = no data).
+
+    Each null category is replaced by that row's mean of the non-null ones
+    (DEFAULT_OVERALL if the row is all null); overall is the mean of the
+    four filled categories. Returns (filled (n, 4), overall (n,)).
+    """
+    means = np.asarray(means, dtype=float)
+    counts = np.sum(~np.isnan(means), axis=1)
+    sums = np.nansum(means, axis=1)
+    fallback = np.divide(sums, counts, out=np.full(len(means), DEFAULT_OVERALL), where=counts > 0)
+    filled = np.where(np.isnan(means), fallback[:, None], means)
+    return filled, filled.sum(axis=1) / len(CATEGORIES)
+
+
+def compute_strengths_batch(means_rows):
+    """
+    Strengths for many students / course subsets in one pass. Each element of
+    `means_rows` is a {category: percent | None} dict; returns a list of
+    dicts in predict_grade's strengths schema.
+    """
+    filled, overall = compute_strengths_matrix(_as_matrix(means_rows))
+    return [
+        {
+            "category_strengths": {cat: float(v) for cat, v in zip(CATEGORIES, row)},
+            "overall_strength": float(o),
+            # lateness is already reflected in historical scores
+            "punctual_strength": 100.0,
+        }
+        for row, o in zip(filled, overall)
+    ]
+
+
+def compute_strengths(category_means: dict) -> dict:
+    return compute_strengths_batch([category_means])[0]
+
+
+def subset_category_means(df, course_id_subsets):
+    """
+    Per-category means of the cache rows restricted to each list of course
+    ids, e.g. to compare strengths over different slices of history.
+    """
+    cols = [c for c in CATEGORIES if c in df.columns]
+    ids = df["course_id"].to_numpy()
+    values = df[cols].to_numpy(dtype=float)
+    out = []
+    for subset in course_id_subsets:
+        block = values[np.isin(ids, list(subset))]
+        sums = np.nansum(block, axis=0)
+        counts = np.sum(~np.isnan(block), axis=0)
+        means = {cat: None for cat in CATEGORIES}
+        for cat, s, n in zip(cols, sums, counts):
+            means[cat] = float(s / n) if n else None
+        out.append(means)
+    return out
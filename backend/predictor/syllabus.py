@@ -0,0 +1,112 @@
+import re
+
+from .aggregation import CATEGORIES, standardize_category
+
+# Below this, predict_grade asks the LLM to read the syllabus instead
+SYLLABUS_CONFIDENCE_THRESHOLD = 0.8
+
+PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+EXTRA_CREDIT_RE = re.compile(r"extra[\s-]*credit|bonus\s+points?", re.IGNORECASE)
+
+# A line must name one of these to count as a grading component
+COMPONENT_KEYWORDS = [
+    "exam", "midterm", "final", "quiz", "test",
+    "project", "capstone", "lab",
+    "participation", "attendance", "discussion", "poll", "peer",
+    "homework", "hw", "assignment", "problem set", "pset", "reading",
+    "paper", "essay", "report", "presentation", "exercise", "worksheet",
+]
+# ...and none of these (whole words), which signal policies rather than weights
+POLICY_KEYWORDS = [
+    "late", "penalty", "penalties", "deduct", "deducted", "deduction", "per day", "extra credit", "bonus",
+    "curve", "curved", "drop", "dropped", "and above", "or above", "or higher", "at least", "minimum",
+]
+POLICY_RE = re.compile(r"\b(?:%s)\b" % "|".join(re.escape(k) for k in POLICY_KEYWORDS))
+# Confidence is multiplied by this for every line that has a percent and names
+# a component but is not read as one: part of the breakdown may be missing
+REJECTED_LINE_PENALTY = 0.75
+# Breakdowns come one per line, or inline: "Homework 30%, Exams 45%; Project 25%."
+CHUNK_SPLIT_RE = re.compile(r"[\n;,]|\.(?:\s|$)")
+
+
+def _plain(line: str) -> str:
+    label = PERCENT_RE.sub(" ", line).lower()
+    label = re.sub(r"[^a-z ]+", " ", label)
+    return " ".join(label.split())
+
+
+def _component_label(line: str):
+    label = _plain(line)
+    if not label or POLICY_RE.search(label) or not _names_component(label):
+        return None
+    return label
+
+
+def _names_component(label: str) -> bool:
+    return any(re.search(rf"\b{re.escape(k)}", label) for k in COMPONENT_KEYWORDS)
+
+
+def _categorize(label: str) -> str:
+    # "final" alone means the final exam, but "final project"/"final paper"
+    # belong with their noun rather than with exams
+    without_final = re.sub(r"\bfinal\b", " ", label).strip()
+    return standardize_category(without_final or label)
+
+
+def parse_grading_breakdown(text: str) -> dict:
+    """
+    Extract grading weights from a syllabus without calling the LLM.
+
+    Recognizes breakdowns with one component per line, or inline separated
+    by commas, semicolons or sentences, in either order ("Exams 40%",
+    "40% - Homework", "| Midterm | 20 % |", "Homework 30%, Exams 70%."),
+    maps each label onto the four standardized categories and sums them.
+
+    Returns:
+      {
+        "weights": {"projects": %, ...} normalized to 100, or None,
+        "confidence": 0-1,
+        "extra_credit": bool,
+        "components": [(label, category, percent), ...],
+      }
+    """
+    text = text or ""
+    components = []
+    rejected = 0
+    for raw_line in CHUNK_SPLIT_RE.split(text):
+        # table rows ("| Exams | 40% |") read like plain lines once the bars go
+        line = raw_line.replace("|", " ")
+        percents = PERCENT_RE.findall(line)
+        if not percents:
+            continue
+        label = _component_label(line) if len(percents) == 1 else None
+        pct = float(percents[0])
+        if label is None or not 0 < pct <= 100:
+            # A grading scale line ("A 93% and above") is expected; a component
+            # line we cannot read ("Late homework 10% off") may hide a weight
+            rejected += _names_component(_plain(line))
+            continue
+        components.append((label, _categorize(label), pct))
+
+    totals = {cat: 0.0 for cat in CATEGORIES}
+    for _, cat, pct in components:
+        totals[cat] += pct
+    total = sum(totals.values())
+
+    if total <= 0:
+        weights, confidence = None, 0.0
+    else:
+        weights = {cat: v * 100.0 / total for cat, v in totals.items()}
+        # A breakdown that adds up to ~100 is almost certainly the real one;
+        # partial or double-listed breakdowns lose confidence with the gap.
+        confidence = max(0.0, 1.0 - abs(total - 100.0) / 50.0)
+        if len(components) < 2:
+            confidence *= 0.5
+        confidence *= REJECTED_LINE_PENALTY ** rejected
+
+    return {
+        "weights": weights,
+        "confidence": round(confidence, 3),
+        "extra_credit": bool(EXTRA_CREDIT_RE.search(text)),
+        "components": components,
+    }
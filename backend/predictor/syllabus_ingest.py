@@ -0,0 +1,286 @@
+import codecs
+import hashlib
+import os
+import re
+import unicodedata
+import zipfile
+from html.parser import HTMLParser
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Syllabus, SyllabusSource
+from .syllabus import parse_grading_breakdown
+
+# ----------------- Ingestion config -----------------
+# Largest upload accepted, in bytes
+SYLLABUS_MAX_BYTES = int(os.getenv("SYLLABUS_MAX_BYTES", str(10 * 1024 * 1024)))
+# Normalized text beyond this many characters is dropped (grading sections come early)
+SYLLABUS_MAX_CHARS = int(os.getenv("SYLLABUS_MAX_CHARS", "200000"))
+
+CHUNK_SIZE = 64 * 1024
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class IngestError(Exception):
+    """A syllabus that cannot be ingested; `status` is the HTTP status to answer with."""
+
+    status = 422
+
+
+class UnsupportedFormat(IngestError):
+    status = 415
+
+
+class TooLarge(IngestError):
+    status = 413
+
+
+# ----------------- Format detection -----------------
+def detect_format(name: str, content_type: str, head: bytes) -> str:
+    name = (name or "").lower()
+    content_type = (content_type or "").lower()
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        if name.endswith(".docx") or "wordprocessingml" in content_type:
+            return "docx"
+        raise UnsupportedFormat("Zip uploads other than .docx are not supported.")
+    if name.endswith((".html", ".htm")) or "html" in content_type:
+        return "html"
+    if re.match(rb"\s*<(!doctype html|html|head|body|div|p|table)\b", head[:512], re.IGNORECASE):
+        return "html"
+    if name.endswith((".doc", ".rtf", ".odt", ".pages")):
+        raise UnsupportedFormat("Upload the syllabus as PDF, DOCX, HTML or plain text.")
+    return "text"
+
+
+# ----------------- Extraction (each yields text pieces) -----------------
+def _decoded(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+class _HTMLText(HTMLParser):
+    """Visible text of an HTML document; table cells are joined with " | " so rows stay on one line."""
+
+    SKIP = {"script", "style", "noscript", "template", "head"}
+    BLOCK = {"p", "div", "br", "li", "tr", "ul", "ol", "table", "section", "article",
+             "h1", "h2", "h3", "h4", "h5", "h6", "header", "footer", "dt", "dd"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skipping = 0
+        self.pieces = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag in self.BLOCK:
+            self.pieces.append("\n")
+        elif tag in ("td", "th"):
+            self.pieces.append(" | ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCK:
+            self.pieces.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.pieces.append(data)
+
+
+def extract_html(chunks):
+    parser = _HTMLText()
+    for text in _decoded(chunks):
+        parser.feed(text)
+        yield "".join(parser.pieces)
+        parser.pieces.clear()
+    parser.close()
+    yield "".join(parser.pieces)
+
+
+def extract_text(chunks):
+    return _decoded(chunks)
+
+
+def extract_docx(fileobj):
+    """Paragraph text of word/document.xml, parsed incrementally and discarded as it goes."""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+        document = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise IngestError(f"Not a readable .docx file: {e}") from None
+
+    with archive, document:
+        try:
+            yield from _docx_paragraphs(document)
+        except ParseError as e:
+            raise IngestError(f"Not a readable .docx file: {e}") from None
+
+
+def _docx_paragraphs(document):
+    row_depth = 0
+    paragraph = []
+    for event, elem in iterparse(document, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == WORD_NS + "tr":
+                row_depth += 1
+            continue
+        if tag == WORD_NS + "t" and elem.text:
+            paragraph.append(elem.text)
+        elif tag in (WORD_NS + "tab", WORD_NS + "br"):
+            paragraph.append(" ")
+        elif tag == WORD_NS + "p":
+            # Inside a table row, cells' paragraphs join into one line
+            yield "".join(paragraph) + (" | " if row_depth else "\n")
+            paragraph.clear()
+            elem.clear()
+        elif tag == WORD_NS + "tr":
+            row_depth -= 1
+            yield "\n"
+            elem.clear()
+
+
+def extract_pdf(fileobj):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedFormat("PDF syllabi need the optional `pypdf` package on the server.") from None
+    try:
+        reader = PdfReader(fileobj)
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+    except Exception as e:
+        raise IngestError(f"Could not read the PDF: {e}") from None
+
+
+# ----------------- Normalization -----------------
+def normalize_text(pieces) -> str:
+    """
+    Canonical form used for hashing and parsing: NFKC (full-width "％" and
+    non-breaking spaces become plain), one space between words, table rows
+    as "cell | cell", no blank lines, trimmed to SYLLABUS_MAX_CHARS. Copies
+    of a syllabus that differ only in formatting hash the same.
+    """
+    lines, size, pending = [], 0, ""
+    for piece in pieces:
+        pending += piece
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            line = _normalize_line(line)
+            if line:
+                lines.append(line)
+                size += len(line) + 1
+        if size >= SYLLABUS_MAX_CHARS:
+            break
+    else:
+        line = _normalize_line(pending)
+        if line:
+            lines.append(line)
+    return "\n".join(lines)[:SYLLABUS_MAX_CHARS]
+
+
+def _normalize_line(line: str) -> str:
+    # Table rows become "cell | cell" whichever format they came from
+    return " ".join(unicodedata.normalize("NFKC", line).split()).strip(" |")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ----------------- Ingestion -----------------
+def _source_hash(upload) -> tuple:
+    """(sha256 of the upload's bytes, first bytes) in one streaming pass; enforces SYLLABUS_MAX_BYTES."""
+    if upload.size is not None and upload.size > SYLLABUS_MAX_BYTES:
+        raise TooLarge(f"Syllabus uploads are limited to {SYLLABUS_MAX_BYTES} bytes.")
+    digest, head, size = hashlib.sha256(), b"", 0
+    for chunk in upload.chunks(CHUNK_SIZE):
+        size += len(chunk)
+        if size > SYLLABUS_MAX_BYTES:
+            raise TooLarge(f"Syllabus uploads are limited to {SYLLABUS_MAX_BYTES} bytes.")
+        if len(head) < 512:
+            head += chunk[:512 - len(head)]
+        digest.update(chunk)
+    return digest.hexdigest(), head
+
+
+def _extract(upload, fmt: str):
+    upload.seek(0)
+    if fmt == "pdf":
+        return extract_pdf(upload)
+    if fmt == "docx":
+        return extract_docx(upload)
+    chunks = upload.chunks(CHUNK_SIZE)
+    return extract_html(chunks) if fmt == "html" else extract_text(chunks)
+
+
+def _store(text: str, source_type: str) -> tuple:
+    """Syllabus row for `text`, parsing it only if no row exists yet; returns (syllabus, created)."""
+    if not text:
+        raise IngestError("No text could be extracted from the syllabus.")
+    key = content_hash(text)
+    updated = Syllabus.objects.filter(pk=key).update(submissions=F("submissions") + 1)
+    if updated:
+        return Syllabus.objects.get(pk=key), False
+
+    breakdown = parse_grading_breakdown(text)
+    try:
+        with transaction.atomic():
+            syllabus = Syllabus.objects.create(
+                content_hash=key,
+                text=text,
+                source_type=source_type,
+                weights=breakdown["weights"],
+                confidence=breakdown["confidence"],
+                extra_credit=breakdown["extra_credit"],
+                components=[list(c) for c in breakdown["components"]],
+            )
+        return syllabus, True
+    except IntegrityError:
+        # Another request stored the same syllabus first
+        Syllabus.objects.filter(pk=key).update(submissions=F("submissions") + 1)
+        return Syllabus.objects.get(pk=key), False
+
+
+def ingest_text(text: str) -> tuple:
+    """Pasted syllabus text -> (Syllabus, created)."""
+    return _store(normalize_text([text or ""]), "text")
+
+
+def ingest_upload(upload) -> tuple:
+    """
+    Uploaded PDF / DOCX / HTML / text file -> (Syllabus, created).
+
+    The bytes are hashed first, so a file seen before resolves to its
+    syllabus without being extracted again. Otherwise text is extracted
+    piece by piece (pages, paragraphs, decoded chunks), normalized and
+    stored by content hash, so different files with the same text share
+    one parsed syllabus.
+    """
+    source_hash, head = _source_hash(upload)
+    source = SyllabusSource.objects.select_related("syllabus").filter(pk=source_hash).first()
+    if source is not None:
+        Syllabus.objects.filter(pk=source.syllabus_id).update(submissions=F("submissions") + 1)
+        source.syllabus.refresh_from_db()
+        return source.syllabus, False
+
+    fmt = detect_format(upload.name, getattr(upload, "content_type", ""), head)
+    syllabus, created = _store(normalize_text(_extract(upload, fmt)), fmt)
+    SyllabusSource.objects.get_or_create(source_hash=source_hash, defaults={"syllabus": syllabus})
+    return syllabus, created
+
+
+def get_syllabi(hashes) -> dict:
+    """content_hash -> Syllabus for the given hashes, in one query; unknown hashes are absent."""
+    hashes = {h for h in hashes if h}
+    if not hashes:
+        return {}
+    return {s.content_hash: s for s in Syllabus.objects.filter(pk__in=hashes)}
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from predictor.aggregation import CATEGORIES, aggregate_courses, standardize_category
+from predictor.bench import FakeCanvas
+
+
+def pandas_aggregate(courses):
+    """Reference: the same group and category aggregates as a pandas groupby."""
+    rows = []
+    for ci, (groups, submissions) in enumerate(courses):
+        scores = {s["assignment_id"]: s.get("score") for s in submissions}
+        for gi, group in enumerate(groups):
+            for a in group["assignments"] or [{"id": None, "points_possible": 0}]:
+                rows.append({"course": ci, "group": gi, "name": group["name"],
+                             "points": a.get("points_possible") or 0, "score": scores.get(a["id"])})
+    df = pd.DataFrame(rows)
+    df["score"] = df["score"].astype(float)
+    df["graded"] = df["score"].notna() & (df["points"] > 0)
+    df["earned"] = df["score"].where(df["graded"], 0.0)
+    df["possible"] = df["points"].where(df["graded"], 0)
+    groups = df.groupby(["course", "group", "name"], sort=True)[["earned", "possible"]].sum().reset_index()
+    groups["percent"] = (groups["earned"] / groups["possible"] * 100).where(groups["possible"] > 0)
+    groups["category"] = groups["name"].map(standardize_category)
+    categories = groups.groupby(["course", "category"])["percent"].mean()
+    return groups, categories
+
+
+class AggregateCoursesTests(SimpleTestCase):
+    def setUp(self):
+        canvas = FakeCanvas(courses=5, groups=6, assignments=7)
+        self.courses = [(canvas.groups[c["id"]], canvas.submissions[c["id"]]) for c in canvas.courses]
+        # A group with nothing graded, and one whose assignments are worth no points
+        self.courses[0][0].append({"id": 1, "name": "Extra Labs", "assignments": [{"id": 2, "points_possible": 10}]})
+        self.courses[1][0].append({"id": 3, "name": "Polls", "assignments": [{"id": 4, "points_possible": 0}]})
+        self.courses[1][1].append({"assignment_id": 4, "score": 1})
+
+    def test_matches_pandas_groupby(self):
+        results = aggregate_courses(self.courses)
+        groups, categories = pandas_aggregate(self.courses)
+
+        for ci, result in enumerate(results):
+            expected = groups[groups["course"] == ci]
+            self.assertEqual([g["category"] for g in result["groups"]], expected["name"].tolist())
+            np.testing.assert_allclose([g["earned_points"] for g in result["groups"]], expected["earned"])
+            np.testing.assert_allclose([g["total_points"] for g in result["groups"]], expected["possible"])
+            np.testing.assert_allclose(
+                [np.nan if g["percent"] is None else g["percent"] for g in result["groups"]], expected["percent"]
+            )
+            for cat in CATEGORIES:
+                want = categories.get((ci, cat), np.nan)
+                got = result["standardized_percents"][cat]
+                if np.isnan(want):
+                    self.assertIsNone(got)
+                else:
+                    self.assertAlmostEqual(got, want)
+
+    def test_category_percent_is_order_independent(self):
+        reversed_courses = [(list(reversed(groups)), subs) for groups, subs in self.courses]
+        forward = [r["standardized_percents"] for r in aggregate_courses(self.courses)]
+        backward = [r["standardized_percents"] for r in aggregate_courses(reversed_courses)]
+        for f, b in zip(forward, backward):
+            for cat in CATEGORIES:
+                if f[cat] is None:
+                    self.assertIsNone(b[cat])
+                else:
+                    self.assertAlmostEqual(f[cat], b[cat])
+
+    def test_malformed_course_fails_alone(self):
+        results = aggregate_courses([self.courses[0], ({"errors": "nope"}, [])])
+        self.assertNotIn("error", results[0])
+        self.assertIn("error", results[1])
+        self.assertEqual(results[1]["groups"], [])
+
+    def test_assignment_listing(self):
+        groups, submissions = self.courses[2]
+        result = aggregate_courses([(groups, submissions)], with_assignments=True)[0]
+        listed = result["groups"][0]["assignments"]
+        self.assertEqual([a["id"] for a in listed], [a["id"] for a in groups[0]["assignments"]])
+        self.assertEqual(result["groups"][0]["assignment_count"], len(groups[0]["assignments"]))
@@ -0,0 +1,138 @@
+import json
+import tempfile
+from pathlib import Path
+
+import requests
+from django.test import SimpleTestCase
+from openai import OpenAI
+
+from predictor.bench import Cassette, FakeCanvas, FakeOpenAI, FakeRMP, latency_summary, run_load
+
+
+def get_all(url, **params):
+    """Every item behind a paginated Canvas URL, and the number of pages fetched."""
+    items, pages = [], 0
+    while url:
+        r = requests.get(url, params=params, timeout=5)
+        r.raise_for_status()
+        items.extend(r.json())
+        url, params, pages = r.links.get("next", {}).get("url"), None, pages + 1
+    return items, pages
+
+
+class FakeCanvasTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeCanvas(courses=5, groups=3, assignments=4, per_page_cap=2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.stop()
+        super().tearDownClass()
+
+    def test_pagination_is_capped(self):
+        courses, pages = get_all(f"{self.fake.api_url}/courses", per_page=100)
+        self.assertEqual(courses, self.fake.courses)
+        self.assertEqual(pages, 3)
+
+    def test_enrollment_score_matches_submissions(self):
+        course_id = self.fake.courses[1]["id"]
+        groups, _ = get_all(f"{self.fake.api_url}/courses/{course_id}/assignment_groups")
+        submissions, _ = get_all(f"{self.fake.api_url}/courses/{course_id}/students/submissions")
+        points = {a["id"]: a["points_possible"] for g in groups for a in g["assignments"]}
+        earned = sum(s["score"] for s in submissions)
+        possible = sum(points[s["assignment_id"]] for s in submissions)
+        enrollments, _ = get_all(f"{self.fake.api_url}/courses/{course_id}/enrollments")
+        self.assertAlmostEqual(enrollments[0]["grades"]["final_score"], round(100 * earned / possible, 2))
+
+    def test_unknown_course(self):
+        self.assertEqual(requests.get(f"{self.fake.api_url}/courses/1", timeout=5).status_code, 404)
+
+    def test_graphql_course_batch(self):
+        course_id = self.fake.courses[0]["id"]
+        query = f'query CourseBatch {{ c0: course(id: "{course_id}") {{ ...Course }} ' \
+                'gone: course(id: "1") { ...Course } }'
+        r = requests.post(f"{self.fake.origin}/api/graphql", json={"query": query, "variables": {"first": 2}},
+                          timeout=5)
+        body = r.json()
+        groups = body["data"]["c0"]["assignmentGroupsConnection"]
+        self.assertEqual(len(groups["nodes"]), 2)
+        self.assertEqual(groups["pageInfo"], {"hasNextPage": True, "endCursor": "2"})
+        self.assertIsNone(body["data"]["gone"])
+        self.assertEqual(body["errors"][0]["path"], ["gone"])
+
+    def test_cassette_replays_offline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "canvas.json"
+            with FakeCanvas(cassette=Cassette(path), upstream=self.fake.origin) as recorder:
+                recorded, _ = get_all(f"{recorder.api_url}/courses")
+                recorder.cassette.save()
+            self.assertNotIn(self.fake.origin, path.read_text())
+            with FakeCanvas(courses=0, cassette=Cassette(path)) as replay:
+                replayed, pages = get_all(f"{replay.api_url}/courses")
+                self.assertEqual(replay.misses, 0)
+                requests.get(f"{replay.api_url}/courses/1", timeout=5)
+                self.assertEqual(replay.misses, 1)
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(pages, 3)
+
+
+class FakeOpenAITests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeOpenAI(reply_words=10, stream_chunks=4).start()
+        cls.openai_client = OpenAI(api_key="test", base_url=cls.fake.api_url, max_retries=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.stop()
+        super().tearDownClass()
+
+    def chat(self, **kwargs):
+        return self.openai_client.chat.completions.create(
+            model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}], **kwargs
+        )
+
+    def test_json_mode_parses(self):
+        reply = json.loads(self.chat(response_format={"type": "json_object"}).choices[0].message.content)
+        self.assertEqual(set(reply["category_strengths"]), {"projects", "assignments", "exams", "participation"})
+        self.assertIn("final_score", reply)
+
+    def test_stream_matches_the_plain_reply(self):
+        plain = self.chat().choices[0].message.content
+        chunks = [c.choices[0].delta.content or "" for c in self.chat(stream=True)]
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual("".join(chunks), plain)
+        self.assertEqual(len(plain.split()), 10)
+
+
+class FakeRMPTests(SimpleTestCase):
+    def test_installed_swaps_the_fetchers_back(self):
+        import RateMyProfessor_Database_APIs as rmp
+
+        original = rmp.fetch_a_professor
+        fake = FakeRMP(professors=3)
+        with fake.installed():
+            self.assertEqual(rmp.fetch_a_professor(2).legacy_id, 2)
+            self.assertEqual(len(rmp.fetch_all_professors_from_a_school(1)), 3)
+            with self.assertRaises(ValueError):
+                rmp.fetch_a_professor(4)
+        self.assertIs(rmp.fetch_a_professor, original)
+        self.assertEqual(fake.calls, 3)
+
+
+class LoadTests(SimpleTestCase):
+    def test_run_load_counts_errors(self):
+        statuses = iter([200, 500, 200, 200])
+        summary = run_load(lambda: next(statuses), total=3, warmup=1)
+        self.assertEqual(summary["requests"], 3)
+        self.assertEqual(summary["errors"], 1)
+
+    def test_latency_summary(self):
+        summary = latency_summary(range(1, 101), wall_seconds=2.0)
+        self.assertEqual(summary["p50_ms"], 50.5)
+        self.assertEqual(summary["max_ms"], 100.0)
+        self.assertEqual(summary["throughput_rps"], 50.0)
+        self.assertEqual(latency_summary([], 1.0)["requests"], 0)
@@ -0,0 +1,57 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from predictor import cache_snapshot
+from predictor.cache_snapshot import bump_cache_version, get_cache_snapshot
+
+
+class GetCacheSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(3):
+            path = Path(self.dir.name) / f"user{i}.csv"
+            path.write_text(f"course_id,name,projects\n{i},Course {i},{90 + i}\n")
+            self.paths.append(path)
+        patches = [mock.patch.object(cache_snapshot, "_snapshots", cache_snapshot.OrderedDict()),
+                   mock.patch.dict(cache_snapshot._versions, clear=True),
+                   mock.patch.object(cache_snapshot, "SNAPSHOT_CACHE_SIZE", 2)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_reloads_only_when_the_file_changes(self):
+        snap = get_cache_snapshot(self.paths[0])
+        self.assertIs(get_cache_snapshot(self.paths[0]), snap)
+        bump_cache_version(self.paths[0])
+        fresh = get_cache_snapshot(self.paths[0])
+        self.assertIsNot(fresh, snap)
+        self.assertEqual(fresh.category_means["projects"], 90.0)
+
+    def test_parses_outside_the_lock(self):
+        read_csv = pd.read_csv
+
+        def checked_read_csv(*args, **kwargs):
+            self.assertFalse(cache_snapshot._lock.locked())
+            return read_csv(*args, **kwargs)
+
+        with mock.patch.object(pd, "read_csv", checked_read_csv):
+            self.assertEqual(get_cache_snapshot(self.paths[0]).course_name(0), "Course 0")
+
+    def test_evicts_the_least_recently_used(self):
+        first = get_cache_snapshot(self.paths[0])
+        get_cache_snapshot(self.paths[1])
+        bump_cache_version(self.paths[1])
+        # A hit makes user0 the most recent, so loading user2 evicts user1
+        self.assertIs(get_cache_snapshot(self.paths[0]), first)
+        get_cache_snapshot(self.paths[2])
+        keys = [cache_snapshot._key(p) for p in self.paths]
+        self.assertEqual(list(cache_snapshot._snapshots), [keys[0], keys[2]])
+        self.assertNotIn(keys[1], cache_snapshot._versions)
@@ -0,0 +1,106 @@
+import json
+import math
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from predictor import canvas_graphql
+from predictor.bench import FakeCanvas
+from predictor.canvas_client import CanvasClient
+from predictor.canvas_sync import (
+    SYNC_STATE_VERSION, graphql_sync_canvas_data, is_concluded, list_courses, sync_canvas_data,
+)
+
+BACKENDS = {"rest": sync_canvas_data, "graphql": graphql_sync_canvas_data}
+
+
+class CanvasSyncTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Small pages, so both backends have to follow pagination
+        cls.fake = FakeCanvas(courses=6, groups=5, assignments=5, per_page_cap=4).start()
+        cls.page_size = mock.patch.object(canvas_graphql, "CANVAS_GRAPHQL_PAGE_SIZE", 4)
+        cls.page_size.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.page_size.stop()
+        cls.fake.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.canvas = CanvasClient(base_url=self.fake.api_url, token="test")
+        self.courses = list_courses(self.canvas)
+        self.active = [c for c in self.courses if not is_concluded(c)]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def sync(self, backend, state="state.json", **kwargs):
+        before = self.fake.requests
+        all_data, rows = BACKENDS[backend](
+            self.courses, 4, state_path=Path(self.dir.name) / state, canvas=self.canvas, **kwargs
+        )
+        return all_data, rows, self.fake.requests - before
+
+    def test_rest_and_graphql_agree(self):
+        rest_data, rest_rows, rest_requests = self.sync("rest", "rest.json")
+        graphql_data, graphql_rows, graphql_requests = self.sync("graphql", "graphql.json")
+        self.assertEqual(len(rest_rows), len(self.courses))
+        self.assertEqual(graphql_data, rest_data)
+        self.assertEqual(graphql_rows, rest_rows)
+        self.assertFalse([entry for entry in graphql_data if "error" in entry])
+        self.assertLess(graphql_requests, rest_requests)
+        scores = {row["course_id"]: row["final_score"] for row in rest_rows}
+        self.assertEqual(scores, {c["id"]: self.fake.scores[c["id"]] for c in self.courses})
+
+    def test_incremental_reuses_unchanged_courses(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                state = f"{backend}.json"
+                _, rows, _ = self.sync(backend, state)
+                _, again, requests = self.sync(backend, state, incremental=True)
+                self.assertEqual(again, rows)
+                if backend == "rest":
+                    # Only the submissions of each active course are checked
+                    pages = sum(math.ceil(len(self.fake.submissions[c["id"]]) / 4) for c in self.active)
+                    self.assertEqual(requests, pages)
+
+    def test_incremental_refetches_changed_course(self):
+        _, rows, _ = self.sync("rest")
+        course_id = self.active[0]["id"]
+        submissions = self.fake.submissions[course_id]
+        original = submissions[0]["score"]
+        submissions[0]["score"] = 0.0
+        try:
+            for backend in BACKENDS:
+                with self.subTest(backend=backend):
+                    _, fresh, _ = self.sync(backend, "state.json", incremental=True)
+                    changed = [new for old, new in zip(rows, fresh) if old != new]
+                    self.assertEqual([row["course_id"] for row in changed], [course_id])
+        finally:
+            submissions[0]["score"] = original
+
+    def test_state_from_another_version_is_ignored(self):
+        _, rows, full = self.sync("rest")
+        path = Path(self.dir.name) / "state.json"
+        state = json.loads(path.read_text())
+        self.assertEqual(state["version"], SYNC_STATE_VERSION)
+        # The pre-version layout: course entries at the top level, here with stale rows
+        path.write_text(json.dumps({k: {**v, "row": {"stale": True}} for k, v in state["courses"].items()}))
+        _, again, requests = self.sync("rest", incremental=True)
+        self.assertEqual(requests, full)
+        self.assertEqual(again, rows)
+
+    def test_failed_course_fails_alone(self):
+        courses = self.courses + [{"id": 999999, "name": "Gone"}]
+        for backend, sync in BACKENDS.items():
+            with self.subTest(backend=backend):
+                all_data, rows = sync(courses, 4, state_path=Path(self.dir.name) / f"{backend}.json",
+                                      canvas=self.canvas)
+                self.assertIn("error", all_data[-1])
+                self.assertEqual(len(rows), len(self.courses))
@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from predictor.distribution import MIN_PREDICTION_SD, predict_distributions, score_model_from_cache
+
+
+class PredictDistributionsTests(SimpleTestCase):
+    def test_finished_course_keeps_some_spread(self):
+        model = score_model_from_cache(pd.DataFrame())
+        done = np.ones((1, 4))
+        dist = predict_distributions([88.0], [[25] * 4], [88.0] * 4, model,
+                                     done=done, current=np.full((1, 4), 88.0), remaining=np.zeros((1, 4)))
+        self.assertAlmostEqual(float(dist["sd"][0]), MIN_PREDICTION_SD)
+        self.assertLess(dist["letter_probabilities"][0].max(), 1.0)
+        wider = predict_distributions([88.0], [[25] * 4], [88.0] * 4, model, done=done,
+                                      current=np.full((1, 4), 88.0), noise_sd=2 * MIN_PREDICTION_SD)
+        self.assertAlmostEqual(float(wider["sd"][0]), 2 * MIN_PREDICTION_SD)
@@ -0,0 +1,85 @@
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from predictor.grade_model import (
+    FEATURES, GradeModel, load_grade_model, save_grade_model, update_grade_model,
+)
+
+
+def history(n=30, curve=3.0, seed=0):
+    """Completed courses whose final score is their weighted category average plus `curve`."""
+    rng = np.random.default_rng(seed)
+    percents = rng.uniform(65, 100, (n, 4))
+    weights = rng.uniform(5, 40, (n, 4))
+    base = (percents * weights).sum(axis=1) / weights.sum(axis=1)
+    return list(range(1, n + 1)), percents, weights, base + curve
+
+
+class GradeModelTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "grade_model.json"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_untrained_model_predicts_weighted_average(self):
+        model = GradeModel()
+        self.assertIsNone(model.residual_sd())
+        predicted = model.predict([[90.0, 80.0, np.nan, 100.0]], [[50, 25, 20, 25]])
+        self.assertAlmostEqual(float(predicted[0]), 90.0)
+
+    def test_add_learns_and_skips_seen_courses(self):
+        ids, percents, weights, finals = history()
+        model = GradeModel()
+        self.assertEqual(model.add(ids, percents, weights, finals), len(ids))
+        self.assertEqual(model.add(ids, percents, weights, finals), 0)
+        self.assertEqual(model.rows, len(ids))
+        # Ridge shrinks the learned curve toward zero, but not all the way
+        predicted = model.predict([[85.0] * 4], [[25] * 4])[0]
+        self.assertGreater(predicted, 86.5)
+        self.assertLess(predicted, 88.0)
+        self.assertLess(model.residual_sd(), 1.0)
+
+    def test_add_is_incremental(self):
+        ids, percents, weights, finals = history()
+        once = GradeModel()
+        once.add(ids, percents, weights, finals)
+        twice = GradeModel()
+        twice.add(ids[:10], percents[:10], weights[:10], finals[:10])
+        twice.add(ids[10:], percents[10:], weights[10:], finals[10:])
+        np.testing.assert_allclose(once.coefficients(), twice.coefficients())
+
+    def test_unusable_rows_are_skipped(self):
+        model = GradeModel()
+        added = model.add([1, 2], [[np.nan] * 4, [90, 90, 90, 90]], [[1] * 4, [1] * 4], [95.0, np.nan])
+        self.assertEqual(added, 0)
+
+    def test_save_and_load(self):
+        model = GradeModel()
+        model.add(*history())
+        save_grade_model(model, self.path)
+        loaded = load_grade_model(self.path)
+        self.assertEqual(loaded.course_ids, model.course_ids)
+        np.testing.assert_allclose(loaded.coefficients(), model.coefficients())
+        self.assertAlmostEqual(loaded.residual_sd(), model.residual_sd())
+        self.assertEqual(list(self.path.parent.glob("*.tmp")), [])
+
+    def test_load_missing_or_foreign_file(self):
+        self.assertEqual(load_grade_model(self.path).rows, 0)
+        self.path.write_text(json.dumps({"features": FEATURES[:-1]}))
+        with self.assertRaises(ValueError):
+            load_grade_model(self.path)
+
+    def test_update_folds_in_concluded_courses_only(self):
+        rows = [
+            {"course_id": 1, "concluded": True, "final_score": 91.0, "projects": 90, "exams": 88},
+            {"course_id": 2, "concluded": False, "final_score": 70.0, "projects": 60, "exams": 75},
+        ]
+        model = update_grade_model(self.path, rows)
+        self.assertEqual(model.course_ids, {1})
+        self.assertEqual(load_grade_model(self.path).course_ids, {1})
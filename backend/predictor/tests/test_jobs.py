@@ -0,0 +1,90 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+
+from predictor import jobs
+from predictor.models import SyncJob
+from predictor.storage import partition_for
+
+
+class EnqueueSyncJobTests(TestCase):
+    def setUp(self):
+        patches = [mock.patch.object(jobs, "SYNC_WORKER_INPROCESS", False),
+                   mock.patch.object(jobs, "ensure_worker"),
+                   mock.patch.dict(jobs._job_tokens, clear=True)]
+        self.ensure_worker = [p.start() for p in patches][1]
+        for p in patches:
+            self.addCleanup(p.stop)
+
+    def test_coalesces_onto_the_active_job(self):
+        job, created = jobs.enqueue_sync_job(partition_for(), 4, "full")
+        again, created_again = jobs.enqueue_sync_job(partition_for(), 1, "incremental")
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, job.pk)
+        SyncJob.objects.filter(pk=job.pk).update(status=SyncJob.SUCCEEDED)
+        _, created_after = jobs.enqueue_sync_job(partition_for(), 4, "full")
+        self.assertTrue(created_after)
+
+    def test_one_active_job_per_owner(self):
+        SyncJob.objects.create(owner="someone")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SyncJob.objects.create(owner="someone", status=SyncJob.RUNNING)
+        SyncJob.objects.create(owner="someone", status=SyncJob.FAILED)
+
+    def test_lost_race_coalesces(self):
+        winner = SyncJob.objects.create(owner=partition_for().key)
+        first = QuerySet.first
+        lookups = []
+
+        def miss_once(queryset):
+            # The first lookup misses the job a concurrent request just queued
+            lookups.append(queryset)
+            return None if len(lookups) == 1 else first(queryset)
+
+        with mock.patch.object(QuerySet, "first", miss_once):
+            job, created = jobs.enqueue_sync_job(partition_for(), 4, "full")
+        self.assertFalse(created)
+        self.assertEqual(job.pk, winner.pk)
+        self.assertEqual(len(lookups), 2)
+
+    def test_invalid_job_is_not_retried(self):
+        # A CHECK violation is not a lost race: it must fail at once, not spin
+        with self.assertRaises(IntegrityError):
+            jobs.enqueue_sync_job(partition_for(), -1, "full")
+        self.assertFalse(SyncJob.objects.exists())
+
+    def test_gives_up_when_every_lookup_misses(self):
+        SyncJob.objects.create(owner=partition_for().key)
+        with mock.patch.object(QuerySet, "first", lambda queryset: None), self.assertRaises(RuntimeError):
+            jobs.enqueue_sync_job(partition_for(), 4, "full")
+
+    def test_token_stays_in_memory(self):
+        partition = partition_for("token:secret", canvas_token="secret")
+        job, _ = jobs.enqueue_sync_job(partition, 4, "full")
+        self.assertEqual(jobs._job_tokens, {job.pk: "secret"})
+        self.assertNotIn("canvas_token", [f.name for f in SyncJob._meta.fields])
+        # Per-user jobs run here even when the web process has no worker of its own
+        self.ensure_worker.assert_called_once()
+        self.assertEqual(jobs.claim_next_job().pk, job.pk)
+
+    def test_only_jobs_with_a_known_token_are_claimed(self):
+        SyncJob.objects.create(owner=partition_for("token:lost").key)
+        self.assertIsNone(jobs.claim_next_job())
+        shared = SyncJob.objects.create(owner="default")
+        self.assertEqual(jobs.claim_next_job().pk, shared.pk)
+
+    def test_stale_per_user_job_fails(self):
+        old = timezone.now() - timedelta(seconds=jobs.SYNC_JOB_STALE_SECONDS + 60)
+        user_job = SyncJob.objects.create(owner=partition_for("token:lost").key, status=SyncJob.RUNNING)
+        shared_job = SyncJob.objects.create(owner="default", status=SyncJob.RUNNING)
+        SyncJob.objects.update(updated_at=old)
+        jobs.requeue_stale_jobs()
+        user_job.refresh_from_db()
+        shared_job.refresh_from_db()
+        self.assertEqual(user_job.status, SyncJob.FAILED)
+        self.assertEqual(shared_job.status, SyncJob.QUEUED)
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from predictor import rate_limit
+from predictor.rate_limit import AdaptiveLimiter, is_throttled, limiter_for
+
+PLENTY = {"X-Rate-Limit-Remaining": "700", "X-Request-Cost": "1"}
+
+
+class AdaptiveLimiterTests(SimpleTestCase):
+    def limiter(self, initial=4):
+        return AdaptiveLimiter(initial=initial, maximum=8, floor=150, decrease=0.5)
+
+    def test_additive_increase(self):
+        limiter = self.limiter()
+        for _ in range(4):
+            limiter.release(limiter.acquire(), PLENTY)
+        # +1/limit per answered request: one window of successes adds about one slot
+        self.assertAlmostEqual(limiter.limit, 5.0, delta=0.2)
+        for _ in range(100):
+            limiter.release(limiter.acquire(), PLENTY)
+        self.assertEqual(limiter.limit, 8)
+
+    def test_throttle_halves_the_limit_once_per_burst(self):
+        limiter = self.limiter()
+        sent = [limiter.acquire() for _ in range(3)]
+        for sent_at in sent:
+            limiter.release(sent_at, {}, throttled=True)
+        self.assertEqual(limiter.limit, 2.0)
+        self.assertEqual(limiter.stats()["throttled"], 3)
+        # A request sent after the cut can cut again
+        limiter.release(limiter.acquire(), {}, throttled=True)
+        self.assertEqual(limiter.limit, 1.0)
+        limiter.release(limiter.acquire(), {}, throttled=True)
+        self.assertEqual(limiter.limit, 1.0)
+
+    def test_low_remaining_cuts_before_throttling(self):
+        limiter = self.limiter()
+        limiter.release(limiter.acquire(), {"X-Rate-Limit-Remaining": "120", "X-Request-Cost": "5"})
+        self.assertEqual(limiter.limit, 2.0)
+        self.assertEqual(limiter.stats()["remaining"], 120.0)
+
+    def test_no_response_leaves_the_limit(self):
+        limiter = self.limiter()
+        limiter.release(limiter.acquire(), None)
+        self.assertEqual(limiter.limit, 4.0)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_acquire_blocks_at_the_limit(self):
+        limiter = self.limiter(initial=1)
+        sent_at = limiter.acquire()
+        acquired = threading.Event()
+
+        def second():
+            limiter.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=second)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release(sent_at, PLENTY)
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+    def test_is_throttled(self):
+        self.assertTrue(is_throttled(429, {}))
+        self.assertTrue(is_throttled(403, {}, "403 Forbidden (Rate Limit Exceeded)"))
+        self.assertTrue(is_throttled(403, {"X-Rate-Limit-Remaining": "0"}))
+        self.assertFalse(is_throttled(403, {"X-Rate-Limit-Remaining": "300"}, "unauthorized"))
+        self.assertFalse(is_throttled(200, {}))
+
+
+class LimiterForTests(SimpleTestCase):
+    def setUp(self):
+        patches = [mock.patch.object(rate_limit, "_limiters", OrderedDict()),
+                   mock.patch.object(rate_limit, "LIMITER_CACHE_SIZE", 2)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_one_limiter_per_token(self):
+        self.assertIs(limiter_for("a"), limiter_for("a"))
+        self.assertIsNot(limiter_for("a"), limiter_for("b"))
+
+    def test_least_recently_used_idle_limiter_is_dropped(self):
+        a, b = limiter_for("a"), limiter_for("b")
+        limiter_for("a")
+        limiter_for("c")
+        self.assertEqual(len(rate_limit._limiters), 2)
+        self.assertIs(limiter_for("a"), a)
+        self.assertIsNot(limiter_for("b"), b)
+
+    def test_busy_limiter_is_kept(self):
+        a = limiter_for("a")
+        a.acquire()
+        limiter_for("b")
+        limiter_for("c")
+        self.assertIs(limiter_for("a"), a)
@@ -0,0 +1,149 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from predictor import resilience
+from predictor.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, Policy, RetryableStatus, Throttled, is_retryable,
+)
+
+
+class Flaky:
+    """attempt(timeout) that raises the given errors in turn, then returns "ok"."""
+
+    def __init__(self, *errors, delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def response(status, **headers):
+    return SimpleNamespace(status_code=status, headers=headers)
+
+
+class PolicyTests(SimpleTestCase):
+    def policy(self, **kwargs):
+        kwargs.setdefault("breaker", CircuitBreaker("test", failures=3, reset_seconds=60))
+        return Policy("test", **{"timeout": 1.0, "backoff": 0.0, **kwargs})
+
+    def test_retries_retryable_errors(self):
+        attempt = Flaky(ConnectionError(), TimeoutError())
+        self.assertEqual(self.policy(retries=2).call(attempt), "ok")
+        self.assertEqual(attempt.calls, 3)
+
+    def test_gives_up_after_retries(self):
+        attempt = Flaky(ConnectionError(), ConnectionError())
+        with self.assertRaises(ConnectionError):
+            self.policy(retries=1).call(attempt)
+        self.assertEqual(attempt.calls, 2)
+
+    def test_non_retryable_error_is_raised_at_once(self):
+        attempt = Flaky(ValueError("bad request"))
+        with self.assertRaises(ValueError):
+            self.policy(retries=3).call(attempt)
+        self.assertEqual(attempt.calls, 1)
+
+    def test_retryable_status_returns_the_last_response(self):
+        last = response(503)
+        attempt = Flaky(RetryableStatus(response(502)), RetryableStatus(last))
+        self.assertIs(self.policy(retries=1).call(attempt), last)
+
+    def test_retry_after_sets_the_backoff(self):
+        attempt = Flaky(Throttled(response(429, **{"Retry-After": "0.05"})))
+        start = time.monotonic()
+        self.assertEqual(self.policy(retries=1).call(attempt), "ok")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_deadline_spans_all_attempts(self):
+        attempt = Flaky(*[ConnectionError()] * 10, delay=0.04)
+        with self.assertRaises(DeadlineExceeded):
+            self.policy(timeout=0.05, deadline=0.1, retries=10).call(attempt)
+        self.assertLess(attempt.calls, 10)
+        # Each attempt only gets the time left
+        self.assertLess(attempt.timeouts[-1], 0.05)
+
+    def test_enforced_timeout_abandons_a_slow_attempt(self):
+        attempt = Flaky(delay=0.2)
+        with self.assertRaises(DeadlineExceeded):
+            self.policy(timeout=0.05, enforce_timeout=True).call(attempt)
+
+    def test_hedged_call_takes_the_first_answer(self):
+        calls = []
+
+        def attempt(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                time.sleep(0.3)
+                return "slow"
+            return "hedge"
+
+        self.assertEqual(self.policy(hedge_after=0.02).call(attempt, idempotent=True), "hedge")
+        self.assertEqual(len(calls), 2)
+
+    def test_hedged_call_enforces_the_timeout(self):
+        with self.assertRaises(DeadlineExceeded):
+            self.policy(timeout=0.1, hedge_after=0.02, enforce_timeout=True).call(Flaky(delay=0.5), idempotent=True)
+
+    def test_concurrent_hedged_calls_do_not_starve_the_pool(self):
+        # As many callers as upstream threads: every thread must run an attempt, not wait on one
+        policy = self.policy(timeout=1.0, hedge_after=0.5, enforce_timeout=True)
+        with mock.patch.object(resilience, "_pool", ThreadPoolExecutor(max_workers=2)) as pool, \
+                ThreadPoolExecutor(max_workers=2) as callers:
+            results = list(callers.map(lambda _: policy.call(Flaky(delay=0.05), idempotent=True), range(2)))
+        pool.shutdown()
+        self.assertEqual(results, ["ok", "ok"])
+
+    def test_breaker_opens_and_fails_fast(self):
+        breaker = CircuitBreaker("test", failures=2, reset_seconds=60)
+        policy = self.policy(breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                policy.call(Flaky(ConnectionError()))
+        self.assertEqual(breaker.state, "open")
+        attempt = Flaky()
+        with self.assertRaises(CircuitOpenError):
+            policy.call(attempt)
+        self.assertEqual(attempt.calls, 0)
+
+    def test_breaker_half_open_trial_closes_it(self):
+        breaker = CircuitBreaker("test", failures=1, reset_seconds=0.02)
+        policy = self.policy(breaker=breaker)
+        with self.assertRaises(ConnectionError):
+            policy.call(Flaky(ConnectionError()))
+        time.sleep(0.03)
+        self.assertEqual(breaker.state, "half_open")
+        self.assertEqual(policy.call(Flaky()), "ok")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_throttles_and_client_errors_do_not_open_the_breaker(self):
+        breaker = CircuitBreaker("test", failures=1, reset_seconds=60)
+        policy = self.policy(breaker=breaker)
+        policy.call(Flaky(Throttled(response(429))))
+        with self.assertRaises(ValueError):
+            policy.call(Flaky(ValueError()))
+        self.assertEqual(breaker.state, "closed")
+
+    def test_is_retryable(self):
+        self.assertTrue(is_retryable(ConnectionError()))
+        self.assertTrue(is_retryable(HTTPError(503)))
+        self.assertFalse(is_retryable(HTTPError(404)))
+        self.assertFalse(is_retryable(ValueError()))
@@ -0,0 +1,51 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from predictor.aggregation import CATEGORIES
+from predictor.grade_model import GradeModel
+from predictor.scoring import difficulty_drag, score_prediction, score_predictions_batch
+
+STRENGTHS = {
+    "category_strengths": {"projects": 88.0, "assignments": 91.0, "exams": 84.0, "participation": 97.0},
+    "punctual_strength": 100.0,
+}
+WEIGHTS = {"projects": 25.0, "assignments": 35.0, "exams": 35.0, "participation": 5.0}
+
+
+def trained_model():
+    rng = np.random.default_rng(0)
+    percents = rng.uniform(65, 100, (30, 4))
+    weights = rng.uniform(5, 40, (30, 4))
+    finals = (percents * weights).sum(axis=1) / weights.sum(axis=1) + 3.0
+    model = GradeModel()
+    model.add(list(range(30)), percents, weights, finals)
+    return model
+
+
+class ScorePredictionTests(SimpleTestCase):
+    def test_rule_table_adds_the_punctuality_bonus(self):
+        average = sum(STRENGTHS["category_strengths"][k] * WEIGHTS[k] / 100 for k in CATEGORIES)
+        result = score_prediction(STRENGTHS, WEIGHTS, {"avg_difficulty": 3.5})
+        self.assertAlmostEqual(result["final_score"], average + difficulty_drag(3.5) + 2.0)
+
+    def test_model_score_only_gets_the_difficulty_drag(self):
+        model = trained_model()
+        predicted = model.predict([[STRENGTHS["category_strengths"][k] for k in CATEGORIES]],
+                                  [[WEIGHTS[k] for k in CATEGORIES]])[0]
+        rmp = {"avg_difficulty": 4.2}
+        result = score_prediction(STRENGTHS, WEIGHTS, rmp, model=model)
+        self.assertAlmostEqual(result["final_score"], predicted + difficulty_drag(4.2))
+
+    def test_batch_matches_single(self):
+        model = trained_model()
+        weights = [[WEIGHTS[k] for k in CATEGORIES], [10.0, 20.0, 60.0, 10.0]]
+        for m in (None, model):
+            with self.subTest(model=m is not None):
+                batch = score_predictions_batch(STRENGTHS, weights, [2.8, None], [25.0, None], [False, True], m)
+                for i, (difficulty, again, extra) in enumerate([(2.8, 25.0, False), (None, None, True)]):
+                    single = score_prediction(
+                        STRENGTHS, dict(zip(CATEGORIES, weights[i])),
+                        {"avg_difficulty": difficulty, "would_take_again_percent": again}, extra, m,
+                    )
+                    self.assertAlmostEqual(batch["final_score"][i], single["final_score"])
+                    self.assertEqual(batch["margin_of_error"][i], single["margin_of_error"])
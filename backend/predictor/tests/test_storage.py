@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from predictor.storage import partition_for_request
+
+
+class PartitionForRequestTests(SimpleTestCase):
+    def request(self, token=None, user_pk=None):
+        meta = {"HTTP_X_CANVAS_TOKEN": token} if token else {}
+        user = SimpleNamespace(pk=user_pk, is_authenticated=user_pk is not None)
+        return SimpleNamespace(META=meta, user=user)
+
+    def test_token_partition(self):
+        partition = partition_for_request(self.request(token="abc"))
+        self.assertFalse(partition.is_default)
+        self.assertEqual(partition.canvas_token, "abc")
+        self.assertNotIn("abc", str(partition.root))
+
+    def test_logged_in_user_with_token(self):
+        first = partition_for_request(self.request(token="abc", user_pk=7))
+        rotated = partition_for_request(self.request(token="def", user_pk=7))
+        self.assertEqual(first.key, rotated.key)
+        self.assertEqual(rotated.canvas_token, "def")
+
+    def test_logged_in_user_without_token_gets_the_shared_files(self):
+        partition = partition_for_request(self.request(user_pk=7))
+        self.assertTrue(partition.is_default)
+        self.assertIsNone(partition.canvas_token)
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from openai import OpenAI
+
+from predictor import llm_cache, views
+from predictor.bench import FakeOpenAI
+from predictor.syllabus import REJECTED_LINE_PENALTY, SYLLABUS_CONFIDENCE_THRESHOLD, parse_grading_breakdown
+
+
+class ParseGradingBreakdownTests(SimpleTestCase):
+    def test_one_component_per_line(self):
+        result = parse_grading_breakdown("Exams 40%\nProjects 30%\nHomework 20%\nParticipation 10%")
+        self.assertEqual(result["weights"], {"projects": 30.0, "assignments": 20.0, "exams": 40.0,
+                                             "participation": 10.0})
+        self.assertEqual(result["confidence"], 1.0)
+        self.assertFalse(result["extra_credit"])
+
+    def test_either_order_and_tables(self):
+        result = parse_grading_breakdown("40% - Midterm\n| Final | 30 % |\n| Labs | 30% |")
+        self.assertEqual(result["weights"]["exams"], 70.0)
+        self.assertEqual(result["weights"]["projects"], 30.0)
+
+    def test_inline_list(self):
+        result = parse_grading_breakdown(
+            "Grading: Homework 30%, Exams 45%, Final Project 20%, Participation 5%."
+        )
+        self.assertEqual(result["weights"], {"projects": 20.0, "assignments": 30.0, "exams": 45.0,
+                                             "participation": 5.0})
+        self.assertEqual(result["confidence"], 1.0)
+
+    def test_sentences(self):
+        result = parse_grading_breakdown("Homework is worth 12.5%. Quizzes are 12.5%. Exams count 75%.")
+        self.assertEqual(result["weights"]["exams"], 87.5)
+        self.assertEqual(result["weights"]["assignments"], 12.5)
+
+    def test_policy_words_match_whole_words(self):
+        # "related" contains "late" but is not a late policy
+        result = parse_grading_breakdown("Exams 60%\nHomework 35%\nParticipation and related work 5%")
+        self.assertEqual(result["weights"]["participation"], 5.0)
+        self.assertEqual(result["confidence"], 1.0)
+
+    def test_rejected_component_line_lowers_confidence(self):
+        text = "Exams 40%\nProjects 30%\nHomework 20%\nParticipation 10%"
+        result = parse_grading_breakdown(text + "\nLate homework loses 10% per day")
+        self.assertEqual(result["weights"]["exams"], 40.0)
+        self.assertEqual(result["confidence"], REJECTED_LINE_PENALTY)
+        self.assertLess(result["confidence"], SYLLABUS_CONFIDENCE_THRESHOLD)
+
+    def test_grade_scale_keeps_confidence(self):
+        text = "Exams 40%\nProjects 30%\nHomework 20%\nParticipation 10%\nA: 93% and above\nB: 83% or higher"
+        self.assertEqual(parse_grading_breakdown(text)["confidence"], 1.0)
+
+    def test_partial_breakdown_loses_confidence(self):
+        result = parse_grading_breakdown("Exams 50%\nHomework 20%")
+        self.assertAlmostEqual(result["confidence"], 0.4)
+
+    def test_no_breakdown(self):
+        result = parse_grading_breakdown("Office hours are on Tuesdays.")
+        self.assertIsNone(result["weights"])
+        self.assertEqual(result["confidence"], 0.0)
+
+    def test_extra_credit(self):
+        self.assertTrue(parse_grading_breakdown("Exams 100%\nExtra credit is available")["extra_credit"])
+
+
+class ResolveWeightsTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.openai = FakeOpenAI().start()
+        cls.openai_client = OpenAI(api_key="test", base_url=cls.openai.api_url, max_retries=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.openai.stop()
+        super().tearDownClass()
+
+    def resolve(self, text):
+        with mock.patch.object(views, "get_openai_client", lambda: self.openai_client), \
+                mock.patch.object(llm_cache, "LLM_CACHE_ENABLED", False):
+            before = self.openai.requests
+            weights, note = views.resolve_weights(text, parse_grading_breakdown(text))
+            return weights, note, self.openai.requests - before
+
+    def test_confident_parse_skips_the_llm(self):
+        weights, note, calls = self.resolve("Homework 30%, Exams 45%, Final Project 20%, Participation 5%.")
+        self.assertEqual(calls, 0)
+        self.assertIsNone(note)
+        self.assertEqual(weights["exams"], 45.0)
+
+    def test_unsure_parse_asks_the_llm(self):
+        weights, note, calls = self.resolve("Grades come from exams and a few projects.")
+        self.assertEqual(calls, 1)
+        self.assertIsNone(note)
+        self.assertEqual(weights, {"projects": 25.0, "assignments": 35.0, "exams": 35.0, "participation": 5.0})
@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+from predictor import views
+
+
+class PredictGradeBatchTests(SimpleTestCase):
+    def test_non_numeric_professor_id(self):
+        request = APIRequestFactory().post("/api/predict-grade/batch/", {"candidates": [
+            {"course": "CS 0441", "professor_id": 12},
+            {"course": "CS 0445", "professor_id": "not-a-number"},
+        ]}, format="json")
+        response = views.predict_grade_batch(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Candidate 1", response.data["error"])
+
+
+class SyncOptionsTests(SimpleTestCase):
+    def test_concurrency_is_clamped(self):
+        self.assertEqual(views.sync_options({"concurrency": "-1"})[0], 1)
+        self.assertEqual(views.sync_options({"concurrency": "0"})[0], 1)
+        self.assertEqual(views.sync_options({"concurrency": "100000"})[0], views.CANVAS_AIMD_MAX)
+        self.assertEqual(views.sync_options({"concurrency": "3", "mode": "incremental"}), (3, True))
+        self.assertEqual(views.sync_options({"concurrency": "many"})[0],
+                         min(max(views.CANVAS_CONCURRENCY, 1), views.CANVAS_AIMD_MAX))
+
+
+class WantsLlmStrengthsTests(SimpleTestCase):
+    def test_only_clear_yes_values_opt_in(self):
+        for value in (True, "true", "TRUE", "1", 1, "yes"):
+            with self.subTest(value=value):
+                self.assertTrue(views.wants_llm_strengths({"llm_strengths": value}))
+        for value in (False, "false", "False", "0", 0, "no"):
+            with self.subTest(value=value):
+                self.assertFalse(views.wants_llm_strengths({"llm_strengths": value}))
+
+    def test_anything_else_is_the_default(self):
+        for default in (False, True):
+            with self.subTest(default=default), mock.patch.object(views, "USE_LLM_STRENGTHS", default):
+                self.assertIs(views.wants_llm_strengths({}), default)
+                self.assertIs(views.wants_llm_strengths({"llm_strengths": "maybe"}), default)
+                self.assertIs(views.wants_llm_strengths({"llm_strengths": [1]}), default)
@@ -0,0 +1,69 @@
+from django.test import SimpleTestCase
+
+from predictor.whatif import WhatIfCourse, parse_target
+
+
+def group(group_id, name, weight, assignments):
+    return {"id": group_id, "name": name, "group_weight": weight,
+            "assignments": [{"id": a, "points_possible": p} for a, p in assignments]}
+
+
+class WhatIfSolveTests(SimpleTestCase):
+    def setUp(self):
+        # Points-based: 40/50 graded, 50 points still to come
+        self.points = WhatIfCourse([group(1, "Homework", None, [(11, 50), (12, 50)])],
+                                   [{"assignment_id": 11, "score": 40}])
+        # Weighted 60/40: homework fully graded at 90%, the exam not taken yet
+        self.weighted = WhatIfCourse(
+            [group(1, "Homework", 60, [(11, 50), (12, 50)]), group(2, "Final Exam", 40, [(21, 100)])],
+            [{"assignment_id": 11, "score": 45}, {"assignment_id": 12, "score": 45}],
+        )
+
+    def test_points_course(self):
+        result = self.points.solve([90, 80, 30])
+        self.assertFalse(result["weighted"])
+        self.assertEqual(result["current_percent"], 80.0)
+        self.assertEqual(result["min_percent"], 40.0)
+        self.assertEqual(result["max_percent"], 90.0)
+        need_90, need_80, need_30 = result["targets"]
+        self.assertEqual(need_90["required_percent"], 100.0)
+        self.assertTrue(need_90["achievable"])
+        self.assertEqual(need_80["required_percent"], 80.0)
+        self.assertEqual(need_30["required_percent"], 0.0)
+        self.assertTrue(need_30["secured"])
+
+    def test_weighted_course(self):
+        result = self.weighted.solve([90, 95])
+        self.assertTrue(result["weighted"])
+        self.assertEqual([g["share"] for g in result["groups"]], [60.0, 40.0])
+        need_90, need_95 = result["targets"]
+        # 60 * 0.9 = 54 secured; the exam (40% of the grade) must bring 36 more
+        self.assertEqual(need_90["required_percent"], 90.0)
+        self.assertEqual(need_90["by_category"]["exams"], 90.0)
+        self.assertIsNone(need_90["by_category"]["assignments"])
+        self.assertIsNone(need_90["by_group"]["Homework"])
+        self.assertEqual(need_95["required_percent"], 102.5)
+        self.assertFalse(need_95["achievable"])
+
+    def test_edits(self):
+        result = self.weighted.solve([90], edits={21: 90})
+        self.assertEqual(result["current_percent"], 90.0)
+        self.assertTrue(result["targets"][0]["secured"])
+        # Un-grading a homework leaves its points open again
+        reopened = self.weighted.solve([90], edits={12: None})
+        self.assertEqual(reopened["groups"][0]["remaining_points"], 50.0)
+        with self.assertRaises(KeyError):
+            self.weighted.solve([90], edits={999: 1})
+
+    def test_excused_counts_for_nothing(self):
+        course = WhatIfCourse([group(1, "Homework", None, [(11, 50), (12, 50)])],
+                              [{"assignment_id": 11, "score": 40}, {"assignment_id": 12, "excused": True}])
+        result = course.solve([80])
+        self.assertEqual(result["current_percent"], 80.0)
+        self.assertTrue(result["targets"][0]["secured"])
+
+    def test_parse_target(self):
+        self.assertEqual(parse_target("A-"), 90.0)
+        self.assertEqual(parse_target(87.5), 87.5)
+        with self.assertRaises(ValueError):
+            parse_target("Z")
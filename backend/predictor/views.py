@@ -1,65 +1,100 @@
 import os
 import json
 import csv
-import requests
-import pandas as pd
-from pathlib import Path
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from openai import OpenAI
-import RateMyProfessor_Database_APIs
+
+from .aggregation import CATEGORIES, aggregate_courses
+from .canvas_client import get_canvas_client
+from .cache_snapshot import get_cache_snapshot
+from .distribution import distribution_fields, predict_distributions
+from .grade_model import get_grade_model
+from .canvas_sync import CANVAS_CONCURRENCY, CANVAS_SYNC_MODE, run_canvas_sync
+from .jobs import enqueue_sync_job
+from .models import SyncJob
+from .llm_cache import cached_chat_completion, get_llm_cache, stream_chat_completion
+from .metrics import REGISTRY, record_pipeline, timed
+from .pipeline import Pipeline
+from .rate_limit import CANVAS_AIMD_MAX
+from .rmp_index import fetch_professor, get_rmp_index, professor_record
+from .scoring import DEFAULT_WEIGHTS, score_prediction, score_predictions_batch
+from .storage import partition_for_request
+from .strengths import DEFAULT_OVERALL, compute_strengths
+from .syllabus import SYLLABUS_CONFIDENCE_THRESHOLD, parse_grading_breakdown
+from .syllabus_ingest import IngestError, get_syllabi, ingest_text, ingest_upload
+from .whatif import LETTER_GRADES, WhatIfCourse, get_whatif_course, parse_target
+
+logger = logging.getLogger(__name__)
 
 # ----------------- OpenAI client -----------------
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Built on first use: importing `openai` costs about a second, which every
+# worker boot and manage.py command would otherwise pay.
+_client = None
+_client_lock = threading.Lock()
 
-# Cache path
-CACHE_PATH = Path("canvas_data_cache.csv")
 
-# ----------------- Canvas API config -----------------
-CANVAS_API_URL = os.getenv("CANVAS_API_URL", "https://canvas.pitt.edu/api/v1")
-CANVAS_TOKEN = os.getenv("CANVAS_TOKEN")
-headers = {"Authorization": f"Bearer {CANVAS_TOKEN}"}
+def get_openai_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
 
-# ----------------- RMP helper -----------------
-def get_professor_info(professor_id: int):
-    try:
-        prof = RateMyProfessor_Database_APIs.fetch_a_professor(professor_id)
+                # Retries and timeouts come from llm_cache.OPENAI_POLICY, not the SDK
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _client
 
-        def safe_float(val):
-            try:
-                return float(str(val).replace("%", "").strip())
-            except Exception:
-                return None
 
-        def safe_int(val):
-            try:
-                return int(val)
-            except Exception:
-                return None
+# Strengths are computed locally; set to route them through the LLM instead
+USE_LLM_STRENGTHS = os.getenv("USE_LLM_STRENGTHS", "").lower() in ("1", "true", "yes")
+# Score with the model trained on the student's completed courses (else the plain rule table)
+USE_GRADE_MODEL = os.getenv("USE_GRADE_MODEL", "1").lower() in ("1", "true", "yes")
 
-        return {
-            "name": f"{prof.first_name} {prof.last_name}",
-            "avg_rating": safe_float(prof.avg_rating),
-            "avg_difficulty": safe_float(prof.avg_difficulty),
-            "num_ratings": safe_int(prof.num_ratings),
-            "would_take_again_percent": safe_float(prof.would_take_again_percent),
-        }
+# ----------------- RMP helper -----------------
+def get_professor_info(professor_id: int):
+    # Served from the school-wide index when it has the professor
+    index = get_rmp_index()
+    if index is not None:
+        info = index.get(professor_id)
+        if info is not None:
+            return info
+    try:
+        prof = fetch_professor(professor_id)
+        return professor_record(prof)
     except Exception as e:
         return {"error": str(e)}
 
+
+@api_view(["GET"])
+def search_professors(request):
+    """?name=<professor name> -> matching professors from the local RMP index."""
+    index = get_rmp_index()
+    if index is None:
+        return Response({"error": "Professor index is not available yet."}, status=503)
+    return Response(index.search(request.query_params.get("name", "")))
+
 # ----------------- Health check -----------------
 @api_view(["GET"])
 def health_check(request):
     return Response({"status": "ok"})
 
-# ----------------- Explain prediction -----------------
-@api_view(["POST"])
-def explain_prediction(request):
-    course = request.data.get("course")
-    grade = request.data.get("predicted_grade")
-    factors = request.data.get("factors", [])
-    professor_id = request.data.get("professor_id")
+# ----------------- Metrics -----------------
+@api_view(["GET"])
+def prometheus_metrics(request):
+    """Prometheus text exposition of this worker's request, stage and upstream metrics."""
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ----------------- LLM cache stats -----------------
+@api_view(["GET"])
+def llm_cache_stats(request):
+    return Response(get_llm_cache().stats())
 
+# ----------------- Explain prediction -----------------
+def explanation_request(course, grade, factors) -> dict:
     prompt = f"""
     A student is considering {course}.
     Their predicted grade is {grade}.
@@ -67,14 +102,23 @@ def explain_prediction(request):
 
     Write a short explanation (2-3 sentences) plus a bulleted list of 3 main reasons.
     """
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=150,
-    )
-    explanation = completion.choices[0].message.content.strip()
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": prompt}], "max_tokens": 150}
 
-    professor_info = get_professor_info(professor_id) if professor_id else None
+
+@api_view(["POST"])
+def explain_prediction(request):
+    course = request.data.get("course")
+    grade = request.data.get("predicted_grade")
+    factors = request.data.get("factors", [])
+    professor_id = request.data.get("professor_id")
+
+    with timed("explanation"):
+        explanation = cached_chat_completion(
+            get_openai_client(), **explanation_request(course, grade, factors)
+        ).strip()
+
+    with timed("rmp"):
+        professor_info = get_professor_info(professor_id) if professor_id else None
 
     return Response({
         "explanation": explanation,
@@ -84,241 +128,191 @@ def explain_prediction(request):
 # ----------------- List courses -----------------
 @api_view(["GET"])
 def get_canvas_courses(request):
-   url = f"{CANVAS_API_URL}/courses"
-   response = requests.get(url, headers=headers)
-   return Response(response.json())
+   courses = get_canvas_client(partition_for_request(request).canvas_token).get_all("/courses", params={"per_page": 100})
+   return Response(courses)
 
 # ----------------- Get grades by category for a course -----------------
 @api_view(["GET"])
 def get_canvas_category_grades(request, course_id: int):
-   course_url = f"{CANVAS_API_URL}/courses/{course_id}"
-   course_info = requests.get(course_url, headers=headers).json()
-
-   url = f"{CANVAS_API_URL}/courses/{course_id}/assignment_groups"
-   groups = requests.get(url, headers=headers, params={"include[]": "assignments"}).json()
-
-   sub_url = f"{CANVAS_API_URL}/courses/{course_id}/students/submissions"
-   submissions = requests.get(sub_url, headers=headers, params={"student_ids[]": "self"}).json()
-   submission_map = {s.get("assignment_id"): s for s in submissions if isinstance(s, dict)}
-
-   results = []
-   for g in groups:
-       total_points, earned_points = 0, 0
-       assignments_list = []
-
-       for a in g.get("assignments", []):
-           assignment_id = a["id"]
-           points_possible = a.get("points_possible") or 0
-           submission = submission_map.get(assignment_id)
-
-           score = submission.get("score") if submission else None
-           late = submission.get("late") if submission else None
-           excused = submission.get("excused") if submission else None
-
-           if score is not None and points_possible > 0:
-               earned_points += score
-               total_points += points_possible
-
-           assignments_list.append({
-               "id": assignment_id,
-               "name": a.get("name"),
-               "points_possible": points_possible,
-               "score": score,
-               "late": late,
-               "excused": excused,
-               "html_url": a.get("html_url"),
-           })
-
-       percent = (earned_points / total_points * 100) if total_points > 0 else None
-
-       results.append({
-           "category": g["name"],
-           "weight": g.get("group_weight"),
-           "earned_points": earned_points,
-           "total_points": total_points,
-           "percent": percent,
-           "assignments": assignments_list
-       })
-
-   return Response({
+   canvas = get_canvas_client(partition_for_request(request).canvas_token)
+   course_info = canvas.get(f"/courses/{course_id}")
+   groups = canvas.get_all(f"/courses/{course_id}/assignment_groups",
+                           params={"include[]": "assignments", "per_page": 100})
+   submissions = canvas.get_all(f"/courses/{course_id}/students/submissions",
+                                params={"student_ids[]": "self", "per_page": 100})
+
+   body, status = category_grades(course_info, groups, submissions)
+   return Response(body, status=status)
+
+
+def category_grades(course_info, groups, submissions):
+   """(body, status) of the category grades endpoint for one course's Canvas data."""
+   # Same aggregation engine as the all-data sync, so both endpoints agree
+   agg = aggregate_courses([(groups, submissions)], with_assignments=True)[0]
+   if "error" in agg:
+       return {"error": agg["error"]}, 502
+
+   return {
        "course": {
            "id": course_info.get("id"),
            "name": course_info.get("name"),
            "course_code": course_info.get("course_code"),
        },
-       "categories": results
-   })
+       "categories": agg["groups"],
+       "standardized_percents": agg["standardized_percents"],
+   }, 200
 
-# ----------------- Get all Canvas data -----------------
-@api_view(["GET"])
-def get_canvas_all_data(request):
-    courses_url = f"{CANVAS_API_URL}/courses"
-    params = {
-        "enrollment_state[]": ["active", "completed", "invited_or_pending"],
-        "per_page": 100,
-        "include[]": ["term"],
-    }
-    courses = requests.get(courses_url, headers=headers, params=params).json()
+# ----------------- What-if grade solver -----------------
+@api_view(["POST"])
+def canvas_what_if(request, course_id: int):
+    """
+    "What do I need on the rest to get an A?" for one course.
 
-    all_data, csv_rows = [], []
+    Body (all optional):
+      {
+        "target": 90 | "A-",               # default: every letter cutoff
+        "edits": {assignment_id: score | null},  # hypothetical scores (points); null = ungraded
+        "refresh": bool                     # re-fetch from Canvas instead of the cached copy
+      }
+    The course's Canvas data is kept in memory for WHATIF_CACHE_SECONDS, so
+    re-solves while dragging a slider do no Canvas calls. See
+    whatif.WhatIfCourse.solve for the response.
+    """
+    data = request.data
+    if "target" in data and data["target"] is not None:
+        try:
+            targets = [(None, parse_target(data["target"]))]
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+    else:
+        targets = [(letter, cutoff) for letter, cutoff in LETTER_GRADES if cutoff > 0]
+
+    edits = data.get("edits") or {}
+    if not isinstance(edits, dict):
+        return Response({"error": "'edits' must map assignment ids to scores."}, status=400)
+    try:
+        edits = {int(k): (None if v is None else float(v)) for k, v in edits.items()}
+    except (TypeError, ValueError):
+        return Response({"error": "'edits' must map assignment ids to numeric scores or null."}, status=400)
 
-    def standardize_category(name: str) -> str:
-        n = (name or "").lower()
-        if any(k in n for k in ["exam", "midterm", "final", "quiz", "test"]):
-            return "exams"
-        if any(k in n for k in ["project", "capstone", "lab"]):
-            return "projects"
-        if any(k in n for k in ["participation", "attendance", "discussion", "poll", "peer"]):
-            return "participation"
-        return "assignments"
+    partition = partition_for_request(request)
 
-    for course in courses:
-        try:
-            course_id = course.get("id")
-            if not course_id:
-                continue
-
-            detail_url = f"{CANVAS_API_URL}/courses/{course_id}"
-            course_info = requests.get(detail_url, headers=headers).json()
-            term = (course.get("term") or {}).get("name", "")
-
-            # Get official grades
-            enrollments_url = f"{CANVAS_API_URL}/courses/{course_id}/enrollments"
-            enrollments = requests.get(
-                enrollments_url,
-                headers=headers,
-                params={"user_id": "self", "type[]": "StudentEnrollment"},
-            ).json()
-            final_grade, final_score = None, None
-            if isinstance(enrollments, list) and len(enrollments) > 0:
-                grades = enrollments[0].get("grades", {})
-                final_grade = grades.get("final_grade") or grades.get("current_grade")
-                final_score = grades.get("final_score") or grades.get("current_score")
-
-            # Assignment groups + submissions
-            groups_url = f"{CANVAS_API_URL}/courses/{course_id}/assignment_groups"
-            groups = requests.get(groups_url, headers=headers,
-                                  params={"include[]": "assignments"}).json()
-            sub_url = f"{CANVAS_API_URL}/courses/{course_id}/students/submissions"
-            submissions = requests.get(sub_url, headers=headers,
-                                       params={"student_ids[]": "self"}).json()
-            submission_map = {s.get("assignment_id"): s for s in submissions if isinstance(s, dict)}
-
-            categories, cat_percents = [], {"projects": None, "assignments": None, "exams": None, "participation": None}
-            for g in groups:
-                total_points, earned_points = 0, 0
-                for a in g.get("assignments", []):
-                    points_possible = a.get("points_possible") or 0
-                    submission = submission_map.get(a["id"])
-                    score = submission.get("score") if submission else None
-                    if score is not None and points_possible > 0:
-                        earned_points += score
-                        total_points += points_possible
-                percent = (earned_points / total_points * 100) if total_points > 0 else None
-
-                std_cat = standardize_category(g["name"])
-                if percent is not None:
-                    if cat_percents[std_cat] is None:
-                        cat_percents[std_cat] = percent
-                    else:
-                        cat_percents[std_cat] = (cat_percents[std_cat] + percent) / 2
-
-                categories.append({
-                    "category": g["name"],
-                    "standardized": std_cat,
-                    "weight": g.get("group_weight"),
-                    "percent": percent,
-                })
-
-            course_entry = {
-                "id": course_id,
-                "name": course_info.get("name"),
-                "course_code": course_info.get("course_code"),
-                "term": term,
-                "final_grade": final_grade,
-                "final_score": final_score,
-                "categories": categories,
-                "standardized_percents": cat_percents,
-            }
-            all_data.append(course_entry)
-
-            row = {
-                "course_id": course_id,
-                "name": course_info.get("name"),
-                "course_code": course_info.get("course_code"),
-                "term": term,
-                "final_grade": final_grade,
-                "final_score": final_score,
-                "projects": cat_percents["projects"],
-                "assignments": cat_percents["assignments"],
-                "exams": cat_percents["exams"],
-                "participation": cat_percents["participation"],
-            }
-            csv_rows.append(row)
+    def load():
+        canvas = get_canvas_client(partition.canvas_token)
+        course_info = canvas.get(f"/courses/{course_id}")
+        groups = canvas.get_all(f"/courses/{course_id}/assignment_groups",
+                                params={"include[]": "assignments", "per_page": 100})
+        submissions = canvas.get_all(f"/courses/{course_id}/students/submissions",
+                                     params={"student_ids[]": "self", "per_page": 100})
+        return WhatIfCourse(groups, submissions, course_info.get("apply_assignment_group_weights"))
 
-        except Exception as e:
-            all_data.append({"course": {"id": course.get("id"), "name": course.get("name")}, "error": str(e)})
+    try:
+        course = get_whatif_course(partition.key, course_id, load, refresh=bool(data.get("refresh")))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=502)
 
     try:
-        pd.DataFrame(csv_rows).to_csv(CACHE_PATH, index=False)
-    except Exception as e:
-        print("Cache write failed:", e)
+        with timed("what_if"):
+            result = course.solve([t for _, t in targets], edits)
+    except KeyError as e:
+        return Response({"error": f"Unknown assignment id {e.args[0]} in 'edits'."}, status=400)
+    for (letter, _), solved in zip(targets, result["targets"]):
+        if letter is not None:
+            solved["letter"] = letter
+    return Response(result)
+
+# ----------------- Get all Canvas data -----------------
+def sync_options(params):
+    """
+    (concurrency, incremental) from query params, defaulting to the env
+    config. Concurrency is clamped to 1..CANVAS_AIMD_MAX: the rate limiter
+    never allows more requests in flight, and the job table rejects < 1.
+    """
+    try:
+        concurrency = int(params.get("concurrency", CANVAS_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = CANVAS_CONCURRENCY
+    concurrency = min(max(concurrency, 1), CANVAS_AIMD_MAX)
+    incremental = params.get("mode", CANVAS_SYNC_MODE) == "incremental"
+    return concurrency, incremental
 
-    return Response(all_data)
+
+@api_view(["GET"])
+def get_canvas_all_data(request):
+    """
+    Optional query params:
+      - `concurrency` overrides CANVAS_CONCURRENCY (1 = fetch courses sequentially).
+      - `mode` overrides CANVAS_SYNC_MODE ("full" or "incremental").
+    """
+    concurrency, incremental = sync_options(request.query_params)
+    return Response(run_canvas_sync(concurrency, incremental=incremental, partition=partition_for_request(request)))
 
 
-# ----------------- Predict grade -----------------
+# ----------------- Background Canvas sync -----------------
 @api_view(["POST"])
-def predict_grade(request):
+def start_canvas_sync(request):
     """
-    Returns:
-      {
-        "category_strengths": {"projects": %, "assignments": %, "exams": %, "participation": %},
-        "overall_strength": %,
-        "punctual_strength": %,
-        "final_score": number,
-        "margin_of_error": number,
-        "range": [low, high],
-        "projects": number,        # syllabus weight %
-        "assignments": number,     # syllabus weight %
-        "exams": number,           # syllabus weight %
-        "participation": number,   # syllabus weight %
-        "rmp": {
-          "avg_difficulty": number | null,
-          "would_take_again_percent": number | null
-        }
-      }
+    Queue a background sync (same `concurrency` / `mode` params as all-data)
+    and return its job right away. While a sync is queued or running,
+    further requests get that job instead of a new one.
     """
-    professor_id = request.data.get("professor_id")
-    syllabus_text = (request.data.get("syllabus_text") or "").strip()
+    concurrency, incremental = sync_options(request.query_params)
+    job, created = enqueue_sync_job(
+        partition_for_request(request), concurrency=concurrency, mode="incremental" if incremental else "full"
+    )
+    return Response(job.as_dict(), status=202 if created else 200)
+
+
+@api_view(["GET"])
+def canvas_sync_status(request, job_id: int):
+    """Status and progress (courses done / total); `result` is set once the job succeeds."""
+    # Only the user who queued a job can see it (and its synced data)
+    job = SyncJob.objects.filter(pk=job_id, owner=partition_for_request(request).key).first()
+    if job is None:
+        return Response({"error": "Unknown sync job."}, status=404)
+    return Response(job.as_dict(include_result=True))
 
-    # -------- Guard: need local Canvas cache ----------
-    if not CACHE_PATH.exists():
-        return Response(
-            {"error": "No Canvas data cache found. Run /api/canvas/all-data first."},
-            status=400,
-        )
 
-    # -------- Load cache ----------
+# ----------------- Syllabi -----------------
+@api_view(["POST"])
+def ingest_syllabus(request):
+    """
+    Store a syllabus once and get back its hash for predict_grade.
+
+    Body: multipart "file" (PDF / DOCX / HTML / plain text) or "syllabus_text".
+    Returns the stored syllabus (syllabus_hash, parsed weights, confidence,
+    components, ...) with 201 when it is new, 200 when an identical one
+    (same file bytes or same normalized text) was already stored.
+    """
+    upload = request.FILES.get("file")
+    text = request.data.get("syllabus_text")
+    if upload is None and not (isinstance(text, str) and text.strip()):
+        return Response({"error": "Upload a 'file' or send 'syllabus_text'."}, status=400)
     try:
-        df = pd.read_csv(CACHE_PATH)
-    except Exception as e:
-        return Response({"error": f"Failed to read cache: {str(e)}"}, status=500)
-
-    # -------- Compute historical strengths from all courses ----------
-    category_means = {}
-    for cat in ["projects", "assignments", "exams", "participation"]:
-        if cat in df.columns:
-            valid = df[cat].dropna()
-            category_means[cat] = float(valid.mean()) if not valid.empty else None
-        else:
-            category_means[cat] = None
-
-    # If everything is None, set a sane overall (avoid division by zero)
-    non_null_vals = [v for v in category_means.values() if v is not None]
-    default_overall = float(sum(non_null_vals) / len(non_null_vals)) if non_null_vals else 85.0
-
-    # -------- Ask AI to finalize strengths JSON (ensures all 4 cats present) ----------
+        with timed("syllabus_ingest"):
+            syllabus, created = ingest_upload(upload) if upload is not None else ingest_text(text)
+    except IngestError as e:
+        return Response({"error": str(e)}, status=e.status)
+    return Response({**syllabus.as_dict(), "created": created}, status=201 if created else 200)
+
+
+@api_view(["GET"])
+def get_syllabus(request, syllabus_hash: str):
+    """A stored syllabus; `?include_text=1` adds its normalized text."""
+    syllabus = get_syllabi([syllabus_hash]).get(syllabus_hash)
+    if syllabus is None:
+        return Response({"error": "Syllabus not found."}, status=404)
+    include_text = request.query_params.get("include_text", "").lower() in ("1", "true", "yes")
+    return Response(syllabus.as_dict(include_text=include_text))
+
+
+# ----------------- Predict grade -----------------
+# Run independent predict_grade stages concurrently (strengths / RMP / syllabus / course name)
+PREDICT_PARALLEL = os.getenv("PREDICT_PARALLEL", "1").lower() in ("1", "true", "yes")
+
+
+def strengths_request(category_means: dict, default_overall: float) -> dict:
+    """chat.completions kwargs for the opt-in LLM strengths stage."""
     strengths_prompt = f"""
 You are given a student's historical Canvas performance by category (percent 0-100), possibly with nulls:
 
@@ -334,139 +328,173 @@ Rules:
 - Ensure ALL four categories exist.
 - Do NOT include any extra fields or prose. JSON only.
 """
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "Return JSON only."},
+            {"role": "user", "content": strengths_prompt},
+        ],
+        "response_format": {"type": "json_object"},
+    }
+
+
+def wants_llm_strengths(data) -> bool:
+    """
+    The request's "llm_strengths" opt-in. Only a JSON boolean or one of
+    "true"/"1"/"yes" turns the paid LLM stage on (and "false"/"0"/"no" off),
+    so a form value like "false" cannot enable it; anything else falls back
+    to USE_LLM_STRENGTHS.
+    """
+    value = data.get("llm_strengths")
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower() if isinstance(value, (str, int)) else None
+    if text in ("1", "true", "yes"):
+        return True
+    if text in ("0", "false", "no"):
+        return False
+    return USE_LLM_STRENGTHS
+
+
+def resolve_strengths(category_means: dict, use_llm: bool = False) -> dict:
+    # -------- Strengths: local engine by default, LLM only when opted in ----------
+    strengths = compute_strengths(category_means)
+    if not use_llm:
+        return strengths
+
+    # default_overall: mean of the non-null categories (DEFAULT_OVERALL if none)
     try:
-        stage = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Return JSON only."},
-                {"role": "user", "content": strengths_prompt},
-            ],
-            response_format={"type": "json_object"},
+        stage = cached_chat_completion(
+            get_openai_client(), **strengths_request(category_means, strengths["overall_strength"])
         )
-        strengths = json.loads(stage.choices[0].message.content)
+        return json.loads(stage)
     except Exception as e:
-        # Fallback: construct strengths locally if AI call fails
-        cs = {
-            k: (category_means[k] if category_means[k] is not None else default_overall)
-            for k in ["projects", "assignments", "exams", "participation"]
-        }
-        strengths = {
-            "category_strengths": cs,
-            "overall_strength": float(sum(cs.values()) / 4.0),
-            "punctual_strength": 100.0,
-            "_note": f"AI strengths fallback due to error: {e}",
-        }
+        # Fallback: keep the locally computed strengths
+        return {**strengths, "_note": f"AI strengths fallback due to error: {e}"}
 
+
+def resolve_rmp_pack(professor_id):
     # -------- RMP micro-profile (optional) ----------
     rmp = get_professor_info(int(professor_id)) if professor_id else None
-    rmp_pack = None
     if isinstance(rmp, dict) and "error" not in rmp:
-        rmp_pack = {
+        return {
             "avg_difficulty": rmp.get("avg_difficulty"),
             "would_take_again_percent": rmp.get("would_take_again_percent"),
         }
+    return None
 
 
-    # -------- Ask AI to parse syllabus into weights & produce final score ----------
-    # Provide defaults if syllabus unclear.
-    prediction_prompt = """
-Use the provided data to produce a JSON object with:
-- "projects","assignments","exams","participation": syllabus weights as percentages (floats), each 0–100, sum ≈ 100.
-- "final_score": number (0–100)
-- "margin_of_error": number (e.g., 3,4,6)
-- "range": [low, high] (floats, clamped 0–100)
+def needs_llm_weights(syllabus_text: str, breakdown: dict) -> bool:
+    # -------- Syllabus weights: local parser first, LLM only when unsure ----------
+    return bool(syllabus_text) and breakdown["confidence"] < SYLLABUS_CONFIDENCE_THRESHOLD
 
-Inputs:
-1) strengths: student's category_strengths (0–100), overall_strength, punctual_strength.
-2) syllabus: free text that may mention grading breakdowns.
-3) rmp: { "avg_difficulty": 0–5 or null, "would_take_again_percent": 0–100 or null }.
+
+def weights_request(syllabus_text: str) -> dict:
+    """chat.completions kwargs asking the LLM for a syllabus' weights (never the score)."""
+    weights_prompt = """
+Read the grading breakdown in the syllabus below and return a JSON object with:
+- "projects","assignments","exams","participation": weights as percentages (floats), each 0–100, sum ≈ 100.
 
 Method:
-- Parse syllabus text to infer weights. If unclear, use defaults: projects=25, assignments=35, exams=35, participation=5.
-- Normalize weights to sum to 100.
-- Base score = sum(strength[cat] * weight[cat]/100 for each category).
-- Difficulty drag: if rmp.avg_difficulty:
-    4.0–5.0  => -3
-    3.3–3.99 => -2
-    2.7–3.29 => -1
-    else     => 0
-- Punctual bonus: if punctual_strength > 90 => +2, else +0.
-- Extra credit: if syllabus text explicitly mentions "extra credit" or similar => +3.
-- Margin of error:
-    if rmp.would_take_again_percent is null => 5
-    elif <30 => 6
-    elif 30–100 => 4
-    else => 3
-- Clamp final_score to 0–100; range = [final_score - margin, final_score + margin] clamped to 0–100.
+- Map every graded component to the closest of the four categories
+  (homework, labs, quizzes => assignments; midterms, finals => exams; attendance => participation).
+- If the syllabus gives no breakdown, use defaults: projects=25, assignments=35, exams=35, participation=5.
 
 Return JSON only with exactly these fields.
 """
-    ai_inputs = {
-        "strengths": strengths,
-        "rmp": rmp_pack,
-        "syllabus": syllabus_text,
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "Return JSON only."},
+            {"role": "user", "content": weights_prompt},
+            {"role": "user", "content": syllabus_text},
+        ],
+        "response_format": {"type": "json_object"},
     }
 
-    try:
-        stage2 = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Return JSON only."},
-                {"role": "user", "content": prediction_prompt},
-                {"role": "user", "content": json.dumps(ai_inputs, indent=2)},
-            ],
-            response_format={"type": "json_object"},
-        )
-        final = json.loads(stage2.choices[0].message.content)
-    except Exception as e:
-        # Safe fallback: use defaults and computed strengths
-        defaults = {"projects": 25.0, "assignments": 35.0, "exams": 35.0, "participation": 5.0}
-        s = strengths.get("category_strengths", {})
-        base = sum(float(s.get(k, 85.0)) * (defaults[k] / 100.0) for k in defaults)
-        margin = 5.0
-        final = {
-            **defaults,
-            "final_score": float(max(0.0, min(100.0, base))),
-            "margin_of_error": margin,
-            "range": [float(max(0.0, base - margin)), float(min(100.0, base + margin))],
-            "_note": f"AI prediction fallback due to error: {e}",
-        }
 
+def normalize_weights(weights) -> dict:
     # -------- Normalize/validate weights presence ----------
-    weights = {}
-    for k in ["projects", "assignments", "exams", "participation"]:
-        val = final.get(k)
+    parsed = {}
+    for k in CATEGORIES:
+        val = weights.get(k) if isinstance(weights, dict) else None
         try:
-            weights[k] = float(val) if val is not None else None
+            parsed[k] = float(val) if val is not None else None
         except Exception:
-            weights[k] = None
+            parsed[k] = None
 
-    # If any weight missing, fill with defaults and renormalize
-    if any(weights[k] is None for k in weights):
-        defaults = {"projects": 25.0, "assignments": 35.0, "exams": 35.0, "participation": 5.0}
-        weights = defaults
+    # If any weight missing, fall back to defaults
+    if any(v is None for v in parsed.values()) or sum(parsed.values()) <= 0:
+        parsed = dict(DEFAULT_WEIGHTS)
     # Normalize to sum 100
-    total = sum(weights.values())
-    if total > 0:
-        weights = {k: (v * 100.0 / total) for k, v in weights.items()}
+    total = sum(parsed.values())
+    return {k: v * 100.0 / total for k, v in parsed.items()}
 
-        # -------- Build response ----------
-    # inside predict_grade, near the end before resp = { ... }
 
-    course_name = None
+def resolve_weights(syllabus_text: str, breakdown: dict) -> tuple:
+    """
+    Syllabus weights, normalized to sum to 100. Returns (weights, note),
+    where note explains a fallback to the defaults (else None).
+    """
+    if not needs_llm_weights(syllabus_text, breakdown):
+        return normalize_weights(breakdown["weights"] or DEFAULT_WEIGHTS), None
     try:
-        if "canvas_course_id" in request.data and request.data["canvas_course_id"]:
-            cid = int(request.data["canvas_course_id"])
-            row = df[df["course_id"] == cid]
-            if not row.empty:
-                course_name = str(row.iloc[0]["name"])
+        stage2 = cached_chat_completion(get_openai_client(), **weights_request(syllabus_text))
+        return normalize_weights(json.loads(stage2)), None
     except Exception as e:
-        course_name = None
+        return normalize_weights(DEFAULT_WEIGHTS), f"AI weights fallback due to error: {e}"
+
+
+def score_weights(strengths: dict, rmp_pack, breakdown: dict, model, weights: dict, note=None):
+    """
+    Final score for resolve_weights' (weights, note). Returns (final,
+    weights). The score comes from the student's grade model
+    (grade_model.GradeModel) when given, else the plain rule table.
+    """
+    final = score_prediction(strengths, weights, rmp_pack, extra_credit=breakdown["extra_credit"], model=model)
+    if note:
+        final["_note"] = note
+    return final, weights
+
 
-        # -------- AI-generated advice ----------
-    advice_text = None
+def strength_vector(strengths: dict):
+    cs = strengths.get("category_strengths") or {}
+    return [float(cs.get(k, DEFAULT_OVERALL)) for k in CATEGORIES]
+
+
+def apply_distribution(prediction, strengths: dict, snapshot, canvas_course_id, model=None):
+    """
+    Swap the rule-table margin_of_error / range of a (final, weights)
+    prediction for the predictive distribution's, and add "distribution"
+    (percentiles, letter-grade probabilities). For a course already under
+    way, final_score also accounts for the grades it already has. The grade
+    model's residual SD, if given, sets the score's irreducible spread.
+    """
+    final, weights = prediction
+    center = final.get("final_score")
+    if not isinstance(center, (int, float)):
+        return prediction
+    with timed("distribution"):
+        dist = predict_distributions(
+            [center], [[weights[k] for k in CATEGORIES]], strength_vector(strengths),
+            snapshot.score_model, *snapshot.course_progress([canvas_course_id]),
+            noise_sd=model.residual_sd() if model is not None else None,
+        )
+    return {**final, "final_score": float(dist["mean"][0]), **distribution_fields(dist)}, weights
+
+
+def resolve_course_name(snapshot, canvas_course_id):
     try:
-        advice_prompt = f"""
+        if canvas_course_id:
+            return snapshot.course_name(int(canvas_course_id))
+    except Exception:
+        pass
+    return None
+
+
+def advice_request(course_name, final: dict, strengths: dict, weights: dict, rmp_pack) -> dict:
+    """Chat completion kwargs for the advice call (shared by the plain and streaming views)."""
+    advice_prompt = f"""
 A student is considering "{course_name}".
 Predicted grade: {final.get("final_score")} ±{final.get("margin_of_error")}.
 Strengths: {json.dumps(strengths.get("category_strengths"), indent=2)}.
@@ -494,30 +522,359 @@ Do NOT use markdown (no ###). Just plain text section labels followed by paragra
 
 
 """
-        advice_completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": advice_prompt}],
-            max_tokens=600,
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": advice_prompt}],
+        "max_tokens": 600,
+    }
+
+
+def generate_advice(course_name, final: dict, strengths: dict, weights: dict, rmp_pack) -> str:
+    # -------- AI-generated advice ----------
+    try:
+        kwargs = advice_request(course_name, final, strengths, weights, rmp_pack)
+        return cached_chat_completion(get_openai_client(), **kwargs).strip()
+    except Exception as e:
+        return f"(Advice unavailable due to error: {e})"
+
+
+def load_prediction_snapshot(partition):
+    """(snapshot, None), or (None, error Response) when the partition's Canvas cache is unusable."""
+    cache_path = partition.cache_path
+    # -------- Guard: need local Canvas cache ----------
+    if not cache_path.exists():
+        return None, Response(
+            {"error": "No Canvas data cache found. Run /api/canvas/all-data first."},
+            status=400,
         )
-        advice_text = advice_completion.choices[0].message.content.strip()
+
+    # -------- Load cache (in-memory snapshot, reparsed only when the file changes) ----------
+    try:
+        return get_cache_snapshot(cache_path), None
     except Exception as e:
-        advice_text = f"(Advice unavailable due to error: {e})"
+        return None, Response({"error": f"Failed to read cache: {str(e)}"}, status=500)
 
-    # then in resp dict:
-    resp = {
-        "course_name": course_name,
+
+def load_grade_model(partition, snapshot):
+    """The partition's grade model (trained from its cache on first use), or None to use the rule table."""
+    if not USE_GRADE_MODEL:
+        return None
+    try:
+        return get_grade_model(partition.grade_model_path, snapshot.df)
+    except Exception as e:
+        logger.warning("Grade model load failed for %s: %s", partition.grade_model_path, e)
+        return None
+
+
+def load_request_syllabus(data):
+    """
+    The stored Syllabus a request refers to by "syllabus_hash".
+    Returns (syllabus | None, error_response | None).
+    """
+    key = data.get("syllabus_hash")
+    if not key:
+        return None, None
+    syllabus = get_syllabi([str(key)]).get(str(key))
+    if syllabus is None:
+        return None, Response({"error": f"Unknown syllabus_hash {key!r}; upload it to /api/syllabi/ first."},
+                              status=404)
+    return syllabus, None
+
+
+def build_prediction_pipeline(data, snapshot, with_advice: bool = True, syllabus=None, model=None) -> Pipeline:
+    professor_id = data.get("professor_id")
+    if syllabus is not None:
+        syllabus_text = syllabus.text
+        parse_syllabus = syllabus.breakdown  # parsed once, at ingestion
+    else:
+        syllabus_text = (data.get("syllabus_text") or "").strip()
+
+        def parse_syllabus():
+            return parse_grading_breakdown(syllabus_text)
+    use_llm_strengths = wants_llm_strengths(data)
+
+    # -------- Stage graph: only prediction and advice have to wait ----------
+    # The LLM weights call (when the parser is unsure) overlaps the RMP lookup
+    pipeline = (
+        Pipeline()
+        .stage("strengths", lambda: resolve_strengths(dict(snapshot.category_means), use_llm_strengths))
+        .stage("rmp", lambda: resolve_rmp_pack(professor_id))
+        .stage("syllabus", parse_syllabus)
+        .stage("weights", lambda syllabus: resolve_weights(syllabus_text, syllabus), deps=("syllabus",))
+        .stage("course_name", lambda: resolve_course_name(snapshot, data.get("canvas_course_id")))
+        .stage(
+            "prediction",
+            lambda strengths, rmp, syllabus, weights: apply_distribution(
+                score_weights(strengths, rmp, syllabus, model, *weights),
+                strengths, snapshot, data.get("canvas_course_id"), model,
+            ),
+            deps=("strengths", "rmp", "syllabus", "weights"),
+        )
+    )
+    if with_advice:
+        pipeline.stage(
+            "advice",
+            lambda prediction, strengths, rmp, course_name: generate_advice(
+                course_name, prediction[0], strengths, prediction[1], rmp
+            ),
+            deps=("prediction", "strengths", "rmp", "course_name"),
+        )
+    return pipeline
+
+
+def prediction_payload(results: dict) -> dict:
+    """Response fields for everything except the advice text."""
+    strengths = results["strengths"]
+    final, weights = results["prediction"]
+    return {
+        "course_name": results["course_name"],
         "category_strengths": strengths.get("category_strengths"),
         "overall_strength": strengths.get("overall_strength"),
         "punctual_strength": strengths.get("punctual_strength"),
         "final_score": final.get("final_score"),
         "margin_of_error": final.get("margin_of_error"),
         "range": final.get("range"),
+        "distribution": final.get("distribution"),
         "projects": round(weights["projects"], 2),
         "assignments": round(weights["assignments"], 2),
         "exams": round(weights["exams"], 2),
         "participation": round(weights["participation"], 2),
-        "rmp": rmp_pack,
-        "advice": advice_text,   # 🔹 new field
+        "rmp": results["rmp"],
+    }
+
+
+@api_view(["POST"])
+def predict_grade(request):
+    """
+    The syllabus comes as "syllabus_text", or as the "syllabus_hash" that
+    POST /api/syllabi/ returned, which skips re-sending and re-parsing it.
+
+    Returns:
+      {
+        "category_strengths": {"projects": %, "assignments": %, "exams": %, "participation": %},
+        "overall_strength": %,
+        "punctual_strength": %,
+        "final_score": number,
+        "margin_of_error": number,  # half-width of "range"
+        "range": [low, high],       # 90% interval (5th-95th percentile)
+        "distribution": {
+          "mean": number, "sd": number,
+          "percentiles": {"p5": number, ..., "p95": number},
+          "letter_probabilities": {"A+": p, "A": p, ..., "F": p},
+          "most_likely_letter": str
+        },
+        "projects": number,        # syllabus weight %
+        "assignments": number,     # syllabus weight %
+        "exams": number,           # syllabus weight %
+        "participation": number,   # syllabus weight %
+        "rmp": {
+          "avg_difficulty": number | null,
+          "would_take_again_percent": number | null
+        },
+        "_pipeline": {stage timings, "critical_path": [...], ...}
+      }
+    """
+    syllabus, error = load_request_syllabus(request.data)
+    if error is not None:
+        return error
+    partition = partition_for_request(request)
+    snapshot, error = load_prediction_snapshot(partition)
+    if error is not None:
+        return error
+
+    pipeline = build_prediction_pipeline(
+        request.data, snapshot, syllabus=syllabus, model=load_grade_model(partition, snapshot)
+    )
+    results = pipeline.run(parallel=PREDICT_PARALLEL)
+    record_pipeline(pipeline)
+
+    resp = {
+        **prediction_payload(results),
+        "advice": results["advice"],   # 🔹 new field
+        "_pipeline": pipeline.report(),
     }
 
     return Response(resp)
+
+
+# ----------------- Predict grade (streaming) -----------------
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _ndjson(event: str, data) -> str:
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+@api_view(["POST"])
+def predict_grade_stream(request):
+    """
+    Same inputs as predict_grade, streamed as soon as each part is ready:
+      event "prediction": every predict_grade field except "advice"
+      event "advice":     {"delta": text} per token chunk from the model
+      event "error":      {"error": message} if advice generation fails
+      event "done":       {"advice": full advice text}
+    Server-sent events by default; `?stream=ndjson` sends one JSON object
+    ({"event", "data"}) per line instead.
+    """
+    syllabus, error = load_request_syllabus(request.data)
+    if error is not None:
+        return error
+    partition = partition_for_request(request)
+    snapshot, error = load_prediction_snapshot(partition)
+    if error is not None:
+        return error
+    model = load_grade_model(partition, snapshot)
+
+    ndjson = request.query_params.get("stream") == "ndjson"
+    encode = _ndjson if ndjson else _sse
+    data = request.data
+
+    def events():
+        pipeline = build_prediction_pipeline(data, snapshot, with_advice=False, syllabus=syllabus, model=model)
+        results = pipeline.run(parallel=PREDICT_PARALLEL)
+        record_pipeline(pipeline)
+        yield encode("prediction", {**prediction_payload(results), "_pipeline": pipeline.report()})
+
+        final, weights = results["prediction"]
+        parts = []
+        try:
+            kwargs = advice_request(results["course_name"], final, results["strengths"], weights, results["rmp"])
+            with timed("advice"):
+                for delta in stream_chat_completion(get_openai_client(), **kwargs):
+                    parts.append(delta)
+                    yield encode("advice", {"delta": delta})
+            advice_text = "".join(parts).strip()
+        except Exception as e:
+            advice_text = f"(Advice unavailable due to error: {e})"
+            yield encode("error", {"error": str(e)})
+        yield encode("done", {"advice": advice_text})
+
+    response = StreamingHttpResponse(
+        events(), content_type="application/x-ndjson" if ndjson else "text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ----------------- Predict grade (batch) -----------------
+BATCH_MAX_CANDIDATES = int(os.getenv("BATCH_MAX_CANDIDATES", "100"))
+
+
+@api_view(["POST"])
+def predict_grade_batch(request):
+    """
+    Rank many candidate courses for course shopping in one call.
+
+    Body:
+      {
+        "candidates": [
+          {"course": str, "professor_id": int | null, "syllabus_text": str, "canvas_course_id": int | null},
+          ...
+        ],
+        "llm_strengths": bool   # optional, as in predict_grade
+      }
+
+    A candidate may send "syllabus_hash" instead of "syllabus_text", as in
+    predict_grade. Strengths are computed once, each distinct professor and
+    syllabus is resolved once, and all candidates are scored in a single
+    vectorized pass.
+    Returns the shared strengths plus "results" sorted by final_score (desc).
+    """
+    candidates = request.data.get("candidates")
+    if not isinstance(candidates, list) or not candidates:
+        return Response({"error": "Provide a non-empty 'candidates' list."}, status=400)
+    if len(candidates) > BATCH_MAX_CANDIDATES:
+        return Response({"error": f"At most {BATCH_MAX_CANDIDATES} candidates per batch."}, status=400)
+    candidates = [c if isinstance(c, dict) else {} for c in candidates]
+    # Checked up front: a bad id would otherwise fail the whole batch inside the pool
+    for i, c in enumerate(candidates):
+        if c.get("professor_id"):
+            try:
+                int(c["professor_id"])
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": f"Candidate {i} has a non-numeric professor_id: {c['professor_id']!r}."}, status=400
+                )
+
+    partition = partition_for_request(request)
+    snapshot, error = load_prediction_snapshot(partition)
+    if error is not None:
+        return error
+    model = load_grade_model(partition, snapshot)
+
+    with timed("strengths"):
+        strengths = resolve_strengths(dict(snapshot.category_means), wants_llm_strengths(request.data))
+
+    # -------- Deduplicated professor + syllabus work ----------
+    stored = get_syllabi(str(c["syllabus_hash"]) for c in candidates if c.get("syllabus_hash"))
+    missing = sorted({str(c["syllabus_hash"]) for c in candidates if c.get("syllabus_hash")} - set(stored))
+    if missing:
+        return Response({"error": f"Unknown syllabus_hash values: {missing}"}, status=404)
+    syllabi = [
+        stored[str(c["syllabus_hash"])].text if c.get("syllabus_hash") else (c.get("syllabus_text") or "").strip()
+        for c in candidates
+    ]
+    professor_ids = {c.get("professor_id") for c in candidates if c.get("professor_id")}
+    unique_syllabi = set(syllabi)
+
+    with timed("candidates"), ThreadPoolExecutor(max_workers=8) as pool:
+        rmp_futures = {pid: pool.submit(resolve_rmp_pack, pid) for pid in professor_ids}
+        # Stored syllabi were parsed at ingestion
+        breakdowns = {s.text: s.breakdown() for s in stored.values()}
+        for text in unique_syllabi - set(breakdowns):
+            breakdowns[text] = parse_grading_breakdown(text)
+        # Syllabi the local parser is unsure about still go through the LLM, once each
+        weight_futures = {
+            text: pool.submit(resolve_weights, text, breakdown)
+            for text, breakdown in breakdowns.items()
+            if needs_llm_weights(text, breakdown)
+        }
+        rmp_packs = {pid: f.result() for pid, f in rmp_futures.items()}
+        syllabus_weights = {
+            text: (weight_futures[text].result()[0] if text in weight_futures
+                   else breakdowns[text]["weights"] or DEFAULT_WEIGHTS)
+            for text in unique_syllabi
+        }
+
+    # -------- One vectorized scoring pass ----------
+    packs = [rmp_packs.get(c.get("professor_id")) or {} for c in candidates]
+    with timed("scoring"):
+        scored = score_predictions_batch(
+            strengths,
+            [[syllabus_weights[text][k] for k in CATEGORIES] for text in syllabi],
+            [p.get("avg_difficulty") for p in packs],
+            [p.get("would_take_again_percent") for p in packs],
+            [breakdowns[text]["extra_credit"] for text in syllabi],
+            model,
+        )
+        dist = predict_distributions(
+            scored["final_score"], scored["weights"], strength_vector(strengths), snapshot.score_model,
+            *snapshot.course_progress([c.get("canvas_course_id") for c in candidates]),
+            noise_sd=model.residual_sd() if model is not None else None,
+        )
+
+    results = []
+    for i, c in enumerate(candidates):
+        weights = dict(zip(CATEGORIES, scored["weights"][i]))
+        results.append({
+            "index": i,
+            "course": c.get("course"),
+            "course_name": resolve_course_name(snapshot, c.get("canvas_course_id")),
+            "professor_id": c.get("professor_id"),
+            "final_score": float(dist["mean"][i]),
+            **distribution_fields(dist, i),
+            **{k: round(float(v), 2) for k, v in weights.items()},
+            "rmp": rmp_packs.get(c.get("professor_id")),
+        })
+    results.sort(key=lambda r: r["final_score"], reverse=True)
+    for rank, r in enumerate(results, start=1):
+        r["rank"] = rank
+
+    return Response({
+        "category_strengths": strengths.get("category_strengths"),
+        "overall_strength": strengths.get("overall_strength"),
+        "punctual_strength": strengths.get("punctual_strength"),
+        "results": results,
+    })
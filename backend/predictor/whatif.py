@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .aggregation import CATEGORIES, AssignmentTable, standardize_category
+from .distribution import LETTER_GRADES
+
+# ----------------- What-if config -----------------
+# Seconds a course's Canvas data is reused for re-solves before it is fetched again
+WHATIF_CACHE_SECONDS = float(os.getenv("WHATIF_CACHE_SECONDS", "300"))
+# Courses kept in memory across all users
+WHATIF_CACHE_SIZE = int(os.getenv("WHATIF_CACHE_SIZE", "256"))
+
+LETTER_CUTOFFS = dict(LETTER_GRADES)
+
+
+class WhatIfCourse:
+    """
+    One course's assignment groups, assignments and submissions, flattened
+    once (aggregation.AssignmentTable) so every solve is pure NumPy.
+
+    With `weighted` (Canvas' apply_assignment_group_weights; by default,
+    whether any group has a weight) the final grade is the weighted mean of
+    group percents; otherwise it is total points earned / possible. Excused
+    and zero-point assignments count for nothing; drop rules are not
+    modelled.
+    """
+
+    def __init__(self, groups, submissions, weighted=None):
+        self.table = AssignmentTable([(groups, submissions)], keep_rows=True)
+        if self.table.errors:
+            raise ValueError(self.table.errors[0])
+        self.group_names = list(self.table.group_name)
+        self.group_weights = np.array([w or 0.0 for w in self.table.group_weight], dtype=float)
+        if weighted is None:
+            weighted = bool((self.group_weights > 0).any())
+        self.weighted = weighted
+        self.group_category = np.array(
+            [CATEGORIES.index(standardize_category(name)) for name in self.group_names], dtype=np.intp
+        )
+        self.assignment_index = {a["id"]: i for i, (a, _) in enumerate(self.table.rows)}
+
+    def scores_with(self, edits=None):
+        """Scores with hypothetical `edits` ({assignment_id: score | None}) applied; raises KeyError for unknown ids."""
+        score = self.table.score
+        if not edits:
+            return score
+        score = score.copy()
+        for assignment_id, value in edits.items():
+            i = self.assignment_index.get(assignment_id)
+            if i is None:
+                raise KeyError(assignment_id)
+            score[i] = np.nan if value is None else float(value)
+        return score
+
+    def solve(self, targets, edits=None) -> dict:
+        """
+        For each target percent, the score needed on the remaining work:
+          "required_percent": the same percent on everything left;
+          "by_group" / "by_category": on one group's (standardized
+              category's) remaining work, with the rest finishing at its
+              current percent.
+        None means there is nothing left there; above 100 means out of
+        reach, 0 means already secured. Also returns the current, projected
+        (everything finishing at its current percent), minimum and maximum
+        final percent, and per-group totals.
+        """
+        t = self.table
+        n_groups = len(self.group_names)
+        g = t.assignment_group
+        score = self.scores_with(edits)
+        counted = ~t.excused & (t.points > 0)
+        graded = counted & ~np.isnan(score)
+        pending = counted & np.isnan(score)
+
+        earned = np.bincount(g, np.where(graded, score, 0.0), n_groups)
+        graded_points = np.bincount(g, np.where(graded, t.points, 0.0), n_groups)
+        remaining_points = np.bincount(g, np.where(pending, t.points, 0.0), n_groups)
+        possible = graded_points + remaining_points
+
+        # Share of the final grade each group carries
+        share = np.where(possible > 0, self.group_weights if self.weighted else possible, 0.0)
+        share = share / share.sum() if share.sum() > 0 else share
+        with np.errstate(invalid="ignore", divide="ignore"):
+            base = share * np.where(possible > 0, earned / possible, 0.0) * 100.0       # everything left scores 0
+            slope = share * np.where(possible > 0, remaining_points / possible, 0.0) * 100.0  # ...per unit scored on it
+            pace = np.where(graded_points > 0, earned / graded_points, np.nan)
+
+        has_grades = graded_points > 0
+        current_share = share[has_grades]
+        current = (
+            float((current_share * pace[has_grades]).sum() / current_share.sum() * 100.0)
+            if current_share.sum() > 0 else None
+        )
+        # Groups with nothing graded yet are assumed to go like the rest of the course
+        pace = np.where(has_grades, pace, (current if current is not None else 100.0) / 100.0)
+        projected = base.sum() + (slope * pace).sum()
+        left = slope.sum()
+
+        targets = np.asarray(targets, dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            uniform = (targets - base.sum()) / left * 100.0
+            # Target minus what every other group contributes at its current pace
+            need = targets[:, None] - projected + slope * pace
+            by_group = need / slope * 100.0
+            cat_slope = np.bincount(self.group_category, slope, len(CATEGORIES))
+            cat_need = targets[:, None] - projected + np.bincount(self.group_category, slope * pace, len(CATEGORIES))
+            by_category = cat_need / cat_slope * 100.0
+
+        def percent(value, open_):
+            return round(max(0.0, float(value)), 2) if open_ else None
+
+        solved = []
+        for k, target in enumerate(targets.tolist()):
+            solved.append({
+                "target": target,
+                "required_percent": percent(uniform[k], left > 0),
+                "achievable": bool(base.sum() + left >= target - 1e-9),
+                "secured": bool(base.sum() >= target - 1e-9),
+                "by_group": {name: percent(by_group[k, i], slope[i] > 0) for i, name in enumerate(self.group_names)},
+                "by_category": {cat: percent(by_category[k, c], cat_slope[c] > 0) for c, cat in enumerate(CATEGORIES)},
+            })
+
+        return {
+            "weighted": self.weighted,
+            "current_percent": None if current is None else round(current, 2),
+            "projected_percent": round(float(projected), 2),
+            "min_percent": round(float(base.sum()), 2),
+            "max_percent": round(float(base.sum() + left), 2),
+            "groups": [
+                {
+                    "category": name,
+                    "standardized": CATEGORIES[self.group_category[i]],
+                    "share": round(float(share[i]) * 100.0, 2),
+                    "earned_points": float(earned[i]),
+                    "graded_points": float(graded_points[i]),
+                    "remaining_points": float(remaining_points[i]),
+                    "current_percent": round(float(pace[i]) * 100.0, 2) if has_grades[i] else None,
+                }
+                for i, name in enumerate(self.group_names)
+            ],
+            "targets": solved,
+        }
+
+
+# ----------------- Course cache -----------------
+# (partition key, course id) -> (loaded at, WhatIfCourse); slider re-solves skip Canvas
+_courses = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_whatif_course(partition_key: str, course_id: int, load, refresh: bool = False) -> WhatIfCourse:
+    """The cached WhatIfCourse for this user's course, calling `load()` when missing, stale or `refresh`."""
+    key = (partition_key, course_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _courses.get(key)
+        if entry is not None and not refresh and now - entry[0] < WHATIF_CACHE_SECONDS:
+            _courses.move_to_end(key)
+            return entry[1]
+
+    course = load()
+    with _lock:
+        _courses[key] = (now, course)
+        _courses.move_to_end(key)
+        while len(_courses) > WHATIF_CACHE_SIZE:
+            _courses.popitem(last=False)
+    return course
+
+
+def parse_target(value) -> float:
+    """A target percent or letter grade ("A-") -> percent; raises ValueError."""
+    if isinstance(value, str) and value.strip().upper() in LETTER_CUTOFFS:
+        return LETTER_CUTOFFS[value.strip().upper()]
+    if isinstance(value, bool):
+        raise ValueError(f"target {value!r} is not a percent or letter grade")
+    try:
+        target = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"target {value!r} is not a percent or letter grade") from None
+    if not 0.0 <= target <= 200.0:
+        raise ValueError(f"target {value!r} is out of range")
+    return target